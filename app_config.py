@@ -0,0 +1,11 @@
+# app_config.py
+# Optional settings from Streamlit Secrets, shared by every module. Outside a Streamlit run (or
+# with no secrets file) the default is returned instead of raising.
+import streamlit as st
+
+
+def get_secret(name: str, default=None):
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
@@ -1,5 +1,6 @@
 # app_main.py
 import time
+import itertools
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings("ignore")
@@ -7,21 +8,34 @@ import streamlit as st
 
 # ======================== Import Module ========================
 from stock_basic_data import (
-    STOCK_TICKERS, STOCK_FULL_NAMES, TIME_PERIODS,
+    STOCK_FULL_NAMES, TIME_PERIODS, TIME_INTERVALS, INTRADAY_PERIODS, get_nasdaq100_tickers, TICKER_LIST_STATUS,
     get_stock_price_data, get_stock_fundamental_data,
-    plot_ths_style_chart
+    plot_ths_style_chart, align_sentiment_to_bars
 )
+from universe import get_universe_screener
 
 # Reporting module (use mock if missing)
 try:
-    from data_collector import collect_social_data
-    from report_core import generate_report_sections
+    from data_collector import (collect_social_data, iter_social_data, finalize_social_data, plot_sentiment_trend,
+                                load_stored_posts)
+    from report_core import (generate_report_sections, iter_report_sections, build_vector_db,
+                             update_vector_metadata, REPORT_SECTION_ORDER)
     REPORT_AVAILABLE = True
 except ImportError:
     def collect_social_data(ticker, count):
         return {"posts": [], "period_start": "", "period_end": "", "avg_sentiment": None, "fig": None}
+    def iter_social_data(*args, **kwargs):
+        return iter(())
+    def load_stored_posts(*args, **kwargs):
+        return []
+    def finalize_social_data(ticker, all_posts, daily, start_date=None, end_date=None):
+        return {"posts": all_posts, "period_start": start_date or "", "period_end": end_date or "", "avg_sentiment": None, "fig": None}
+    build_vector_db = None
     def generate_report_sections(*args, **kwargs):
         return "# Report Module Missing\nPlease add `data_collector.py` and `report_generator.py`"
+    def iter_report_sections(*args, **kwargs):
+        yield {"type": "report", "markdown": generate_report_sections()}
+    REPORT_SECTION_ORDER = ()
     REPORT_AVAILABLE = False
 
 # ======================== Page Configuration ========================
@@ -37,10 +51,26 @@ st.markdown('#### *Nasdaq-100 Social Sentiment Analysis Intelligence*')
 st.caption("Authors: Lechuan WANG, Minyoung WOO, Xuantao YUAN, Yijie WANG. (2025)")
 st.markdown("---")
 
+# Above this many bars per trace, price charts switch to bucketed candles + WebGL lines
+CHART_POINT_BUDGET = 600
+
 if 'selected_period' not in st.session_state:
     st.session_state.selected_period = "1 Year"
 
 # ======================= Stock Selection ========================
+# Re-read every rerun (local file only) so a finished background refresh shows up without a restart
+STOCK_TICKERS = get_nasdaq100_tickers()
+
+with st.sidebar:
+    st.subheader("Ticker list")
+    fetched_at = TICKER_LIST_STATUS.get("fetched_at")
+    st.caption(
+        f"{TICKER_LIST_STATUS.get('count', len(STOCK_TICKERS))} tickers · source: {TICKER_LIST_STATUS.get('source', 'n/a')}"
+        f" · loaded in {TICKER_LIST_STATUS.get('load_ms', 0)} ms"
+    )
+    st.caption("Fetched: " + (datetime.fromtimestamp(fetched_at).strftime("%Y-%m-%d %H:%M") if fetched_at
+                              else "never (built-in fallback list)"))
+
 selected_ticker = st.selectbox(
     "Search & Select Nasdaq-100 Stock",
     options=STOCK_TICKERS,
@@ -54,23 +84,52 @@ selected_ticker = st.selectbox(
 st.subheader(f"{selected_ticker} — Core Fundamentals")
 
 # 时间周期选择
-col_period = st.columns([1, 6])[0]
-with col_period:
-    selected_period = st.selectbox(
-        "Time Period",
-        options=list(TIME_PERIODS.keys()),
-        index=list(TIME_PERIODS.keys()).index(st.session_state.selected_period),
-        key="period"
+col_period, col_interval = st.columns([1, 1, 5])[:2]
+with col_interval:
+    selected_interval = st.selectbox(
+        "Interval",
+        options=list(TIME_INTERVALS.keys()),
+        index=0,
+        key="interval"
     )
-    st.session_state.selected_period = selected_period
+interval_code = TIME_INTERVALS[selected_interval]
+with col_period:
+    if interval_code == "1d":
+        selected_period = st.selectbox(
+            "Time Period",
+            options=list(TIME_PERIODS.keys()),
+            index=list(TIME_PERIODS.keys()).index(st.session_state.selected_period),
+            key="period"
+        )
+        st.session_state.selected_period = selected_period
+        period_code = TIME_PERIODS[selected_period]
+    else:
+        # Intraday bars come from the stored 1-minute series (last few sessions only)
+        selected_period = st.selectbox(
+            "Time Period",
+            options=list(INTRADAY_PERIODS.keys()),
+            index=len(INTRADAY_PERIODS) - 1,
+            key="intraday_period"
+        )
+        period_code = INTRADAY_PERIODS[selected_period]
 
 # Load price data + indicators
-price_data = get_stock_price_data(selected_ticker, period=TIME_PERIODS[selected_period])
+price_data = get_stock_price_data(selected_ticker, period=period_code, interval=interval_code)
 indicators = get_stock_fundamental_data(selected_ticker)
 
 # ======================== Part Two: Candlestick Chart + Trading Volume ========================
 if not price_data.empty:
-    kline_fig, volume_fig = plot_ths_style_chart(selected_ticker, price_data, selected_period)
+    sentiment_bars = None
+    if interval_code != "1d":
+        # Already collected news (local store only) on the intraday bar grid; posts are UTC,
+        # bars exchange time, so the stored day range is widened by one day
+        first_day = str(price_data["Date"].iloc[0])[:10]
+        last_day = (datetime.strptime(str(price_data["Date"].iloc[-1])[:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        stored_posts = load_stored_posts(selected_ticker, first_day, last_day)
+        if stored_posts:
+            sentiment_bars = align_sentiment_to_bars(price_data, stored_posts, interval_code)
+    kline_fig, volume_fig = plot_ths_style_chart(selected_ticker, price_data, f"{selected_period} · {selected_interval}",
+                                                  max_points=CHART_POINT_BUDGET, sentiment=sentiment_bars)
     st.plotly_chart(kline_fig, use_container_width=True, config={'displayModeBar': False})
     st.plotly_chart(volume_fig, use_container_width=True, config={'displayModeBar': False})
 else:
@@ -102,6 +161,17 @@ with c5:
     st.metric("P/S Ratio", indicators.get("PS Ratio", "N/A"))
 
 
+# ======================== Universe Screener (one batched download for all constituents) ========================
+with st.expander("Nasdaq-100 Screener"):
+    if st.button("Load screener", key="load_screener"):
+        with st.spinner("Downloading all constituents..."):
+            try:
+                st.session_state["screener"] = get_universe_screener(STOCK_TICKERS)
+            except Exception as e:
+                st.error(f"Screener unavailable: {e}")
+    if "screener" in st.session_state:
+        st.dataframe(st.session_state["screener"], use_container_width=True)
+
 # ======================== Mood Report Generation Area ========================
 st.divider()
 st.subheader("Sentiment Analysis Report Generation Agent")
@@ -157,27 +227,78 @@ if generate_btn or cache_key in st.session_state:
         status = st.empty()
 
         status.text("Step 1: Collecting news from Alpha Vantage...")
-        prog.progress(20)
+        prog.progress(5)
         start_time = time.time()
-
-        # Key point: Passing new parameters to data_collector
-        result = collect_social_data(
+        chart_slot = st.empty()
+
+        # Key point: Passing new parameters to data_collector.
+        # Posts stream in per interval: redraw the trend chart and embed each batch while the rest downloads.
+        range_start = start_date.strftime("%Y-%m-%d")
+        range_end = end_date.strftime("%Y-%m-%d")
+        all_posts, daily = [], {}
+        vector_db, chroma_dir = None, None
+        for batch in iter_social_data(
             ticker=selected_ticker,
             daily_limit=daily_limit,
-            start_date=start_date.strftime("%Y-%m-%d"),
-            end_date=end_date.strftime("%Y-%m-%d")
-        )
+            start_date=range_start,
+            end_date=range_end
+        ):
+            all_posts.extend(batch["posts"])
+            daily = batch["daily"]
+            prog.progress(5 + int(50 * batch["done"] / batch["intervals"]))
+            status.text(f"Step 1: Collecting news from Alpha Vantage... "
+                        f"{batch['done']}/{batch['intervals']} intervals · {batch['total']} articles")
+            if daily:
+                trend_fig, _ = plot_sentiment_trend(selected_ticker, daily, range_start, range_end)
+                chart_slot.plotly_chart(trend_fig, use_container_width=True, config={'displayModeBar': False})
+            if build_vector_db is not None and batch["posts"]:
+                try:
+                    vector_db, chroma_dir = build_vector_db(batch["posts"], prefix=selected_ticker,
+                                                            vector_db=vector_db, dir_path=chroma_dir)
+                except ValueError:
+                    pass  # Batch had no embeddable text
+            if vector_db is not None and batch.get("updated"):
+                # Near-duplicates of already embedded articles arrived in this interval
+                update_vector_metadata(vector_db, batch["updated"])
+
+        chart_slot.empty()
+        result = finalize_social_data(selected_ticker, all_posts, daily, range_start, range_end)
 
         status.text("Step 2: Generating institutional RAG report with GPT-4o...")
         prog.progress(60)
 
-        report = generate_report_sections(
+        # Sections render as soon as they are produced (tokens stream into the synthesis sections)
+        live = st.empty()
+        live_box = live.container()
+        slots = {name: live_box.empty() for name in REPORT_SECTION_ORDER}
+        report, finished = "", 0
+        events = iter_report_sections(
             ticker=selected_ticker,
             fundamentals=indicators,
             social_data=result["posts"],
             period=f"{result['period_start']} to {result['period_end']}",
-            chart_path=result.get("trend_chart")
+            chart_path=result.get("trend_chart"),
+            vector_db=vector_db,
+            chroma_dir=chroma_dir,
+            use_cache=not st.session_state.pop("bypass_llm_cache", False)
         )
+        for (kind, name), group in itertools.groupby(events, key=lambda ev: (ev["type"], ev.get("name"))):
+            if kind == "token":
+                with slots[name].container():
+                    st.write_stream(ev["text"] for ev in group)
+            elif kind == "reset":
+                slots[name].empty()  # a retried call streams its answer again from the start
+            elif kind == "section":
+                for ev in group:
+                    slots[name].markdown(ev["markdown"], unsafe_allow_html=True)
+                    finished += 1
+                    prog.progress(60 + int(35 * finished / max(len(slots), 1)))
+                    status.text(f"Step 2: Generating institutional RAG report with GPT-4o... "
+                                f"{finished}/{len(slots)} sections ready")
+            elif kind == "report":
+                for ev in group:
+                    report = ev["markdown"]
+        live.empty()  # replaced by the cached full report below
 
         # Cache results
         st.session_state[cache_key] = {
@@ -258,6 +379,8 @@ if generate_btn or cache_key in st.session_state:
     if st.button("Clear Cache & Regenerate", type="secondary"):
         if cache_key in st.session_state:
             del st.session_state[cache_key]
+        # Next generation also skips the persistent LLM response cache
+        st.session_state["bypass_llm_cache"] = True
         st.rerun()
 
 # ======================= Footer =========================
@@ -0,0 +1,55 @@
+# chart_utils.py
+# Point-budget helpers for Plotly charts: LTTB downsampling for line traces and
+# fixed-count OHLCV bucketing for candlestick / volume traces.
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets over evenly spaced x (bar positions). Returns the indices of
+    the n_out points that best preserve the visual shape. NaN points (e.g. MA warm-up) are skipped.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if n_out >= n or n_out < 3:
+        return valid
+
+    x = valid.astype(np.float64)
+    yv = y[valid]
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)   # n_out-2 inner buckets
+    prev = 0
+    for b in range(n_out - 2):
+        start, end = edges[b], max(edges[b + 1], edges[b] + 1)
+        nxt_start, nxt_end = edges[b + 1], (edges[b + 2] if b + 2 < len(edges) else n)
+        nxt_end = max(nxt_end, nxt_start + 1)
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = yv[nxt_start:nxt_end].mean()
+        # Triangle area between the previous pick, each candidate and the next bucket's centroid
+        area = np.abs((x[prev] - avg_x) * (yv[start:end] - yv[prev]) - (x[prev] - x[start:end]) * (avg_y - yv[prev]))
+        prev = start + int(np.argmax(area))
+        picked[b + 1] = prev
+    return valid[picked]
+
+
+def bucket_ohlcv(df: pd.DataFrame, n_buckets: int) -> pd.DataFrame:
+    """
+    Merge consecutive bars into n_buckets bars (first Open, max High, min Low, last Close,
+    summed Volume, first Date) with reduceat — no per-row Python loop.
+    """
+    n = len(df)
+    if n <= n_buckets:
+        return df
+    starts = np.unique(np.linspace(0, n, n_buckets, endpoint=False).astype(np.int64))
+    ends = np.append(starts[1:], n) - 1
+    return pd.DataFrame({
+        "Date": df["Date"].to_numpy()[starts],
+        "Open": df["Open"].to_numpy()[starts],
+        "High": np.maximum.reduceat(df["High"].to_numpy(dtype=np.float64), starts),
+        "Low": np.minimum.reduceat(df["Low"].to_numpy(dtype=np.float64), starts),
+        "Close": df["Close"].to_numpy()[ends],
+        "Volume": np.add.reduceat(df["Volume"].to_numpy(dtype=np.float64), starts),
+    })
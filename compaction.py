@@ -0,0 +1,114 @@
+# compaction.py
+# Hierarchical map-reduce of report context: daily summaries -> weekly digests -> one period
+# digest, each level under a fixed token budget, so synthesis prompts stay the same size
+# whether the report covers 7 days or 180.
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from post_batch import day_to_str, str_to_day
+
+# summarize(text, budget_tokens) -> digest of at most ~budget_tokens
+Summarizer = Callable[[str, int], str]
+
+WEEK_DIGEST_TOKENS = 500
+PERIOD_DIGEST_TOKENS = 1500
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """tiktoken count for the chat model's encoding; ~4 characters per token if unavailable."""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")   # gpt-4o family
+        except Exception:
+            _encoding_failed = True   # not installed / encoding file not downloadable
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """Last-resort hard cap, cut on a line boundary where possible (binary search: O(log n) counts)."""
+    if count_tokens(text) <= budget:
+        return text
+    lines = text.splitlines()
+    lo, hi = 0, len(lines)   # invariant: the first lo lines fit, the first hi + 1 do not
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens("\n".join(lines[:mid])) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo:
+        return "\n".join(lines[:lo])
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:budget])
+    return text[: budget * 4]
+
+
+def week_key(date_str: str) -> str:
+    """Monday of the ISO week containing date_str (1970-01-01 was a Thursday)."""
+    day = str_to_day(date_str)
+    return str(day_to_str([day - (day + 3) % 7])[0])
+
+
+def pack(texts: Sequence[str], budget: int) -> List[str]:
+    """Greedy in-order packing of texts into chunks of at most `budget` tokens each."""
+    chunks, current, used = [], [], 0
+    for text in texts:
+        n = count_tokens(text)
+        if current and used + n > budget:
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(text)
+        used += n
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def reduce_to_budget(texts: Sequence[str], budget: int, summarize: Summarizer,
+                     map_fn: Optional[Callable[[List[Tuple[str, int]]], List[str]]] = None,
+                     max_rounds: int = 4) -> str:
+    """
+    Joined texts if they already fit; otherwise summarize budget-sized chunks (in parallel via
+    map_fn if given) and repeat on the results until they fit.
+    """
+    texts = [t for t in texts if t and t.strip()]
+    for _ in range(max_rounds):
+        joined = "\n\n".join(texts)
+        if count_tokens(joined) <= budget:
+            return joined
+        # Each chunk holds ~4 budgets of input and comes back as one budget of output
+        chunks = pack(texts, budget * 4)
+        jobs = [(chunk, budget if len(chunks) == 1 else max(budget // len(chunks), 100)) for chunk in chunks]
+        texts = map_fn(jobs) if map_fn else [summarize(chunk, b) for chunk, b in jobs]
+    return truncate_tokens("\n\n".join(texts), budget)
+
+
+def compact_daily_summaries(daily: Sequence[Tuple[str, str]], summarize: Summarizer,
+                            map_fn: Optional[Callable[[List[Tuple[str, int]]], List[str]]] = None,
+                            week_budget: int = WEEK_DIGEST_TOKENS,
+                            period_budget: int = PERIOD_DIGEST_TOKENS) -> Dict[str, object]:
+    """
+    daily: [(date_str, summary)] in date order. Returns {"weeks": [(week_start, digest)], "period": digest}.
+    Weeks that already fit their budget are passed through without an LLM call.
+    """
+    weeks: Dict[str, List[str]] = {}
+    for date_str, summary in daily:
+        weeks.setdefault(week_key(date_str), []).append(f"### {date_str}\n{summary}")
+
+    # Map: one digest per week (only weeks over budget are summarized)
+    week_texts = {w: "\n".join(items) for w, items in weeks.items()}
+    over = [w for w, text in week_texts.items() if count_tokens(text) > week_budget]
+    jobs = [(week_texts[w], week_budget) for w in over]
+    digests = map_fn(jobs) if map_fn else [summarize(t, b) for t, b in jobs]
+    week_texts.update({w: truncate_tokens(d, week_budget) for w, d in zip(over, digests)})
+
+    week_digests = [(w, week_texts[w]) for w in sorted(week_texts)]
+    # Reduce: weekly digests -> one period digest
+    period = reduce_to_budget([f"## Week of {w}\n{d}" for w, d in week_digests], period_budget, summarize, map_fn)
+    return {"weeks": week_digests, "period": period}
@@ -0,0 +1,2 @@
+# conftest.py
+# Lets pytest (run from the repository root) import the flat top-level modules from tests/.
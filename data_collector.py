@@ -8,16 +8,40 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.io as pio
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 warnings.filterwarnings("ignore")
 import streamlit as st
 
+import news_store
+from info_cache import get_ticker_info
+from app_config import get_secret
+from post_batch import PostBatch
+from near_dedup import NearDuplicateIndex
+from rate_limit import RateLimiter, QuotaExhausted
+
+BASE_URL = "https://www.alphavantage.co/query"
+
 def get_alpha_vantage_key() -> str:
     return st.secrets["ALPHA_VANTAGE_API_KEY"]
 
+# One limiter per process so every Streamlit session draws from the same API quota.
+# Free keys: 5/min, 25/day. Premium keys: raise ALPHA_VANTAGE_RPM / ALPHA_VANTAGE_WORKERS in secrets.
+_av_limiter: RateLimiter = None
+
+def get_alpha_vantage_limiter() -> RateLimiter:
+    global _av_limiter
+    if _av_limiter is None:
+        per_day = get_secret("ALPHA_VANTAGE_RPD")
+        _av_limiter = RateLimiter(
+            per_minute=float(get_secret("ALPHA_VANTAGE_RPM", 5)),
+            per_day=float(per_day) if per_day else None,
+            name="Alpha Vantage"
+        )
+    return _av_limiter
+
 def get_fundamental_data(ticker: str) -> dict:
-    stock = yf.Ticker(ticker)
-    info = stock.info
+    info = get_ticker_info(ticker)
     return {
         'Company Name': info.get('longName', 'N/A'),
         'Sector':       info.get('sector', 'N/A'),
@@ -36,19 +60,119 @@ def smooth_curve(x, y, window_size=3):
     y_max = y_series.rolling(window=window_size, min_periods=1).max().values
     return x, y_mean, y_min, y_max
     
-# ======================== Core Functions: Supports Date Range + Daily Limit + Save URL ========================
-def collect_social_data(
-    ticker: str,
-    daily_limit: int = 30,
-    start_date: str = None,    # "2025-01-01"
-    end_date: str = None       # "2025-12-08"
-) -> dict:
-    base_url = "https://www.alphavantage.co/query"
-    api_key = get_alpha_vantage_key()
-    all_posts = []
-    seen_titles = set()
-    daily_counter = defaultdict(int)
+class AlphaVantageRateLimited(RuntimeError):
+    """The API answered with a "Note"/"Information" rate-limit payload instead of a feed."""
+
+def _fetch_interval_feed(ticker: str, t_from: str, t_to: str, api_key: str) -> list:
+    """One NEWS_SENTIMENT call. Raises if the API answered with a note instead of a feed."""
+    params = {
+        "function": "NEWS_SENTIMENT",
+        "tickers": ticker.upper(),
+        "time_from": t_from,
+        "time_to": t_to,
+        "limit": news_store.FEED_PAGE_LIMIT,
+        "sort": "LATEST",
+        "apikey": api_key
+    }
+    resp = requests.get(BASE_URL, params=params, timeout=30)
+    payload = resp.json()
+    if "feed" not in payload:
+        # Rate-limit / error payloads ("Note", "Information") must never be cached as empty days
+        if "Note" in payload or "Information" in payload:
+            raise AlphaVantageRateLimited(payload.get("Note") or payload.get("Information"))
+        raise RuntimeError(f"Unexpected payload: {payload}")
+    return payload["feed"]
+
+MIN_POST_CHARS = 30   # title + summary shorter than this is not a usable post
+
+def _parse_item(item: dict):
+    """(full_text, pub_time) of a usable feed item, or None."""
+    full_text = (item.get("title", "") + " " + item.get("summary", "")).strip()
+    if len(full_text) < MIN_POST_CHARS:
+        return None
+    try:
+        return full_text, datetime.strptime(item.get("time_published", ""), "%Y%m%dT%H%M%S")
+    except (TypeError, ValueError):
+        return None
+
+def _usable_count(items: list, near_dup_threshold: float = None) -> int:
+    """Items of one stored day that survive iter_social_data's title dedup, filters and near-dedup."""
+    seen_titles, count = set(), 0
+    dedup_index = NearDuplicateIndex(threshold=near_dup_threshold) if near_dup_threshold else None
+    for item in items:
+        title = item.get("title", "")
+        if title in seen_titles:
+            continue
+        seen_titles.add(title)
+        parsed = _parse_item(item)
+        if parsed is None:
+            continue
+        if dedup_index is not None:
+            signature = dedup_index.signature(parsed[0])
+            if dedup_index.query(signature) is not None:
+                continue
+            dedup_index.insert(count, signature)
+        count += 1
+    return count
+
+def _usable_count_key(near_dup_threshold: float = None) -> str:
+    """news_store count_key of _usable_count (changes whenever its filters do)."""
+    return f"usable:{MIN_POST_CHARS}:{near_dup_threshold or 0}"
+
+def load_stored_posts(ticker: str, start_date: str, end_date: str) -> list:
+    """Posts already in the local news store for [start_date, end_date] (no API call), title-deduplicated."""
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    seen_titles, posts = set(), []
+    for item in news_store.load_items(ticker, start, end):
+        if item.get("title", "") in seen_titles:
+            continue
+        seen_titles.add(item.get("title", ""))
+        parsed = _parse_item(item)
+        if parsed is None:
+            continue
+        posts.append({"post": parsed[0], "time_published": parsed[1], "link": item.get("url", ""),
+                      "sentiment": float(item.get("overall_sentiment_score", 0))})
+    return posts
+
+def _refresh_interval(ticker: str, d_from, d_to, api_key: str, limiter: RateLimiter,
+                      use_cache: bool = True, max_retries: int = 3, daily_limit: int = None,
+                      near_dup_threshold: float = None) -> bool:
+    """
+    Make sure the news store covers [d_from, d_to], fetching only from the first missing day.
+    Closed days already holding daily_limit usable posts (e.g. fanned out from a peer) are not
+    refetched. Returns True if an API call was made. Safe to run from worker threads.
+    """
+    count_key = _usable_count_key(near_dup_threshold)
+    count_fn = lambda items: _usable_count(items, near_dup_threshold)
+    missing = news_store.missing_days(
+        ticker, d_from, d_to, satisfied_count=daily_limit, count_fn=count_fn, count_key=count_key
+    ) if use_cache else [d_from]
+    if not missing:
+        return False
+    fetch_from = missing[0]
+    for attempt in range(max_retries + 1):
+        try:
+            limiter.acquire()
+            feed = _fetch_interval_feed(ticker, fetch_from.strftime("%Y%m%dT0000"), d_to.strftime("%Y%m%dT2359"), api_key)
+            limiter.record_success()
+            news_store.save_items(ticker, feed, news_store.closed_days_for_fetch(fetch_from, d_to, feed),
+                                  counters={count_key: count_fn})
+            return True
+        except AlphaVantageRateLimited as e:
+            if attempt >= max_retries:
+                print(f"  请求失败 ({d_from} ~ {d_to}): {e}")
+                return True
+            limiter.backoff()
+        except QuotaExhausted as e:
+            print(f"  请求跳过 ({d_from} ~ {d_to}): {e}")
+            return False
+        except Exception as e:
+            print(f"  请求失败 ({d_from} ~ {d_to}): {e}")
+            return True
+    return True
 
+def _resolve_period(start_date: str = None, end_date: str = None):
     # 日期处理（保持原逻辑）
     if end_date is None:
         end_dt = datetime.now(timezone.utc).date()
@@ -59,36 +183,85 @@ def collect_social_data(
         start_dt = end_dt - timedelta(days=180)
     else:
         start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
+    return start_dt, end_dt
 
+def _build_intervals(start_dt, end_dt) -> list:
     # Construct an 8-day interval
     intervals = []
     current = start_dt
     while current <= end_dt:
         interval_start = current
         interval_end = min(current + timedelta(days=7), end_dt)
-        intervals.append((
-            interval_start.strftime("%Y%m%dT0000"),
-            interval_end.strftime("%Y%m%dT2359")
-        ))
+        intervals.append((interval_start, interval_end))
         current = interval_end + timedelta(days=1)
+    return intervals
 
-    print(f"为 {ticker} Capture sentiment data：{start_date or 'auto'} to {end_date or 'today'}，Maximum of {daily_limit} items per day")
+def _daily_summary(daily_scores: dict) -> dict:
+    """{date_str: [scores]} -> {date_str: {"count", "mean", "median"}}, sorted by date."""
+    return {
+        d: {
+            "count": len(scores),
+            "mean": float(np.mean(scores)),
+            "median": float(np.median(scores)),
+        }
+        for d, scores in sorted(daily_scores.items())
+    }
+
+# ======================== Streaming API: yields posts per interval as soon as it lands ========================
+def iter_social_data(
+    ticker: str,
+    daily_limit: int = 30,
+    start_date: str = None,    # "2025-01-01"
+    end_date: str = None,      # "2025-12-08"
+    use_cache: bool = True,    # False: ignore the local news store and re-download every interval
+    max_workers: int = None,   # Parallel interval fetches (default: ALPHA_VANTAGE_WORKERS secret, else 1)
+    near_dup_threshold: float = 0.6   # MinHash Jaccard above which articles collapse; None disables
+):
+    """
+    Generator version of collect_social_data. Yields one dict per interval, in interval order:
+        {"interval": (from, to), "posts": [new posts], "daily": running {date_str: count/mean/median},
+         "total": posts so far, "done": intervals done, "intervals": interval count, "fetched": bool,
+         "updated": posts yielded earlier whose dup_count grew (re-apply their metadata downstream)}
+    Fetching runs in background threads, so the consumer can chart / embed while later intervals download.
+    """
+    api_key = get_alpha_vantage_key()
+    limiter = get_alpha_vantage_limiter()
+    if max_workers is None:
+        max_workers = int(get_secret("ALPHA_VANTAGE_WORKERS", 1))
+    seen_titles = set()
+    daily_counter = defaultdict(int)
+    daily_scores = defaultdict(list)
+    total = 0
+    # Near-duplicate clusters: representative post dict keyed by its position; syndicated copies
+    # only bump the representative's dup_count and never reach daily_limit, the daily stats (same
+    # representatives-only basis as PostBatch.daily_stats) or the embeddings
+    dedup_index = NearDuplicateIndex(threshold=near_dup_threshold) if near_dup_threshold else None
+    representatives = {}
+    yielded_reps = 0    # representatives [0, yielded_reps) were already sent to the consumer
+    collapsed = 0
 
-    for i, (t_from, t_to) in enumerate(intervals): 
+    start_dt, end_dt = _resolve_period(start_date, end_date)
+    intervals = _build_intervals(start_dt, end_dt)
 
-        params = {
-            "function": "NEWS_SENTIMENT",
-            "tickers": ticker.upper(),
-            "time_from": t_from,
-            "time_to": t_to,
-            "limit": 1000,
-            "sort": "LATEST",
-            "apikey": api_key
-        }
+    print(f"为 {ticker} Capture sentiment data：{start_date or 'auto'} to {end_date or 'today'}，Maximum of {daily_limit} items per day")
 
-        try:
-            resp = requests.get(base_url, params=params, timeout=30)
-            data = resp.json().get("feed", [])
+    # The token bucket, not fixed sleeps, paces the calls. Intervals are consumed in submission order
+    # (later ones keep downloading meanwhile), so title dedup / near-dedup keep the same copy every run
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    futures = {
+        pool.submit(_refresh_interval, ticker, d_from, d_to, api_key, limiter, use_cache,
+                    daily_limit=daily_limit, near_dup_threshold=near_dup_threshold): (d_from, d_to)
+        for d_from, d_to in intervals
+    }
+    api_calls = 0
+    try:
+        for done, (future, (d_from, d_to)) in enumerate(futures.items(), start=1):
+            was_fetched = future.result()
+            api_calls += was_fetched
+
+            data = news_store.load_items(ticker, d_from, d_to)
+            new_posts = []
+            updated = {}
 
             for item in data:
                 title = item.get("title", "")
@@ -96,44 +269,114 @@ def collect_social_data(
                     continue
                 seen_titles.add(title)
 
-                full_text = (title + " " + item.get("summary", "")).strip()
-                if len(full_text) < 30:
-                    continue
-
-                time_str = item.get("time_published", "")
-                try:
-                    pub_time = datetime.strptime(time_str, "%Y%m%dT%H%M%S")
-                except:
+                parsed = _parse_item(item)
+                if parsed is None:
                     continue
+                full_text, pub_time = parsed
 
                 date_key = pub_time.strftime("%Y-%m-%d")
+                score = float(item.get("overall_sentiment_score", 0))
+
+                signature = None
+                if dedup_index is not None:
+                    signature = dedup_index.signature(full_text)
+                    rep_id = dedup_index.query(signature)
+                    if rep_id is not None:
+                        representatives[rep_id]["dup_count"] += 1
+                        if rep_id < yielded_reps:
+                            updated[rep_id] = representatives[rep_id]
+                        collapsed += 1
+                        continue
+
                 if daily_counter[date_key] >= daily_limit:
                     continue
 
-                score = float(item.get("overall_sentiment_score", 0))
+                # Per-ticker view of the article (relevance + ticker-specific sentiment)
+                entry = news_store.ticker_entry(item, ticker)
 
                 # ========== Key Addition: Preserve Original News URL ==========
                 link_url = item.get("url", "")  
 
-                all_posts.append({
+                new_posts.append({
                     "post": full_text,
                     "sentiment": round(score, 4),
                     "label": item.get("overall_sentiment_label", "Neutral").upper(),
                     "source": "Alpha Vantage",
                     "time_published": pub_time,
                     "date_str": date_key,
-                    "link": link_url  # ←←← Key field. This is what report_core reads.
+                    "link": link_url,  # ←←← Key field. This is what report_core reads.
+                    "relevance": float(entry.get("relevance_score", 0) or 0),
+                    "ticker_sentiment": float(entry.get("ticker_sentiment_score", score) or 0),
+                    "dup_count": 0,     # near-duplicate articles collapsed into this one
                 })
+                if dedup_index is not None:
+                    representatives[len(representatives)] = new_posts[-1]
+                    dedup_index.insert(len(representatives) - 1, signature)
                 daily_counter[date_key] += 1
+                daily_scores[date_key].append(round(score, 4))
 
-            print(f"  {t_from[:8]} ~ {t_to[:8]} → 已收集 {len(all_posts)} 条")
-            time.sleep(11)
+            total += len(new_posts)
+            print(f"  {d_from:%Y%m%d} ~ {d_to:%Y%m%d} → 已收集 {total} 条{'' if was_fetched else ' (cache)'}")
 
-        except Exception as e:
-            print(f"  请求失败: {e}")
-            time.sleep(15)
+            yield {
+                "interval": (d_from.strftime("%Y-%m-%d"), d_to.strftime("%Y-%m-%d")),
+                "posts": new_posts,
+                "daily": _daily_summary(daily_scores),
+                "total": total,
+                "done": done,
+                "intervals": len(intervals),
+                "fetched": was_fetched,
+                "updated": list(updated.values()),
+            }
+            yielded_reps = len(representatives)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    all_posts.sort(key=lambda x: x["time_published"], reverse=True)
+    print(f"  API calls: {api_calls} / {len(intervals)} intervals · near-duplicates collapsed: {collapsed}")
+
+# ======================== Trend chart (works on final or running daily aggregates) ========================
+def plot_sentiment_trend(ticker: str, daily: dict, start_date: str = None, end_date: str = None):
+    """daily: {date_str: {"count", "median", ...}} as produced by iter_social_data."""
+    dates = sorted(daily)
+    medians = [daily[d]["median"] for d in dates]
+    counts = [daily[d]["count"] for d in dates]
+
+    overall_avg_sentiment = float(np.mean(medians))
+
+    x_smooth, y_mean, y_min, y_max = smooth_curve(dates, medians, window_size=3)
+
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(x=x_smooth, y=y_min, mode='lines',
+                             line=dict(color='#FFA07A', width=2, dash='dash'), name='Lower Boundary', opacity=0.7))
+    fig.add_trace(go.Scatter(x=x_smooth, y=y_mean, mode='lines+markers',
+                             line=dict(color='#FF6B6B', width=3, shape='spline', smoothing=1.3), name='Rolling Score'))
+    fig.add_trace(go.Scatter(x=x_smooth, y=y_max, mode='lines',
+                             line=dict(color='#DC143C', width=2, dash='dash'), name='Upper Boundary', opacity=0.7))
+    fig.add_trace(go.Scatter(x=dates, y=medians, mode='markers',
+                             marker=dict(size=8, color='#FF8C00', symbol='circle-open', line=dict(color='#FF8C00', width=1.5)),
+                             name='Daily Score'))
+    fig.add_trace(go.Bar(x=dates, y=counts,
+                         name='Article Count', yaxis='y2', opacity=0.25, marker_color='#4ECDC4'))
+    fig.add_hline(y=overall_avg_sentiment, line_dash="dash", line_color="#2E8B57", line_width=2,
+                  annotation_text=f"  Avg: {overall_avg_sentiment:.4f}", annotation_position="top right")
+
+    fig.update_layout(
+        title=f"{ticker} Social Sentiment Trend ({start_date or 'Auto'} ~ {end_date or 'Today'})",
+        xaxis_title="Date",
+        yaxis_title="Sentiment Score",
+        yaxis2=dict(title="Articles", overlaying="y", side="right", showgrid=False),
+        template="plotly_white",
+        height=600,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig, overall_avg_sentiment
+
+def finalize_social_data(ticker: str, all_posts: list, daily: dict,
+                         start_date: str = None, end_date: str = None) -> dict:
+    """Pack the streamed posts into a time-sorted PostBatch and build the collect_social_data result."""
+    start_dt, end_dt = _resolve_period(start_date, end_date)
+    all_posts = PostBatch.from_posts(all_posts).sort_by_time(descending=True)
 
     # ======================== Generate a trend chart ========================
     img_path = None
@@ -142,39 +385,7 @@ def collect_social_data(
     overall_avg_sentiment = None
 
     if len(all_posts) >= 20:
-        df = pd.DataFrame(all_posts)
-        daily = df.groupby("date_str")["sentiment"].median().reset_index()
-        daily = daily.sort_values("date_str")
-
-        overall_avg_sentiment = daily["sentiment"].mean()
-
-        x_smooth, y_mean, y_min, y_max = smooth_curve(daily["date_str"].tolist(), daily["sentiment"].tolist(), window_size=3)
-
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(x=x_smooth, y=y_min, mode='lines',
-                                 line=dict(color='#FFA07A', width=2, dash='dash'), name='Lower Boundary', opacity=0.7))
-        fig.add_trace(go.Scatter(x=x_smooth, y=y_mean, mode='lines+markers',
-                                 line=dict(color='#FF6B6B', width=3, shape='spline', smoothing=1.3), name='Rolling Score'))
-        fig.add_trace(go.Scatter(x=x_smooth, y=y_max, mode='lines',
-                                 line=dict(color='#DC143C', width=2, dash='dash'), name='Upper Boundary', opacity=0.7))
-        fig.add_trace(go.Scatter(x=daily["date_str"], y=daily["sentiment"], mode='markers',
-                                 marker=dict(size=8, color='#FF8C00', symbol='circle-open', line=dict(color='#FF8C00', width=1.5)),
-                                 name='Daily Score'))
-        fig.add_trace(go.Bar(x=daily["date_str"], y=df.groupby("date_str").size(),
-                             name='Article Count', yaxis='y2', opacity=0.25, marker_color='#4ECDC4'))
-        fig.add_hline(y=overall_avg_sentiment, line_dash="dash", line_color="#2E8B57", line_width=2,
-                      annotation_text=f"  Avg: {overall_avg_sentiment:.4f}", annotation_position="top right")
-
-        fig.update_layout(
-            title=f"{ticker} Social Sentiment Trend ({start_date or 'Auto'} ~ {end_date or 'Today'})",
-            xaxis_title="Date",
-            yaxis_title="Sentiment Score",
-            yaxis2=dict(title="Articles", overlaying="y", side="right", showgrid=False),
-            template="plotly_white",
-            height=600,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
+        fig, overall_avg_sentiment = plot_sentiment_trend(ticker, daily, start_date, end_date)
 
     return {
         "posts": all_posts,
@@ -187,6 +398,24 @@ def collect_social_data(
         "avg_sentiment": round(overall_avg_sentiment, 4) if overall_avg_sentiment else None
     }
 
+# ======================== Core Functions: Supports Date Range + Daily Limit + Save URL ========================
+def collect_social_data(
+    ticker: str,
+    daily_limit: int = 30,
+    start_date: str = None,    # "2025-01-01"
+    end_date: str = None,      # "2025-12-08"
+    use_cache: bool = True,    # False: ignore the local news store and re-download every interval
+    max_workers: int = None,   # Parallel interval fetches (default: ALPHA_VANTAGE_WORKERS secret, else 1)
+    near_dup_threshold: float = 0.6   # MinHash Jaccard above which articles collapse; None disables
+) -> dict:
+    all_posts = []
+    daily = {}
+    for batch in iter_social_data(ticker, daily_limit, start_date, end_date, use_cache, max_workers,
+                                  near_dup_threshold):
+        all_posts.extend(batch["posts"])
+        daily = batch["daily"]
+    return finalize_social_data(ticker, all_posts, daily, start_date, end_date)
+
 # ======================== Local Test ========================
 if __name__ == "__main__":
     result = collect_social_data("NVDA", daily_limit=30, start_date="2025-06-01", end_date="2025-12-15")
@@ -0,0 +1,80 @@
+# embedding_cache.py
+# Persistent embedding cache: vectors are keyed by sha256(deployment + normalized text), so an
+# article embedded for one report window is never sent to Azure again for an overlapping one.
+import hashlib
+import re
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from disk_cache import SqliteCache, DISK_CACHE_DIR
+from rate_limit import AzureRateLimiter
+from compaction import count_tokens
+
+EMBEDDING_CACHE_PATH = f"{DISK_CACHE_DIR}/embeddings.sqlite"
+EMBEDDING_CACHE_MAX_BYTES = 512 * 1024 * 1024   # ~85k ada-002 vectors, LRU-evicted beyond this
+
+EMBED_BATCH_SIZE = 256
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def content_hash(text: str) -> str:
+    """Stable id for a piece of text (used as doc_id, independent of the embedding model)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings client; only texts missing from the cache reach the endpoint."""
+    def __init__(self, base: Embeddings, deployment: str, path: str = EMBEDDING_CACHE_PATH,
+                 limiter: Optional[AzureRateLimiter] = None, max_bytes: Optional[int] = EMBEDDING_CACHE_MAX_BYTES):
+        self.base = base
+        self.deployment = deployment
+        self.limiter = limiter
+        self.cache = SqliteCache(path, max_bytes=max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.deployment}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self._embed_missing(list(missing.values()))
+            fresh = {k: np.asarray(v, dtype=np.float32).tobytes() for k, v in zip(missing, vectors)}
+            self.cache.put_many(fresh)
+            found.update(fresh)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return [np.frombuffer(found[k], dtype=np.float32).tolist() for k in keys]
+
+    def _embed_missing(self, texts: List[str]) -> List[List[float]]:
+        if self.limiter is None:
+            return self.base.embed_documents(texts)
+        # Batches go through the shared RPM/TPM limiter. Billed embedding tokens are the input tokens,
+        # so the up-front count is the whole charge: Embeddings.embed_documents does not surface the
+        # response headers, and this limiter runs on its static RPM/TPM plus 429 back-off.
+        vectors: List[List[float]] = []
+        for i in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[i:i + EMBED_BATCH_SIZE]
+            with self.limiter.request(sum(count_tokens(t) for t in batch)):
+                vectors.extend(self.base.embed_documents(batch))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
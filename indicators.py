@@ -0,0 +1,181 @@
+# indicators.py
+# Incremental (O(1) per bar) indicator states: Wilder RSI / ATR (TA-Lib conventions) and simple
+# moving averages (pandas rolling().mean()). Every state works on a vector of `width` series at
+# once (one column per ticker), can be advanced bar by bar, and round-trips through to_dict()
+# so it can be stored next to the price store instead of recomputing a year of history per refresh.
+import copy
+from typing import Dict, Iterable
+
+import numpy as np
+
+
+def _vec(x, width: int) -> np.ndarray:
+    return np.broadcast_to(np.asarray(x, dtype=np.float64), (width,))
+
+
+class WilderState:
+    """Seeded with the mean of the first `period` valid values, then avg = (avg*(p-1) + x) / p."""
+    def __init__(self, period: int, width: int = 1):
+        self.period = period
+        self.width = width
+        self.count = np.zeros(width, dtype=np.int64)
+        self.total = np.zeros(width)
+        self.avg = np.full(width, np.nan)
+
+    def update(self, x) -> np.ndarray:
+        x = _vec(x, self.width)
+        valid = ~np.isnan(x)
+        seeding = valid & (self.count < self.period)
+        self.total[seeding] += x[seeding]
+        self.count[seeding] += 1
+        just_seeded = seeding & (self.count == self.period)
+        self.avg[just_seeded] = self.total[just_seeded] / self.period
+        smoothing = valid & ~seeding
+        self.avg[smoothing] = (self.avg[smoothing] * (self.period - 1) + x[smoothing]) / self.period
+        return np.where(just_seeded | smoothing, self.avg, np.nan)
+
+    def to_dict(self) -> Dict:
+        return {"period": self.period, "width": self.width, "count": self.count.tolist(),
+                "total": self.total.tolist(), "avg": self.avg.tolist()}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "WilderState":
+        state = cls(d["period"], d["width"])
+        state.count = np.asarray(d["count"], dtype=np.int64)
+        state.total = np.asarray(d["total"], dtype=np.float64)
+        state.avg = np.asarray(d["avg"], dtype=np.float64)
+        return state
+
+
+class RSIState:
+    """talib.RSI(close, period) advanced one bar at a time."""
+    def __init__(self, period: int = 14, width: int = 1):
+        self.width = width
+        self.prev_close = np.full(width, np.nan)
+        self.gain = WilderState(period, width)
+        self.loss = WilderState(period, width)
+
+    def update(self, close) -> np.ndarray:
+        close = _vec(close, self.width)
+        diff = close - self.prev_close                     # NaN on the first bar / missing bars
+        gain = self.gain.update(np.where(np.isnan(diff), np.nan, np.maximum(diff, 0.0)))
+        loss = self.loss.update(np.where(np.isnan(diff), np.nan, np.maximum(-diff, 0.0)))
+        self.prev_close = np.where(np.isnan(close), self.prev_close, close)
+        denom = gain + loss
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(denom > 0, 100.0 * gain / denom, np.where(np.isnan(denom), np.nan, 0.0))
+
+    def to_dict(self) -> Dict:
+        return {"prev_close": self.prev_close.tolist(), "gain": self.gain.to_dict(), "loss": self.loss.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "RSIState":
+        state = cls(d["gain"]["period"], d["gain"]["width"])
+        state.prev_close = np.asarray(d["prev_close"], dtype=np.float64)
+        state.gain = WilderState.from_dict(d["gain"])
+        state.loss = WilderState.from_dict(d["loss"])
+        return state
+
+
+class ATRState:
+    """talib.ATR(high, low, close, period) advanced one bar at a time."""
+    def __init__(self, period: int = 14, width: int = 1):
+        self.width = width
+        self.prev_close = np.full(width, np.nan)
+        self.tr = WilderState(period, width)
+
+    def update(self, high, low, close) -> np.ndarray:
+        high, low, close = _vec(high, self.width), _vec(low, self.width), _vec(close, self.width)
+        true_range = np.maximum(high, self.prev_close) - np.minimum(low, self.prev_close)
+        out = self.tr.update(true_range)
+        self.prev_close = np.where(np.isnan(close), self.prev_close, close)
+        return out
+
+    def to_dict(self) -> Dict:
+        return {"prev_close": self.prev_close.tolist(), "tr": self.tr.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "ATRState":
+        state = cls(d["tr"]["period"], d["tr"]["width"])
+        state.prev_close = np.asarray(d["prev_close"], dtype=np.float64)
+        state.tr = WilderState.from_dict(d["tr"])
+        return state
+
+
+class SMAState:
+    """rolling(window).mean() via a ring buffer; NaN until `window` consecutive valid bars."""
+    def __init__(self, window: int, width: int = 1):
+        self.window = window
+        self.width = width
+        self.buffer = np.full((window, width), np.nan)
+        self.pos = 0
+
+    def update(self, x) -> np.ndarray:
+        self.buffer[self.pos] = _vec(x, self.width)
+        self.pos = (self.pos + 1) % self.window
+        # window is small (<= 60) and fixed, so this stays O(1) per bar and drift-free
+        return self.buffer.mean(axis=0)
+
+    def to_dict(self) -> Dict:
+        return {"window": self.window, "width": self.width, "buffer": self.buffer.tolist(), "pos": self.pos}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "SMAState":
+        state = cls(d["window"], d["width"])
+        state.buffer = np.asarray(d["buffer"], dtype=np.float64).reshape(d["window"], d["width"])
+        state.pos = d["pos"]
+        return state
+
+
+class IndicatorState:
+    """RSI(14), ATR(14) and MA5/10/20/60 for `width` series, advanced together per bar."""
+    MA_WINDOWS = (5, 10, 20, 60)
+
+    def __init__(self, width: int = 1, period: int = 14):
+        self.width = width
+        self.bars = 0
+        self.last_date = None
+        self.rsi = RSIState(period, width)
+        self.atr = ATRState(period, width)
+        self.ma = {w: SMAState(w, width) for w in self.MA_WINDOWS}
+
+    def update(self, high, low, close, date=None) -> Dict[str, np.ndarray]:
+        values = {
+            "RSI (14)": self.rsi.update(close),
+            "ATR (14)": self.atr.update(high, low, close),
+        }
+        for w, state in self.ma.items():
+            values[f"MA{w}"] = state.update(close)
+        self.bars += 1
+        if date is not None:
+            self.last_date = str(date)
+        return values
+
+    def update_many(self, high: Iterable, low: Iterable, close: Iterable, dates: Iterable = None):
+        """Advance over a block of bars; returns the values after the last one (or None)."""
+        values = None
+        dates = list(dates) if dates is not None else [None] * len(close)
+        for h, l, c, d in zip(high, low, close, dates):
+            values = self.update(h, l, c, d)
+        return values
+
+    def peek(self, high, low, close) -> Dict[str, np.ndarray]:
+        """Values if this bar were appended, without committing it (for a still-forming bar)."""
+        return copy.deepcopy(self).update(high, low, close)
+
+    def to_dict(self) -> Dict:
+        return {
+            "width": self.width, "bars": self.bars, "last_date": self.last_date,
+            "rsi": self.rsi.to_dict(), "atr": self.atr.to_dict(),
+            "ma": {str(w): s.to_dict() for w, s in self.ma.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "IndicatorState":
+        state = cls(d["width"])
+        state.bars = d["bars"]
+        state.last_date = d["last_date"]
+        state.rsi = RSIState.from_dict(d["rsi"])
+        state.atr = ATRState.from_dict(d["atr"])
+        state.ma = {int(w): SMAState.from_dict(s) for w, s in d["ma"].items()}
+        return state
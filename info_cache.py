@@ -0,0 +1,81 @@
+# info_cache.py
+# Shared cache for yfinance `Ticker.info` (one of the slowest yfinance calls).
+# TTL + LRU eviction in memory, persisted to disk so new processes / Streamlit workers start warm.
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import yfinance as yf
+
+INFO_CACHE_PATH = "./data_cache/yf_info.json"
+INFO_CACHE_TTL = 12 * 3600         # fundamentals change at most daily
+INFO_CACHE_MAX_ENTRIES = 256       # > Nasdaq-100 universe, bounds memory and file size
+
+# ticker -> (fetched_at, info); most recently used last
+_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+_lock = threading.RLock()
+_loaded = False
+
+
+def _load_disk() -> None:
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        with open(INFO_CACHE_PATH, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return
+    for ticker, entry in sorted(entries.items(), key=lambda kv: kv[1].get("fetched_at", 0)):
+        _cache[ticker] = (entry.get("fetched_at", 0), entry.get("info") or {})
+    _evict()
+
+
+def _save_disk() -> None:
+    try:
+        os.makedirs(os.path.dirname(INFO_CACHE_PATH), exist_ok=True)
+        tmp_path = INFO_CACHE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({t: {"fetched_at": ts, "info": info} for t, (ts, info) in _cache.items()}, f, default=str)
+        os.replace(tmp_path, INFO_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️ Failed to persist yfinance info cache: {e}")
+
+
+def _evict() -> None:
+    while len(_cache) > INFO_CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def get_ticker_info(ticker: str, ttl: float = INFO_CACHE_TTL) -> Dict:
+    """yf.Ticker(ticker).info through the shared cache. Returns {} if unavailable."""
+    ticker = ticker.upper()
+    with _lock:
+        _load_disk()
+        entry = _cache.get(ticker)
+        if entry and time.time() - entry[0] < ttl:
+            _cache.move_to_end(ticker)
+            return entry[1]
+
+    try:
+        info = yf.Ticker(ticker).info or {}
+        if not isinstance(info, dict):
+            info = {}
+    except Exception as e:
+        print(f"⚠️ yfinance info failed for {ticker}: {e}")
+        # Serve stale data rather than nothing; don't cache the failure
+        return entry[1] if entry else {}
+
+    if not info:
+        return entry[1] if entry else {}
+
+    with _lock:
+        _cache[ticker] = (time.time(), info)
+        _cache.move_to_end(ticker)
+        _evict()
+        _save_disk()
+    return info
@@ -0,0 +1,44 @@
+# llm_cache.py
+# Persistent GPT response cache shared by every session and process. The key covers everything
+# that determines the answer: system prompt, query, context_str, chat deployment and the rendered
+# retrieved articles (text, sentiment scores, dup counts, links) — so a changed retrieval or
+# refreshed metadata is a cache miss, an identical prompt is instant.
+import hashlib
+import json
+import threading
+from typing import Optional
+
+from disk_cache import SqliteCache, DISK_CACHE_DIR
+
+LLM_CACHE_PATH = f"{DISK_CACHE_DIR}/llm_responses.sqlite"
+LLM_CACHE_MAX_BYTES = 64 * 1024 * 1024     # LRU-evicted beyond this
+UNAVAILABLE_ANSWER = "[Analysis unavailable]"
+
+_cache: Optional[SqliteCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> SqliteCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SqliteCache(LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES)
+        return _cache
+
+
+def response_cache_key(system_prompt: str, query: str, context_str: str, deployment: str,
+                       articles: str = "") -> str:
+    payload = json.dumps([system_prompt, query, context_str, deployment, articles], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    value = get_response_cache().get(key)
+    return value.decode("utf-8") if value is not None else None
+
+
+def put_cached_response(key: str, response: str) -> None:
+    """Failed or empty answers are not cached, so the next run asks again."""
+    if not response or not response.strip() or response.strip() == UNAVAILABLE_ANSWER:
+        return
+    get_response_cache().put(key, response.encode("utf-8"))
@@ -0,0 +1,106 @@
+# near_dedup.py
+# Near-duplicate article detection: MinHash signatures over word shingles + banded LSH index.
+# Syndicated wire stories ("... - Reuters", "... | Benzinga", reworded titles) collapse into one
+# representative. Each insert/query touches only its own LSH buckets, so a stream of N articles
+# costs ~O(N) instead of the O(N^2) of pairwise comparison.
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text: str, size: int = 2) -> np.ndarray:
+    """Hashed word n-grams of the normalized text (uint64 array of 32-bit hashes)."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+
+class NearDuplicateIndex:
+    """
+    Incremental MinHash-LSH index.
+        sig = index.signature(text)
+        rep = index.query(sig)        # id of an existing near-duplicate, or None
+        index.insert(doc_id, sig)     # add a representative
+    num_perm = bands * rows. With 20 bands x 4 rows, pairs at Jaccard 0.6 become candidates
+    ~94% of the time, pairs below 0.3 almost never; candidates are then verified against `threshold`.
+    Word bigrams are used because rewritten wire headlines mostly drop or swap single words.
+    """
+    def __init__(self, threshold: float = 0.6, bands: int = 20, rows: int = 4,
+                 shingle_size: int = 2, seed: int = 7):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        # Multiply-shift hashing: h(x) = ((a*x + b) mod 2^64) >> 32, a odd
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._buckets: Dict[Tuple[int, bytes], List[object]] = {}
+        self._signatures: Dict[object, np.ndarray] = {}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        grams = shingles(text, self.shingle_size)
+        if grams.size == 0:
+            return None
+        with np.errstate(over="ignore"):
+            hashed = (self._a[:, None] * grams[None, :] + self._b[:, None]) >> np.uint64(32)
+        return (hashed & _MASK32).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray):
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def query(self, sig: Optional[np.ndarray]):
+        """Best matching representative with estimated Jaccard >= threshold, else None."""
+        if sig is None:
+            return None
+        best_id, best_sim = None, self.threshold
+        seen = set()
+        for key in self._band_keys(sig):
+            for doc_id in self._buckets.get(key, ()):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                sim = float(np.mean(self._signatures[doc_id] == sig))
+                if sim >= best_sim:
+                    best_id, best_sim = doc_id, sim
+        return best_id
+
+    def insert(self, doc_id, sig: Optional[np.ndarray]) -> None:
+        if sig is None:
+            return
+        self._signatures[doc_id] = sig
+        for key in self._band_keys(sig):
+            self._buckets.setdefault(key, []).append(doc_id)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+def collapse_near_duplicates(texts: List[str], threshold: float = 0.6) -> Tuple[List[int], List[int]]:
+    """
+    Batch helper: returns (representative indices in input order, dup_count per representative).
+    The first occurrence of each cluster is kept as its representative.
+    """
+    index = NearDuplicateIndex(threshold=threshold)
+    reps, counts, slot = [], [], {}
+    for i, text in enumerate(texts):
+        sig = index.signature(text)
+        rep = index.query(sig)
+        if rep is not None:
+            counts[slot[rep]] += 1
+            continue
+        slot[i] = len(reps)
+        reps.append(i)
+        counts.append(0)
+        index.insert(i, sig)
+    return reps, counts
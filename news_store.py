@@ -0,0 +1,230 @@
+# news_store.py
+# Local on-disk store of raw Alpha Vantage NEWS_SENTIMENT feed items.
+#
+# Layout:  ./data_cache/news/<TICKER>/<YYYY-MM-DD>.json   -> {item_key: raw feed item}
+#          ./data_cache/news/<TICKER>/_complete.json       -> ["YYYY-MM-DD", ...]
+#          ./data_cache/news/<TICKER>/_counts.json         -> {"YYYY-MM-DD": {count_key: n}}
+#
+# A day is "complete" once a fetch covering it returned an untruncated feed and the
+# day is already closed (strictly before today, UTC). Complete days are never fetched again.
+#
+# Ticker fan-out: every item is also indexed under each ticker in its `ticker_sentiment`
+# block, so collecting NVDA pre-populates AMD/AVGO/MSFT... Fanned-out days are not complete,
+# but a closed day that already holds >= daily_limit usable items (as counted by the caller,
+# after its own filters) is good enough for a report. Those counts are stored per count_key:
+# computed when the ticker's own fetch writes the day, dropped when a write (e.g. fan-out)
+# changes the day, and backfilled once by missing_days when absent.
+import os
+import json
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Set
+
+NEWS_CACHE_DIR = "./data_cache/news"
+FEED_PAGE_LIMIT = 1000  # Alpha Vantage returns at most this many items per call
+
+_lock = threading.RLock()
+
+
+def _ticker_dir(ticker: str) -> str:
+    path = os.path.join(NEWS_CACHE_DIR, ticker.upper())
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _day_path(ticker: str, day: date) -> str:
+    return os.path.join(_ticker_dir(ticker), f"{day.isoformat()}.json")
+
+
+def _manifest_path(ticker: str) -> str:
+    return os.path.join(_ticker_dir(ticker), "_complete.json")
+
+
+def _counts_path(ticker: str) -> str:
+    return os.path.join(_ticker_dir(ticker), "_counts.json")
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path: str, data) -> None:
+    # Write to a temp file first so a crash never leaves a half-written cache file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def open_day() -> date:
+    """First day that is still receiving news (today, UTC); never marked complete."""
+    return datetime.now(timezone.utc).date()
+
+
+def item_day(item: dict):
+    try:
+        return datetime.strptime(item.get("time_published", "")[:8], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def item_key(item: dict) -> str:
+    return item.get("url") or f"{item.get('time_published', '')}|{item.get('title', '')}"
+
+
+def iter_days(start: date, end: date) -> Iterable[date]:
+    current = start
+    while current <= end:
+        yield current
+        current += timedelta(days=1)
+
+
+def load_complete_days(ticker: str) -> Set[str]:
+    with _lock:
+        return set(_read_json(_manifest_path(ticker), []))
+
+
+def count_items(ticker: str, day: date, count_fn: Callable[[List[dict]], int] = len) -> int:
+    """count_fn(stored items of the day); raw item count by default."""
+    with _lock:
+        items = list(_read_json(_day_path(ticker, day), {}).values())
+    return count_fn(items)
+
+
+def missing_days(ticker: str, start: date, end: date, satisfied_count: int = None,
+                 count_fn: Callable[[List[dict]], int] = len, count_key: str = None) -> List[date]:
+    """
+    Days in [start, end] that still need a fetch (incomplete or still open).
+    satisfied_count: also skip closed days that already hold at least this many items
+    (typically filled by fan-out from a peer's fetch), counted with count_fn — pass the
+    consumer's filters so raw items that would be deduplicated away do not count.
+    count_key names that count in _counts.json, so count_fn runs at most once per day write.
+    """
+    complete = load_complete_days(ticker)
+    today = open_day()
+    missing = []
+    with _lock:
+        counts = _read_json(_counts_path(ticker), {}) if count_key else {}
+        backfilled = False
+        for d in iter_days(start, end):
+            if d.isoformat() in complete:
+                continue
+            if satisfied_count and d < today:
+                n = counts.get(d.isoformat(), {}).get(count_key) if count_key else None
+                if n is None:
+                    n = count_items(ticker, d, count_fn)
+                    if count_key:
+                        counts.setdefault(d.isoformat(), {})[count_key] = n
+                        backfilled = True
+                if n >= satisfied_count:
+                    continue
+            missing.append(d)
+        if backfilled:
+            _write_json(_counts_path(ticker), counts)
+    return missing
+
+
+def load_items(ticker: str, start: date, end: date) -> List[dict]:
+    """All stored raw items for ticker in [start, end], newest first (same as sort=LATEST)."""
+    items = []
+    with _lock:
+        for day in iter_days(start, end):
+            items.extend(_read_json(_day_path(ticker, day), {}).values())
+    items.sort(key=lambda x: x.get("time_published", ""), reverse=True)
+    return items
+
+
+def ticker_entry(item: dict, ticker: str) -> dict:
+    """This ticker's element of the item's ticker_sentiment block ({} if not mentioned)."""
+    ticker = ticker.upper()
+    for entry in item.get("ticker_sentiment") or []:
+        if str(entry.get("ticker", "")).upper() == ticker:
+            return entry
+    return {}
+
+
+def mentioned_tickers(item: dict) -> List[str]:
+    # Skip "CRYPTO:BTC" / "FOREX:USD" style symbols; the store only tracks equities
+    return [
+        str(entry.get("ticker", "")).upper()
+        for entry in item.get("ticker_sentiment") or []
+        if entry.get("ticker") and ":" not in entry["ticker"]
+    ]
+
+
+def _merge_items(ticker: str, items: List[dict]) -> Dict[date, List[dict]]:
+    """Merge items into the day files; returns every touched day's stored items."""
+    by_day: Dict[date, List[dict]] = {}
+    for item in items:
+        day = item_day(item)
+        if day is not None:
+            by_day.setdefault(day, []).append(item)
+
+    merged: Dict[date, List[dict]] = {}
+    for day, day_items in by_day.items():
+        path = _day_path(ticker, day)
+        stored = _read_json(path, {})
+        for item in day_items:
+            stored[item_key(item)] = item
+        _write_json(path, stored)
+        merged[day] = list(stored.values())
+    return merged
+
+
+def _update_counts(ticker: str, merged: Dict[date, List[dict]],
+                   counters: Dict[str, Callable[[List[dict]], int]] = None) -> None:
+    """Replace the stored counts of rewritten days: counters' values, or none (backfilled later)."""
+    if not merged:
+        return
+    path = _counts_path(ticker)
+    counts = _read_json(path, {})
+    for day, items in merged.items():
+        counts[day.isoformat()] = {key: fn(items) for key, fn in (counters or {}).items()}
+    _write_json(path, counts)
+
+
+def save_items(ticker: str, items: List[dict], complete_days: Iterable[date] = (), fan_out: bool = True,
+               counters: Dict[str, Callable[[List[dict]], int]] = None) -> None:
+    """
+    Merge raw feed items into the per-day files and mark complete_days as done for `ticker`.
+    With fan_out, every item is also indexed under each other ticker it mentions.
+    counters ({count_key: count_fn}) are evaluated on `ticker`'s rewritten days and stored for
+    missing_days; fanned-out peers only have their stale counts dropped.
+    """
+    ticker = ticker.upper()
+    targets: Dict[str, List[dict]] = {ticker: list(items)}
+    if fan_out:
+        for item in items:
+            for peer in mentioned_tickers(item):
+                if peer != ticker:
+                    targets.setdefault(peer, []).append(item)
+
+    with _lock:
+        for target, target_items in targets.items():
+            _update_counts(target, _merge_items(target, target_items), counters if target == ticker else None)
+
+        complete_days = [d.isoformat() for d in complete_days]
+        if complete_days:
+            manifest = load_complete_days(ticker)
+            manifest.update(complete_days)
+            _write_json(_manifest_path(ticker), sorted(manifest))
+
+
+def closed_days_for_fetch(start: date, end: date, items: List[dict], limit: int = FEED_PAGE_LIMIT) -> List[date]:
+    """
+    Days of a fetched window [start, end] that can be marked complete.
+    A full page (len == limit) is truncated at its oldest end, so only the days after
+    the oldest returned item are trusted. Today and later are always left open.
+    """
+    first_trusted = start
+    if len(items) >= limit:
+        days = [d for d in (item_day(it) for it in items) if d is not None]
+        if not days:
+            return []
+        first_trusted = min(days) + timedelta(days=1)
+    last_closed = min(end, open_day() - timedelta(days=1))
+    return list(iter_days(first_trusted, last_closed))
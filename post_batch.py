@@ -0,0 +1,258 @@
+# post_batch.py
+# Columnar container for collected posts, shared by every module downstream of data_collector.
+# Dates are parsed once into day ordinals (days since 1970-01-01), label/source are stored as
+# categorical codes, so consumers group by integer arrays instead of re-parsing strings per row.
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+_EPOCH_DAY = np.datetime64("1970-01-01", "D")
+
+
+def _encode_categorical(values: Sequence[str]):
+    categories, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return codes.astype(np.int16), tuple(categories.tolist())
+
+
+# Optional numeric per-post fields carried through as extra columns
+EXTRA_COLUMNS = ("smooth_sentiment", "relevance", "ticker_sentiment", "dup_count")
+_INT_EXTRA_COLUMNS = {"dup_count"}
+_EXTRA_DEFAULTS = {"dup_count": 0}
+
+
+def _to_datetime64(ts) -> np.datetime64:
+    if not ts:
+        return np.datetime64("NaT")
+    if isinstance(ts, str) and "T" in ts and "-" not in ts:
+        ts = datetime.strptime(ts[:15], "%Y%m%dT%H%M%S")   # Alpha Vantage "20250115T133000"
+    try:
+        return np.datetime64(ts, "s")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def _object_column(values: List[Any]) -> np.ndarray:
+    # np.array() would turn equal-length strings / sequences into a 2-D array; fill a 1-D one instead
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def day_to_str(days: np.ndarray) -> np.ndarray:
+    """Day ordinals -> 'YYYY-MM-DD' strings."""
+    return np.datetime_as_string(np.asarray(days, dtype=np.int64).astype("datetime64[D]"), unit="D")
+
+
+def str_to_day(date_str: str) -> int:
+    return int((np.datetime64(date_str, "D") - _EPOCH_DAY).astype(np.int64))
+
+
+class PostBatch:
+    """
+    Column-oriented posts. Iterating / indexing with an int still yields the legacy post dict
+    ({"post", "sentiment", "label", "source", "time_published", "date_str", "link"}), so code that
+    expects a list of dicts keeps working.
+    """
+    COLUMNS = ("text", "sentiment", "day", "time", "label_codes", "source_codes", "link")
+
+    def __init__(self, text, sentiment, day, time, label_codes, labels, source_codes, sources,
+                 link, extra: Optional[Dict[str, np.ndarray]] = None):
+        self.text = np.asarray(text, dtype=object)
+        self.sentiment = np.asarray(sentiment, dtype=np.float64)
+        self.day = np.asarray(day, dtype=np.int32)            # days since 1970-01-01
+        self.time = np.asarray(time, dtype=np.int64)          # seconds since epoch (naive UTC)
+        self.label_codes = np.asarray(label_codes, dtype=np.int16)
+        self.labels = tuple(labels)
+        self.source_codes = np.asarray(source_codes, dtype=np.int16)
+        self.sources = tuple(sources)
+        self.link = np.asarray(link, dtype=object)
+        self.extra = dict(extra or {})                        # optional numeric columns, e.g. smooth_sentiment
+
+    # ---------------- construction ----------------
+    @classmethod
+    def from_posts(cls, posts: Iterable[Dict[str, Any]]) -> "PostBatch":
+        posts = list(posts)
+        n = len(posts)
+        # Column-wise fills (one comprehension per column) instead of a per-row loop over every field
+        text = _object_column([p.get("post") or p.get("full_text") or p.get("title") or "" for p in posts])
+        link = _object_column([p.get("link") or p.get("url") or "" for p in posts])
+        sentiment = np.fromiter((float(p.get("sentiment", 0)) for p in posts), dtype=np.float64, count=n)
+        times = np.array([_to_datetime64(p.get("time_published") or p.get("date_str")) for p in posts],
+                         dtype="datetime64[s]").reshape(n)
+        labels = [p.get("label", "NEUTRAL") for p in posts]
+        sources = [p.get("source", "") for p in posts]
+        # Extra columns present in any post; posts without one get its default (dup_count 0, else NaN)
+        present = set().union(*(p.keys() for p in posts)) if posts else set()
+        extra = {
+            k: np.fromiter((float(p.get(k, _EXTRA_DEFAULTS.get(k, np.nan))) for p in posts), dtype=np.float64, count=n)
+            for k in EXTRA_COLUMNS if k in present
+        }
+
+        valid = ~np.isnat(times)
+        if not valid.all():
+            text, link, sentiment, times = text[valid], link[valid], sentiment[valid], times[valid]
+            labels = [l for l, v in zip(labels, valid) if v]
+            sources = [s for s, v in zip(sources, valid) if v]
+            extra = {k: v[valid] for k, v in extra.items()}
+
+        label_codes, label_cats = _encode_categorical(labels)
+        source_codes, source_cats = _encode_categorical(sources)
+        epoch = times.astype(np.int64)
+        return cls(
+            text=text, sentiment=sentiment, day=epoch // 86400, time=epoch,
+            label_codes=label_codes, labels=label_cats,
+            source_codes=source_codes, sources=source_cats,
+            link=link, extra=extra,
+        )
+
+    @classmethod
+    def coerce(cls, posts: Union["PostBatch", Iterable[Dict[str, Any]], None]) -> "PostBatch":
+        """Accept a PostBatch as-is (no copy) or convert a legacy list of post dicts."""
+        if isinstance(posts, PostBatch):
+            return posts
+        return cls.from_posts(posts or [])
+
+    # ---------------- row access (legacy dict view) ----------------
+    def __len__(self) -> int:
+        return len(self.sentiment)
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        ts = self.time[i].astype("datetime64[s]").item()
+        row = {
+            "post": self.text[i],
+            "sentiment": float(self.sentiment[i]),
+            "label": self.labels[self.label_codes[i]] if self.labels else "NEUTRAL",
+            "source": self.sources[self.source_codes[i]] if self.sources else "",
+            "time_published": ts,
+            "date_str": ts.strftime("%Y-%m-%d"),
+            "link": self.link[i],
+        }
+        for k, v in self.extra.items():
+            row[k] = int(v[i]) if k in _INT_EXTRA_COLUMNS else float(v[i])
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            return self._row(int(key))
+        return self.take(np.arange(len(self))[key] if isinstance(key, slice) else key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def take(self, index) -> "PostBatch":
+        """Row subset by integer index array or boolean mask (columns are views/fancy-indexed)."""
+        return PostBatch(
+            text=self.text[index], sentiment=self.sentiment[index], day=self.day[index],
+            time=self.time[index], label_codes=self.label_codes[index], labels=self.labels,
+            source_codes=self.source_codes[index], sources=self.sources, link=self.link[index],
+            extra={k: v[index] for k, v in self.extra.items()},
+        )
+
+    def sort_by_time(self, descending: bool = True) -> "PostBatch":
+        return self.take(np.argsort(-self.time if descending else self.time, kind="stable"))
+
+    # ---------------- columns ----------------
+    @property
+    def label(self) -> np.ndarray:
+        return np.asarray(self.labels, dtype=object)[self.label_codes] if self.labels else np.array([], dtype=object)
+
+    @property
+    def date_str(self) -> np.ndarray:
+        # Format each distinct day once, then broadcast back
+        days, inverse = np.unique(self.day, return_inverse=True)
+        return day_to_str(days).astype(object)[inverse]
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame view for plotting/debugging; numeric columns are not copied."""
+        data = {
+            "post": self.text,
+            "sentiment": self.sentiment,
+            "day": self.day,
+            "date": self.day.astype(np.int64).astype("datetime64[D]"),
+            "time_published": self.time.astype("datetime64[s]"),
+            "label": pd.Categorical.from_codes(self.label_codes, categories=list(self.labels)) if self.labels else [],
+            "source": pd.Categorical.from_codes(self.source_codes, categories=list(self.sources)) if self.sources else [],
+            "link": self.link,
+        }
+        data.update(self.extra)
+        return pd.DataFrame(data, copy=False)
+
+    # ---------------- grouping ----------------
+    def group_by_day(self):
+        """
+        Returns (days, order, starts, counts): unique day ordinals ascending, a row order sorting
+        by (day, sentiment), and the slice start / length of each day inside that order.
+        """
+        order = np.lexsort((self.sentiment, self.day))
+        days, starts, counts = np.unique(self.day[order], return_index=True, return_counts=True)
+        return days, order, starts, counts
+
+    def daily_values(self, column: str = "sentiment") -> Dict[str, np.ndarray]:
+        """{date_str: values of `column` on that day (ascending sentiment order)}."""
+        values = self.sentiment if column == "sentiment" else self.extra[column]
+        days, order, starts, counts = self.group_by_day()
+        sorted_values = values[order]
+        return {str(d): sorted_values[s:s + c] for d, s, c in zip(day_to_str(days), starts, counts)}
+
+    def daily_stats(self) -> pd.DataFrame:
+        """Per-day count / mean / median of sentiment with no string parsing (vectorized)."""
+        days, order, starts, counts = self.group_by_day()
+        sorted_sent = self.sentiment[order]
+        sums = np.add.reduceat(sorted_sent, starts) if len(starts) else np.array([])
+        lo = starts + (counts - 1) // 2
+        hi = starts + counts // 2
+        stats = pd.DataFrame({
+            "day": days,
+            "date_str": day_to_str(days),
+            "count": counts,
+            "mean": sums / np.maximum(counts, 1),
+            "median": (sorted_sent[lo] + sorted_sent[hi]) / 2 if len(starts) else np.array([]),
+        })
+        for k, v in self.extra.items():
+            stats[k] = np.add.reduceat(v[order], starts) / counts if len(starts) else np.array([])
+        return stats
+
+    def bar_stats(self, bar_starts: np.ndarray, bar_seconds: int) -> pd.DataFrame:
+        """
+        Sentiment count / mean per price bar. bar_starts are ascending bar start times in epoch
+        seconds (same naive clock as `time`); posts outside every [start, start + bar_seconds)
+        window are dropped. One searchsorted + bincount, no per-bar loop.
+        """
+        bar_starts = np.asarray(bar_starts, dtype=np.int64)
+        n = len(bar_starts)
+        idx = np.searchsorted(bar_starts, self.time, side="right") - 1
+        inside = (idx >= 0) & (self.time < bar_starts[np.clip(idx, 0, max(n - 1, 0))] + bar_seconds) if n else \
+            np.zeros(len(self), dtype=bool)
+        idx = idx[inside]
+        counts = np.bincount(idx, minlength=n)
+        sums = np.bincount(idx, weights=self.sentiment[inside], minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(counts > 0, sums / counts, np.nan)
+        return pd.DataFrame({"bar_start": bar_starts, "count": counts, "mean": mean})
+
+    def sentiment_series(self, bucket_seconds: int = 3600, origin: Optional[int] = None) -> pd.DataFrame:
+        """
+        Dense fixed-width sentiment series (default hourly): bucket = (time - origin) // bucket_seconds,
+        counts / sums via bincount, empty buckets kept with count 0 and NaN mean. origin defaults to
+        the midnight before the first post, so hourly buckets start on the hour.
+        """
+        if len(self) == 0:
+            return pd.DataFrame({"bucket_start": np.array([], dtype="datetime64[s]"), "count": np.array([], dtype=np.int64),
+                                 "sum": np.array([]), "mean": np.array([])})
+        if origin is None:
+            origin = int(self.time.min()) // 86400 * 86400
+        buckets = (self.time - origin) // bucket_seconds
+        keep = buckets >= 0
+        buckets = buckets[keep]
+        n = int(buckets.max()) + 1 if len(buckets) else 0
+        counts = np.bincount(buckets, minlength=n)
+        sums = np.bincount(buckets, weights=self.sentiment[keep], minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(counts > 0, sums / counts, np.nan)
+        starts = origin + np.arange(n, dtype=np.int64) * bucket_seconds
+        return pd.DataFrame({"bucket_start": starts.astype("datetime64[s]"), "count": counts, "sum": sums, "mean": mean})
@@ -0,0 +1,344 @@
+# price_store.py
+# Per-ticker local OHLCV store (Parquet). The longest history is downloaded once; shorter
+# periods are slices of it, and each refresh appends only bars newer than the last stored date
+# (a new split or dividend re-bases the adjusted history, which is then downloaded again).
+# Intraday charts are served the same way from a stored 1-minute series (resampled on the fly).
+import os
+import json
+import time
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from indicators import IndicatorState
+
+PRICE_CACHE_DIR = "./data_cache/prices"
+PRICE_HISTORY_PERIOD = "2y"        # fetched once per ticker; covers every selectable period
+PRICE_REFRESH_SECONDS = 15 * 60    # how often the tail is re-checked for new bars
+ADJUSTMENT_RTOL = 1e-5             # re-downloaded closes differing by more → new adjustment basis
+
+# Periods servable from the daily store, as offsets back from today
+PERIOD_OFFSETS = {
+    "5d":  pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y":  pd.DateOffset(years=1),
+    "2y":  pd.DateOffset(years=2),
+}
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+# ticker -> (DataFrame indexed by tz-naive Date, time of last refresh)
+_memory: Dict[str, Tuple[pd.DataFrame, float]] = {}
+# ticker -> IndicatorState committed through every stored bar except the last (possibly partial) one
+_indicator_memory: Dict[str, IndicatorState] = {}
+_lock = threading.Lock()
+_indicator_lock = threading.Lock()
+
+
+def _path(ticker: str) -> str:
+    os.makedirs(PRICE_CACHE_DIR, exist_ok=True)
+    return os.path.join(PRICE_CACHE_DIR, f"{ticker.upper()}_1d.parquet")
+
+
+def _download(ticker: str, **kwargs) -> pd.DataFrame:
+    hist = yf.Ticker(ticker).history(interval="1d", **kwargs)
+    if hist is None or hist.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+    hist = hist.reindex(columns=OHLCV_COLUMNS)
+    # Daily bars: drop the exchange timezone so stored dates compare as plain calendar days
+    hist.index = pd.DatetimeIndex(hist.index).tz_localize(None).normalize()
+    hist.index.name = "Date"
+    return hist
+
+
+def _append(stored: pd.DataFrame, new_bars: pd.DataFrame) -> pd.DataFrame:
+    if new_bars.empty:
+        return stored
+    merged = pd.concat([stored, new_bars])
+    # The last stored bar may have been a partial (intraday) bar: newer download wins
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+
+def _needs_rebase(stored: pd.DataFrame, new_bars: pd.DataFrame) -> bool:
+    """
+    Yahoo bars are split/dividend adjusted: a new split or dividend re-bases every older bar, so
+    the stored history can no longer be extended and must be downloaded again.
+    """
+    if new_bars.empty:
+        return False
+    fresh = new_bars.loc[new_bars.index > stored.index[-1], ["Dividends", "Stock Splits"]]
+    if (fresh.fillna(0) != 0).to_numpy().any():
+        return True
+    # Finalized stored bars that were downloaded again must still match
+    overlap = stored.index[:-1].intersection(new_bars.index)
+    if overlap.empty:
+        return False
+    old = stored.loc[overlap, "Close"].to_numpy(dtype=np.float64)
+    new = new_bars.loc[overlap, "Close"].to_numpy(dtype=np.float64)
+    return not np.allclose(old, new, rtol=ADJUSTMENT_RTOL, atol=0.0, equal_nan=True)
+
+
+def load_daily_history(ticker: str, force_refresh: bool = False) -> pd.DataFrame:
+    """Full stored daily history for ticker, refreshed incrementally at most every PRICE_REFRESH_SECONDS."""
+    ticker = ticker.upper()
+    now = time.time()
+    with _lock:
+        cached = _memory.get(ticker)
+    if cached and not force_refresh and now - cached[1] < PRICE_REFRESH_SECONDS:
+        return cached[0]
+
+    path = _path(ticker)
+    stored, last_refresh = None, 0.0
+    if cached:
+        stored, last_refresh = cached
+    elif os.path.exists(path):
+        try:
+            stored = pd.read_parquet(path)
+            last_refresh = os.path.getmtime(path)
+        except Exception as e:
+            print(f"⚠️ Corrupt price store for {ticker}, re-downloading: {e}")
+
+    try:
+        if stored is None or stored.empty:
+            stored = _download(ticker, period=PRICE_HISTORY_PERIOD)
+            changed = True
+        elif force_refresh or now - last_refresh >= PRICE_REFRESH_SECONDS:
+            # Re-request from the last finalized bar: the last stored bar may be partial, the one
+            # before it is the reference for detecting a changed adjustment basis
+            start = stored.index[max(len(stored) - 2, 0)].strftime("%Y-%m-%d")
+            new_bars = _download(ticker, start=start)
+            if _needs_rebase(stored, new_bars):
+                print(f"🔄 Split/dividend adjustment changed for {ticker}, re-downloading history")
+                stored = _download(ticker, period=PRICE_HISTORY_PERIOD)
+                _reset_indicator_state(ticker)
+            else:
+                stored = _append(stored, new_bars)
+            changed = True
+        else:
+            changed = False
+        if changed and not stored.empty:
+            stored.to_parquet(path)
+        last_refresh = now if changed else last_refresh
+    except Exception as e:
+        print(f"⚠️ Price refresh failed for {ticker}: {e}")
+        if stored is None:
+            stored = pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+        last_refresh = now  # retry after the refresh interval, not on every rerun
+
+    with _lock:
+        _memory[ticker] = (stored, last_refresh)
+    return stored
+
+
+def get_daily_slice(ticker: str, period: str) -> pd.DataFrame:
+    """Bars of the requested period sliced from the local store (a local read, no Yahoo round trip)."""
+    history = load_daily_history(ticker)
+    if history.empty:
+        return history
+    start = pd.Timestamp.today().normalize() - PERIOD_OFFSETS[period]
+    return history.loc[history.index >= start]
+
+
+# ======================== Incremental indicators stored next to the prices ========================
+def _indicator_path(ticker: str) -> str:
+    os.makedirs(PRICE_CACHE_DIR, exist_ok=True)
+    return os.path.join(PRICE_CACHE_DIR, f"{ticker.upper()}_1d.indicators.json")
+
+
+def _load_indicator_state(ticker: str):
+    with _lock:
+        state = _indicator_memory.get(ticker)
+    if state is not None:
+        return state
+    try:
+        with open(_indicator_path(ticker), "r", encoding="utf-8") as f:
+            return IndicatorState.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _reset_indicator_state(ticker: str) -> None:
+    """Drop the persisted indicator state (history was re-downloaded on a new adjustment basis)."""
+    with _indicator_lock:
+        with _lock:
+            _indicator_memory.pop(ticker, None)
+        try:
+            os.remove(_indicator_path(ticker))
+        except OSError:
+            pass
+
+
+def get_indicator_values(ticker: str) -> Dict[str, float]:
+    """
+    Latest RSI(14) / ATR(14) / MA5-60 over the full stored daily history. The serialized state is
+    only advanced over bars appended since the last call (O(1) per bar); the last bar may still be
+    forming, so it is applied with peek() and never committed.
+    """
+    ticker = ticker.upper()
+    history = load_daily_history(ticker)
+    if history.empty:
+        return {}
+    committed = history.iloc[:-1]
+
+    with _indicator_lock:
+        state = _load_indicator_state(ticker)
+        if state is not None and state.last_date is not None:
+            last = pd.Timestamp(state.last_date)
+            # A rewritten history (e.g. store rebuilt) invalidates the state: start over
+            if last not in committed.index or state.bars != committed.index.get_loc(last) + 1:
+                state = None
+        if state is None or state.last_date is None:
+            state = IndicatorState()
+            new_bars = committed
+        else:
+            new_bars = committed.loc[committed.index > pd.Timestamp(state.last_date)]
+
+        if not new_bars.empty:
+            state.update_many(new_bars["High"].to_numpy(), new_bars["Low"].to_numpy(),
+                              new_bars["Close"].to_numpy(), new_bars.index.strftime("%Y-%m-%d"))
+            try:
+                with open(_indicator_path(ticker), "w", encoding="utf-8") as f:
+                    json.dump(state.to_dict(), f)
+            except OSError as e:
+                print(f"⚠️ Failed to persist indicator state for {ticker}: {e}")
+        with _lock:
+            _indicator_memory[ticker] = state
+
+    last_bar = history.iloc[-1]
+    values = state.peek(last_bar["High"], last_bar["Low"], last_bar["Close"])
+    return {k: float(v[0]) for k, v in values.items()}
+
+
+# ======================== Intraday: one stored 1-minute series, coarser bars resampled locally ========================
+INTRADAY_BASE_PERIOD = "7d"          # Yahoo serves 1m bars for the last ~7 days per request
+INTRADAY_KEEP_DAYS = 30              # stored 1m window (Yahoo keeps 1m history for ~30 days)
+SESSION_ANCHOR_SECONDS = 9 * 3600 + 30 * 60   # bars are aligned to the 09:30 open (e.g. 1h = 09:30, 10:30, ...)
+EXCHANGE_TZ = "America/New_York"     # clock of the stored intraday bars (posts are stamped in UTC)
+
+# Intraday intervals servable from the 1m store -> bar length in seconds
+INTRADAY_SECONDS = {
+    "1m":  60,
+    "5m":  5 * 60,
+    "15m": 15 * 60,
+    "1h":  60 * 60,
+}
+
+_intraday_memory: Dict[str, Tuple[pd.DataFrame, float]] = {}
+
+
+def _intraday_path(ticker: str) -> str:
+    os.makedirs(PRICE_CACHE_DIR, exist_ok=True)
+    return os.path.join(PRICE_CACHE_DIR, f"{ticker.upper()}_1m.parquet")
+
+
+def _download_minutes(ticker: str, **kwargs) -> pd.DataFrame:
+    hist = yf.Ticker(ticker).history(interval="1m", **kwargs)
+    if hist is None or hist.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+    hist = hist.reindex(columns=OHLCV_COLUMNS)
+    # Exchange wall-clock time without tz, so session hours read 09:30-16:00; post timestamps are
+    # UTC, convert with exchange_to_utc_seconds before comparing the two
+    hist.index = pd.DatetimeIndex(hist.index).tz_localize(None)
+    hist.index.name = "Date"
+    return hist
+
+
+def exchange_to_utc_seconds(times) -> np.ndarray:
+    """Stored (tz-naive, EXCHANGE_TZ wall-clock) bar times -> epoch seconds UTC, the post clock."""
+    index = pd.DatetimeIndex(pd.to_datetime(times))
+    index = index.tz_localize(EXCHANGE_TZ, ambiguous=False, nonexistent="shift_forward").tz_convert("UTC")
+    return index.tz_localize(None).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+
+def load_minute_history(ticker: str, force_refresh: bool = False) -> pd.DataFrame:
+    """Stored 1m bars for ticker (last INTRADAY_KEEP_DAYS), refreshed incrementally like the daily store."""
+    ticker = ticker.upper()
+    now = time.time()
+    with _lock:
+        cached = _intraday_memory.get(ticker)
+    if cached and not force_refresh and now - cached[1] < PRICE_REFRESH_SECONDS:
+        return cached[0]
+
+    path = _intraday_path(ticker)
+    stored, last_refresh = None, 0.0
+    if cached:
+        stored, last_refresh = cached
+    elif os.path.exists(path):
+        try:
+            stored = pd.read_parquet(path)
+            last_refresh = os.path.getmtime(path)
+        except Exception as e:
+            print(f"⚠️ Corrupt intraday store for {ticker}, re-downloading: {e}")
+
+    try:
+        if stored is None or stored.empty:
+            stored = _download_minutes(ticker, period=INTRADAY_BASE_PERIOD)
+            changed = True
+        elif force_refresh or now - last_refresh >= PRICE_REFRESH_SECONDS:
+            # 1m requests may span at most ~7 days: a stale store is topped up with the whole window
+            if pd.Timestamp.now() - stored.index[-1] > pd.Timedelta(INTRADAY_BASE_PERIOD):
+                new_bars = _download_minutes(ticker, period=INTRADAY_BASE_PERIOD)
+            else:
+                new_bars = _download_minutes(ticker, start=stored.index[-1].strftime("%Y-%m-%d"))
+            stored = _append(stored, new_bars)
+            changed = True
+        else:
+            changed = False
+        if changed and not stored.empty:
+            cutoff = stored.index[-1].normalize() - pd.Timedelta(days=INTRADAY_KEEP_DAYS)
+            stored = stored.loc[stored.index >= cutoff]
+            stored.to_parquet(path)
+        last_refresh = now if changed else last_refresh
+    except Exception as e:
+        print(f"⚠️ Intraday refresh failed for {ticker}: {e}")
+        if stored is None:
+            stored = pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+        last_refresh = now
+
+    with _lock:
+        _intraday_memory[ticker] = (stored, last_refresh)
+    return stored
+
+
+def bar_starts(index: pd.DatetimeIndex, seconds: int) -> np.ndarray:
+    """Start (epoch seconds, same wall clock as index) of the `seconds`-long bar each timestamp falls in."""
+    ts = index.to_numpy().astype("datetime64[s]").astype(np.int64)
+    return (ts - SESSION_ANCHOR_SECONDS) // seconds * seconds + SESSION_ANCHOR_SECONDS
+
+
+def resample_bars(minutes: pd.DataFrame, seconds: int) -> pd.DataFrame:
+    """Aggregate 1m bars into `seconds` bars (first Open, max High, min Low, last Close, summed Volume)."""
+    if minutes.empty or seconds <= 60:
+        return minutes
+    keys = bar_starts(minutes.index, seconds)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    bars = pd.DataFrame({
+        "Open": minutes["Open"].to_numpy()[starts],
+        "High": np.maximum.reduceat(minutes["High"].to_numpy(dtype=np.float64), starts),
+        "Low": np.minimum.reduceat(minutes["Low"].to_numpy(dtype=np.float64), starts),
+        "Close": minutes["Close"].to_numpy()[ends],
+        "Volume": np.add.reduceat(minutes["Volume"].to_numpy(dtype=np.float64), starts),
+        "Dividends": np.add.reduceat(minutes["Dividends"].fillna(0).to_numpy(dtype=np.float64), starts),
+        "Stock Splits": minutes["Stock Splits"].fillna(0).to_numpy(dtype=np.float64)[ends],
+    }, index=pd.DatetimeIndex(keys[starts].astype("datetime64[s]"), name="Date"))
+    return bars
+
+
+def get_intraday_slice(ticker: str, interval: str, period: str = "5d") -> pd.DataFrame:
+    """
+    `interval` bars (see INTRADAY_SECONDS) for the last N trading sessions, period given as "Nd".
+    Every interval comes from the single stored 1m series — no per-interval download.
+    """
+    minutes = load_minute_history(ticker)
+    if minutes.empty:
+        return minutes
+    sessions = max(int(period.rstrip("d")), 1)
+    days = minutes.index.normalize().unique()
+    minutes = minutes.loc[minutes.index >= days[-min(sessions, len(days))]]
+    return resample_bars(minutes, INTRADAY_SECONDS[interval])
@@ -0,0 +1,259 @@
+# rate_limit.py
+# Thread-safe token-bucket limiters shared by every caller in the process
+# (all Streamlit sessions run in one process, so they share the same quota).
+import time
+import threading
+from typing import Dict, Optional
+
+
+class QuotaExhausted(RuntimeError):
+    """Raised when a non-blocking bucket (e.g. requests/day) has no tokens left."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens, refilled continuously at
+    `refill_per_second`. acquire() blocks until enough tokens are available.
+    """
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are taken; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.refill_per_second
+            time.sleep(wait)
+            waited += wait
+
+    def drain(self) -> None:
+        """Drop all tokens, e.g. after the server told us we are over quota."""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+
+class RateLimiter:
+    """
+    requests/minute (blocking) + optional requests/day (non-blocking) limiter with
+    adaptive back-off: every server-side rate-limit response pauses all callers for
+    an exponentially growing penalty, reset by the next successful call.
+    """
+    def __init__(self, per_minute: float, per_day: Optional[float] = None,
+                 base_penalty: float = 15.0, max_penalty: float = 120.0, name: str = "api"):
+        self.name = name
+        self.minute_bucket = TokenBucket(capacity=max(1.0, per_minute), refill_per_second=per_minute / 60.0)
+        self.day_bucket = TokenBucket(capacity=per_day, refill_per_second=per_day / 86400.0) if per_day else None
+        self.base_penalty = base_penalty
+        self.max_penalty = max_penalty
+        self._penalty = base_penalty
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                pause = self._paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            time.sleep(pause)
+        self.minute_bucket.acquire()
+        if self.day_bucket is not None and not self.day_bucket.try_acquire():
+            raise QuotaExhausted(f"{self.name}: daily request quota exhausted")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._penalty = self.base_penalty
+
+    def backoff(self) -> float:
+        """Called when the server answered with a rate-limit notice; returns the pause length."""
+        with self._lock:
+            pause = self._penalty
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._penalty = min(self._penalty * 2, self.max_penalty)
+        self.minute_bucket.drain()
+        print(f"⏳ {self.name} rate limit hit, backing off {pause:.0f}s...")
+        return pause
+
+
+# ======================== Azure OpenAI: RPM + TPM buckets, server headers, AIMD concurrency ========================
+def _header(headers, name: str) -> Optional[str]:
+    if not headers:
+        return None
+    try:
+        return headers.get(name) or headers.get(name.title())
+    except AttributeError:
+        return None
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Retry-After / retry-after-ms from a response, in seconds (None if absent or unparsable)."""
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = _header(headers, name)
+        if value is not None:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                continue
+    return None
+
+
+class _Lease:
+    def __init__(self, limiter: "AzureRateLimiter", tokens: float):
+        self.limiter = limiter
+        self.tokens = tokens          # TPM charged up front (estimate)
+        self.actual_tokens = None     # filled from the usage report, refunds/charges the difference
+
+    def __enter__(self) -> "_Lease":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.limiter._finish(self, exc)
+        return False
+
+    def observe(self, headers=None, total_tokens: Optional[int] = None) -> None:
+        self.limiter.observe(headers, total_tokens, lease=self)
+
+
+class AzureRateLimiter:
+    """
+    Process-wide limiter for one Azure OpenAI deployment (every session and thread shares it):
+      - requests/minute and tokens/minute token buckets (estimated tokens charged before the call,
+        corrected with the reported usage afterwards);
+      - x-ratelimit-remaining-requests / -tokens response headers clamp the local buckets to the
+        server's view, Retry-After pauses every caller;
+      - AIMD concurrency: +1/limit per success up to max_concurrency, halved on every 429.
+
+        with limiter.request(estimated_tokens) as lease:
+            ...call...; lease.observe(headers, total_tokens)
+    """
+    def __init__(self, rpm: float, tpm: float, max_concurrency: int = 8, initial_concurrency: int = 2,
+                 base_penalty: float = 5.0, max_penalty: float = 60.0, name: str = "Azure OpenAI"):
+        self.name = name
+        self.requests = TokenBucket(capacity=max(1.0, rpm), refill_per_second=rpm / 60.0)
+        self.tokens = TokenBucket(capacity=max(1.0, tpm), refill_per_second=tpm / 60.0)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = float(min(initial_concurrency, self.max_concurrency))
+        self.base_penalty = base_penalty
+        self.max_penalty = max_penalty
+        self._penalty = base_penalty
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self.stats = {"requests": 0, "throttled": 0, "waited": 0.0}
+
+    # ---------------- admission ----------------
+    def _wait_pause(self) -> float:
+        waited = 0.0
+        while True:
+            with self._cond:
+                pause = self._paused_until - time.monotonic()
+            if pause <= 0:
+                return waited
+            time.sleep(pause)
+            waited += pause
+
+    def request(self, estimated_tokens: float = 1000.0) -> _Lease:
+        """Blocks until a concurrency slot, one request and estimated_tokens of TPM are available."""
+        tokens = min(float(estimated_tokens), self.tokens.capacity)
+        waited = self._wait_pause()
+        start = time.monotonic()
+        with self._cond:
+            while self._in_flight >= int(self.concurrency):
+                self._cond.wait()
+            self._in_flight += 1
+        waited += time.monotonic() - start
+        try:
+            waited += self.requests.acquire()
+            waited += self.tokens.acquire(tokens)
+        except BaseException:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats["requests"] += 1
+            self.stats["waited"] += waited
+        return _Lease(self, tokens)
+
+    # ---------------- feedback ----------------
+    def observe(self, headers=None, total_tokens: Optional[int] = None, lease: Optional[_Lease] = None) -> None:
+        """Feed a response's headers back; total_tokens corrects the TPM charged to lease."""
+        if total_tokens is not None and lease is not None:
+            lease.actual_tokens = total_tokens
+        for name, bucket in (("x-ratelimit-remaining-requests", self.requests),
+                             ("x-ratelimit-remaining-tokens", self.tokens)):
+            value = _header(headers, name)
+            if value is None:
+                continue
+            try:
+                remaining = float(value)
+            except ValueError:
+                continue
+            with bucket._lock:
+                bucket._refill(time.monotonic())
+                bucket._tokens = min(bucket._tokens, remaining)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """429 from the server: halve concurrency, pause everyone for Retry-After (or a back-off)."""
+        with self._cond:
+            pause = retry_after if retry_after is not None else self._penalty
+            self._penalty = min(self._penalty * 2, self.max_penalty)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self.stats["throttled"] += 1
+        self.requests.drain()
+        print(f"⏳ {self.name} rate limit hit: pausing {pause:.1f}s, concurrency → {int(self.concurrency)}")
+        return pause
+
+    def _finish(self, lease: _Lease, exc: Optional[BaseException]) -> None:
+        if lease.actual_tokens is not None:
+            diff = lease.actual_tokens - lease.tokens
+            with self.tokens._lock:
+                self.tokens._refill(time.monotonic())
+                self.tokens._tokens = min(self.tokens.capacity, self.tokens._tokens - diff)
+        if exc is not None and getattr(exc, "status_code", None) == 429:
+            response = getattr(exc, "response", None)
+            self.on_rate_limited(retry_after_seconds(getattr(response, "headers", None)))
+        with self._cond:
+            self._in_flight -= 1
+            if exc is None:
+                self._penalty = self.base_penalty
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1.0 / self.concurrency)
+            self._cond.notify_all()
+
+
+_azure_limiters: Dict[str, AzureRateLimiter] = {}
+_azure_limiters_lock = threading.Lock()
+
+
+def get_azure_limiter(deployment: str, rpm: float, tpm: float, max_concurrency: int = 8) -> AzureRateLimiter:
+    """One limiter per deployment per process (Azure quotas are per deployment)."""
+    with _azure_limiters_lock:
+        limiter = _azure_limiters.get(deployment)
+        if limiter is None:
+            limiter = _azure_limiters[deployment] = AzureRateLimiter(
+                rpm=rpm, tpm=tpm, max_concurrency=max_concurrency, name=f"Azure OpenAI ({deployment})")
+        return limiter
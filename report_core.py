@@ -1,42 +1,54 @@
 # report_core.py
 import os
-import uuid
+import json
 import time
 import shutil
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Callable, Dict, Iterator, List, Any, Union
 import numpy as np
 import threading
+import queue
+import streamlit as st
 
 from report_utils import (
     retry_on_azure_error,
-    throttle,
     get_unique_chroma_dir,
     clean_chroma_temp_dirs,
     get_llm,
     get_embeddings,
     parse_timestamp_to_date,
     group_comments_by_date,
-    detect_sentiment_anomalies
+    detect_sentiment_anomalies,
+    detect_intraday_anomalies,
+    llm_request,
+    llm_config,
+    get_azure_config,
+    api_version_at_least,
+    JSON_MODE_API_VERSION,
+    LLM_MAX_OUTPUT_TOKENS,
+    LLM_CONTEXT_TOKENS,
+    run_concurrently
 )
+from openai import RateLimitError
+
+from post_batch import PostBatch, day_to_str, str_to_day
+from app_config import get_secret
+from stage_scheduler import StageScheduler
+from embedding_cache import content_hash
+from vector_index import DatePartitionedIndex, PersistentTickerIndex, RetrievalPlanner, chroma_update_metadata
+from llm_cache import response_cache_key, get_cached_response, put_cached_response
+from compaction import compact_daily_summaries, reduce_to_budget, truncate_tokens, count_tokens
 
 from langchain_core.documents import Document
 from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
+VectorStore = Union[Chroma, DatePartitionedIndex, PersistentTickerIndex]
 
-# ==================== 核心 RAG 工具（强制带来源链接 + 防幻觉）===================
-@retry_on_azure_error(max_retries=5, delay=3, backoff=1.5)
-@throttle(seconds=3.0)
-def get_rag_response_with_context(
-    query: str, vector_db: Chroma, system_prompt: str,
-    context_str: str = "", date_filter: str = None, top_k: int = 15
-) -> str:
 
-    # 加强 system prompt：强制要求引用来源
-    enhanced_system = system_prompt + "\n\n" + """
+# ==================== 核心 RAG 工具（强制带来源链接 + 防幻觉）===================
+CITATION_RULE = """
 CRITICAL CITATION RULE:
 When referencing any specific comment, evidence, or event in your analysis,
 you MUST include the corresponding '(Sentiment:[SCORE], Source: URL)' exactly as it appears below the comment.
@@ -44,6 +56,21 @@ Do not omit, paraphrase, or hide the Source line. This ensures full transparency
 Additionally, do not use "$" mark in your answer and quote to avoid Markdown problems. Answer in a structured bullet format.
 """
 
+@retry_on_azure_error(max_retries=5, delay=3, backoff=1.5)
+def get_rag_response_with_context(
+    query: str, vector_db: VectorStore, system_prompt: str,
+    context_str: str = "", date_filter: str = None, top_k: int = 15,
+    planner: RetrievalPlanner = None, use_cache: bool = True,
+    on_token: Callable[[str], None] = None, on_reset: Callable[[], None] = None
+) -> str:
+    """
+    on_token: called with each streamed chunk of the answer (or once with a cached answer).
+    on_reset: called when a streamed attempt fails after emitting chunks (the retry streams anew).
+    """
+
+    # 加强 system prompt：强制要求引用来源
+    enhanced_system = system_prompt + "\n\n" + CITATION_RULE
+
     prompt = ChatPromptTemplate.from_messages([
         ("system", enhanced_system),
         ("human", """
@@ -64,29 +91,285 @@ Answer in clear, professional English.
 """)
     ])
 
-    chain = (
-        {"context": lambda x: retrieve_relevant_comments(vector_db, x["query"], x.get("date_filter"), x["top_k"]),
-         "context_str": RunnablePassthrough(), "query": RunnablePassthrough(),
-         "top_k": RunnablePassthrough(), "date_filter": RunnablePassthrough()}
-        | prompt | get_llm() | StrOutputParser()
-    )
-
+    chain = prompt | get_llm() | StrOutputParser()
+
+    # Retrieve first: the rendered articles are part of the response cache key
+    docs = retrieve_documents(vector_db, query, date_filter, top_k, planner)
+    articles = format_comments(docs)
+    cache_key = response_cache_key(enhanced_system, query, context_str, get_azure_config()["chat_deployment"],
+                                   articles)
+    if use_cache:
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            return cached
+
+    inputs = {
+        "query": query,
+        "context_str": context_str,
+        "top_k": top_k,
+        "context": articles
+    }
+    # Shared RPM/TPM limiter: callers may run concurrently (see run_concurrently)
     try:
-        return chain.invoke({
-            "query": query,
-            "context_str": context_str,
-            "top_k": top_k,
-            "date_filter": date_filter
-        }).strip()
+        with llm_request(enhanced_system, inputs["context"], context_str, query) as lease:
+            if on_token is None:
+                answer = chain.invoke(inputs, config=llm_config(lease)).strip()
+            else:
+                parts = []
+                try:
+                    for chunk in chain.stream(inputs, config=llm_config(lease)):
+                        parts.append(chunk)
+                        on_token(chunk)
+                except Exception:
+                    if parts and on_reset is not None:
+                        on_reset()
+                    raise
+                answer = "".join(parts).strip()
+        put_cached_response(cache_key, answer)
+        return answer
+    except RateLimitError:
+        raise  # the limiter already paused every caller; retried by retry_on_azure_error
     except Exception as e:
         print(f"RAG failed: {e}")
         return "[Analysis unavailable]"
 
 
+# ==================== 多日期批量请求（每日事件时间线）===================
+DAILY_ANSWER_TOKENS = 450       # one date's cited bullets in the JSON answer
+DAILY_PROMPT_RESERVE_TOKENS = 1000   # instructions + JSON format spec around the articles
+# Dates per request sized by the output budget (80% of max_tokens), so the JSON is not cut off
+DAILY_BATCH_MAX_DATES = max(1, int(LLM_MAX_OUTPUT_TOKENS * 0.8) // DAILY_ANSWER_TOKENS)
+
+def daily_batch_tokens(prompt_tokens: int = 0) -> int:
+    """
+    Retrieved-article tokens one batched request may carry (Secrets: DAILY_BATCH_TOKENS). Default:
+    the context window minus the answer reservation and the prompt, capped at half the TPM so a
+    batch is admitted without draining the whole minute's allowance.
+    """
+    configured = get_secret("DAILY_BATCH_TOKENS")
+    if configured:
+        return int(configured)
+    window = int(get_secret("AZURE_OPENAI_CONTEXT_TOKENS", LLM_CONTEXT_TOKENS))
+    room = window - LLM_MAX_OUTPUT_TOKENS - DAILY_PROMPT_RESERVE_TOKENS - prompt_tokens
+    tpm_share = int(float(get_secret("AZURE_OPENAI_TPM", 60000)) / 2)
+    return max(DAILY_ANSWER_TOKENS, min(room, tpm_share))
+
+def _pack_dates(dates: List[str], sizes: Dict[str, int], budget: int,
+                max_dates: int = DAILY_BATCH_MAX_DATES) -> List[List[str]]:
+    """Greedy in-order packing: a new batch once budget tokens or max_dates dates are reached."""
+    batches, current, used = [], [], 0
+    for d in dates:
+        n = sizes[d]
+        if current and (used + n > budget or len(current) >= max_dates):
+            batches.append(current)
+            current, used = [], 0
+        current.append(d)
+        used += n
+    if current:
+        batches.append(current)
+    return batches
+
+def _complete_pairs(text: str) -> Dict[str, Any]:
+    """Key/value pairs of a JSON object body that parse completely (the answer may be truncated)."""
+    decoder = json.JSONDecoder()
+    pairs, pos = {}, 0
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        try:
+            key, pos = decoder.raw_decode(text, pos)
+            while pos < len(text) and text[pos] in " \t\r\n":
+                pos += 1
+            if not isinstance(key, str) or text[pos:pos + 1] != ":":
+                return pairs
+            pos += 1
+            while pos < len(text) and text[pos] in " \t\r\n":
+                pos += 1
+            value, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            return pairs
+        pairs[key] = value
+
+def _parse_dated_json(raw: str) -> Dict[str, str]:
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`").split("\n", 1)[-1]
+    start = raw.find("{")
+    if start < 0:
+        return {}
+    try:
+        parsed = json.loads(raw[start: raw.rfind("}") + 1])
+    except ValueError:
+        # Truncated at max_tokens: keep the dates that were answered completely
+        parsed = _complete_pairs(raw[start + 1:])
+    if not isinstance(parsed, dict):
+        return {}
+    return {str(k): (v if isinstance(v, str) else "\n".join(map(str, v))).strip()
+            for k, v in parsed.items() if isinstance(v, (str, list))}
+
+
+@retry_on_azure_error(max_retries=5, delay=3, backoff=1.5)
+def get_batched_daily_response(ticker: str, blocks: Dict[str, List[Document]], system_prompt: str,
+                               context_str: str = "", use_cache: bool = True) -> Dict[str, str]:
+    """
+    One request for several dates: every date's retrieved articles go in one prompt and the
+    model answers with a JSON object keyed by date. Returns only the dates it answered.
+    """
+    enhanced_system = system_prompt + "\n\n" + CITATION_RULE
+    dates = list(blocks)
+    articles = "\n\n".join(f"## {d}\n{format_comments(blocks[d])}" for d in dates)
+    query = (f"For EACH date below, summarize the 2–3 most trade-relevant discussion topics about TICKER {ticker} "
+             f"using only that date's articles. Return a JSON object whose keys are exactly these dates "
+             f"{json.dumps(dates)} and whose values are that date's summary as a Markdown bullet string. "
+             f"Respond with the JSON object only.")
+    cache_key = response_cache_key(enhanced_system, query, context_str, get_azure_config()["chat_deployment"],
+                                   articles)
+    if use_cache:
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return _parse_dated_json(cached)
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", enhanced_system),
+        ("human", "# Existing Context (reference if needed)\n{context_str}\n\n"
+                  "# Articles grouped by date — Each has a Source URL at the end\n{articles}\n\n# Task\n{query}")
+    ])
+    llm = get_llm()
+    if api_version_at_least(JSON_MODE_API_VERSION):
+        llm = llm.bind(response_format={"type": "json_object"})
+    chain = prompt | llm | StrOutputParser()
+    try:
+        with llm_request(enhanced_system, context_str, articles, query) as lease:
+            raw = chain.invoke({"context_str": context_str, "articles": articles, "query": query},
+                               config=llm_config(lease))
+    except RateLimitError:
+        raise
+    except Exception as e:
+        print(f"Batched daily summary failed for {dates[0]}..{dates[-1]}: {e}")
+        return {}
+    answers = _parse_dated_json(raw)
+    if answers:
+        put_cached_response(cache_key, raw)
+    return {d: answers[d] for d in dates if answers.get(d)}
+
+
+def summarize_dates_batched(ticker: str, dates: List[str], vector_db: VectorStore, system_prompt: str,
+                            context_str: str = "", top_k: int = 20, planner: RetrievalPlanner = None,
+                            use_cache: bool = True) -> List[str]:
+    """
+    Daily timeline with a handful of requests: retrieve per date, pack dates into requests under
+    daily_batch_tokens(), split the JSON answers back per date. Dates a batch did not answer fall
+    back to the single-date get_rag_response_with_context.
+    """
+    queries = {d: f"Summarize the 2–3 most trade-relevant discussion topics about TICKER {ticker} on {d}." for d in dates}
+    # Query embeddings can hit a 429 too (the clients no longer retry on their own)
+    retrieve = retry_on_azure_error(max_retries=5, delay=3, backoff=1.5)(retrieve_documents)
+    retrieved = dict(zip(dates, run_concurrently(retrieve, [
+        dict(vector_db=vector_db, query=queries[d], date_filter=d, top_k=top_k, planner=planner) for d in dates
+    ], fallback=[])))
+
+    budget = daily_batch_tokens(count_tokens(system_prompt) + count_tokens(context_str))
+    batches = _pack_dates(dates, {d: count_tokens(format_comments(retrieved[d])) for d in dates}, budget)
+    answers: Dict[str, str] = {}
+    for result in run_concurrently(get_batched_daily_response, [
+        dict(ticker=ticker, blocks={d: retrieved[d] for d in batch}, system_prompt=system_prompt,
+             context_str=context_str, use_cache=use_cache) for batch in batches
+    ], fallback={}):
+        answers.update(result)
+
+    missing = [d for d in dates if d not in answers]
+    if missing:
+        print(f"Batched timeline: {len(missing)} date(s) unanswered, falling back to single-date requests")
+        for d, summary in zip(missing, run_concurrently(get_rag_response_with_context, [dict(
+            query=queries[d], vector_db=vector_db, system_prompt=system_prompt, context_str=context_str,
+            date_filter=d, top_k=top_k, planner=planner, use_cache=use_cache
+        ) for d in missing], fallback="[Analysis unavailable]")):
+            answers[d] = summary
+    print(f"Daily timeline: {len(dates)} dates in {len(batches)} batched request(s)")
+    return [answers[d] for d in dates]
+
+
+ANOMALY_DIGEST_TOKENS = 1200
+
 @retry_on_azure_error(max_retries=5, delay=3, backoff=1.5)
-@throttle(seconds=2.0)
-def build_vector_db(social_data: List[Dict], prefix: str = "vec") -> tuple[Chroma, str]:
+def summarize_with_llm(text: str, budget: int, ticker: str = "", use_cache: bool = True) -> str:
+    """Condense report context into at most ~budget tokens (compaction map/reduce step, no retrieval)."""
+    system_prompt = "You are a senior social sentiment analyst at a tier-1 global hedge fund."
+    query = (f"Condense the following {ticker} sentiment notes into at most {int(budget * 0.75)} words. "
+             f"Keep dates, the dominant narratives, notable sentiment shifts and every Source URL you keep. "
+             f"Answer in a structured bullet format.")
+    cache_key = response_cache_key(system_prompt, query, text, get_azure_config()["chat_deployment"])
+    if use_cache:
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+    prompt = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", "{query}\n\n{text}")])
+    try:
+        with llm_request(system_prompt, query, text) as lease:
+            answer = (prompt | get_llm() | StrOutputParser()).invoke(
+                {"query": query, "text": text}, config=llm_config(lease)).strip()
+    except RateLimitError:
+        raise
+    except Exception as e:
+        print(f"Summarization failed: {e}")
+        return truncate_tokens(text, budget)
+    put_cached_response(cache_key, answer)
+    return answer
+
+
+# Vector backend: "persistent" (long-lived per-ticker Chroma collection, incremental upsert),
+# "memory" (date-partitioned NumPy index, no disk I/O) or "chroma" (temp dir per report)
+def _vector_backend() -> str:
+    return str(get_secret("VECTOR_BACKEND", "persistent")).lower()
+
+
+@retry_on_azure_error(max_retries=5, delay=3, backoff=1.5)
+def build_vector_db(social_data: Union[PostBatch, List[Dict]], prefix: str = "vec",
+                    vector_db: VectorStore = None, dir_path: str = None,
+                    backend: str = None) -> tuple[VectorStore, str]:
+    """
+    Embed social_data into a new vector store, or append it to an existing one (vector_db + dir_path)
+    so callers can embed early batches while later intervals are still downloading.
+    backend "persistent" returns a PersistentTickerIndex for `prefix` (the ticker) and "memory" a
+    DatePartitionedIndex, both with dir_path None; "chroma" a throwaway Chroma DB in a temp dir.
+    """
+    docs = _posts_to_documents(social_data)
+    if vector_db is not None:
+        if docs:
+            vector_db.add_documents(docs)
+        return vector_db, dir_path
+    if not docs:
+        raise ValueError("No valid documents")
+    backend = backend or _vector_backend()
+    if backend == "persistent":
+        index = PersistentTickerIndex(prefix, get_embeddings())
+        index.add_documents(docs)
+        print(f"Vector store {prefix}: {index.added} new, {index.skipped} already indexed")
+        return index, None
+    if backend == "memory":
+        index = DatePartitionedIndex(get_embeddings())
+        index.add_documents(docs)
+        return index, None
     dir_path = get_unique_chroma_dir(prefix)
+    db = Chroma.from_documents(docs, get_embeddings(), persist_directory=dir_path)
+    return db, dir_path
+
+
+def update_vector_metadata(vector_db: VectorStore, posts: List[Dict]) -> None:
+    """Re-apply the metadata (e.g. a grown dup_count) of posts that were embedded earlier."""
+    docs = _posts_to_documents(posts)
+    if not docs or vector_db is None:
+        return
+    if isinstance(vector_db, Chroma):
+        chroma_update_metadata(vector_db, docs)
+    else:
+        vector_db.update_metadata(docs)
+
+
+def _posts_to_documents(social_data: Union[PostBatch, List[Dict]]) -> List[Document]:
     docs = []
     for it in social_data:
         text = it.get("post") or it.get("full_text") or ""
@@ -99,28 +382,40 @@ def build_vector_db(social_data: List[Dict], prefix: str = "vec") -> tuple[Chrom
             metadata={
                 "sentiment_score": float(it.get("sentiment", 0)),
                 "date_str": date_str,
-                "doc_id": str(uuid.uuid4()),
-                "link": link
+                "doc_id": content_hash(text),
+                "date_ord": str_to_day(date_str) if date_str != "unknown_date" else -1,
+                "link": link,
+                "dup_count": int(it.get("dup_count", 0) or 0)
             }
         ))
-    if not docs:
-        raise ValueError("No valid documents")
-    db = Chroma.from_documents(docs, get_embeddings(), persist_directory=dir_path)
-    return db, dir_path
+    return docs
+
+
+def retrieve_documents(vector_db: VectorStore, query: str, date_filter=None, top_k=15,
+                       planner: RetrievalPlanner = None) -> List[Document]:
+    # Every backend answers similarity_search(query, k, filter) with the same Documents;
+    # the planner skips the search when the date partition already fits in top_k
+    if planner is not None:
+        return planner.retrieve(query, top_k, date_filter)
+    return vector_db.similarity_search(query, k=top_k, filter={"date_str": date_filter} if date_filter else None)
 
 
-def retrieve_relevant_comments(vector_db: Chroma, query: str, date_filter=None, top_k=15) -> str:
-    retriever = vector_db.as_retriever(search_kwargs={
-        "k": top_k,
-        "filter": {"date_str": date_filter} if date_filter else None
-    })
-    docs = retriever.invoke(query)
+def retrieve_relevant_comments(vector_db: VectorStore, query: str,
+                               date_filter=None, top_k=15, planner: RetrievalPlanner = None) -> str:
+    return format_comments(retrieve_documents(vector_db, query, date_filter, top_k, planner))
+
+
+def format_comments(docs: List[Document]) -> str:
     lines = []
     for d in docs:
         score = f"[{d.metadata['sentiment_score']:+.4f}]"
         content = d.page_content.strip()
         link = d.metadata.get("link", "").strip()
 
+        dup_count = int(d.metadata.get("dup_count", 0) or 0)
+        if dup_count:
+            content += f" (+{dup_count} near-identical reports)"
+
         lines.append(f"{score} {content}")
         if link:
             lines.append(f"Source: {link}")
@@ -131,23 +426,45 @@ def retrieve_relevant_comments(vector_db: Chroma, query: str, date_filter=None,
 
 
 # ==================== 主报告生成器（最终专业版）===================
-def generate_report_sections(
+# Display order of the streamed sections (see iter_report_sections)
+REPORT_SECTION_ORDER = ("snapshot", "anomalies", "bull_bear", "price_outlook", "daily")
+SECTION_TITLES = {
+    "bull_bear": "## 2. Bull vs Bear Narrative Dominance",
+    "price_outlook": "## 3. Short-Term Price Implication",
+    "daily": "## Appendix: Daily Event Timeline",
+}
+
+def iter_report_sections(
     ticker: str,
     fundamentals: dict,
-    social_data: list,
+    social_data: Union[PostBatch, list],
     period: str = "Recent 30 days",
     chart_path: str = None,
-    clean_temp_after: bool = True
-) -> str:
-
-    if not social_data:
-        return f"# {ticker} — No Sentiment Data Available"
+    clean_temp_after: bool = True,
+    vector_db: VectorStore = None,   # Optional pre-built DB (e.g. embedded while streaming collection)
+    chroma_dir: str = None,
+    use_cache: bool = True,         # False: bypass the persistent LLM response cache (still refreshes it)
+    batch_daily: bool = True,       # several dates per request for the daily timeline
+    stream_tokens: bool = True      # also yield token deltas of the synthesis sections
+) -> Iterator[Dict[str, str]]:
+    """
+    Report generation as an event stream, so the page can render each part as soon as it exists:
+      {"type": "section", "name": <REPORT_SECTION_ORDER entry>, "markdown": ...}  — a finished section
+      {"type": "token",   "name": "bull_bear" | "price_outlook", "text": ...}     — streamed answer delta
+      {"type": "reset",   "name": "bull_bear" | "price_outlook"}                  — discard streamed text (retry)
+      {"type": "report",  "markdown": ...}                                        — the full report, last
+    Stages run on the scheduler in a background thread and hand events over through a queue.
+    """
+    social_data = PostBatch.coerce(social_data)
+    if len(social_data) == 0:
+        yield {"type": "report", "markdown": f"# {ticker} — No Sentiment Data Available"}
+        return
 
     # ============ 统计 ============
-    sentiments = [it["sentiment"] for it in social_data]
+    sentiments = social_data.sentiment
     total = len(sentiments)
-    avg_sent = sum(sentiments) / total
-    strongly_pos = sum(1 for s in sentiments if s > 0.20)
+    avg_sent = float(sentiments.mean())
+    strongly_pos = int((sentiments > 0.20).sum())
     strongly_pos_ratio = strongly_pos / total * 100
 
     anomalies = detect_sentiment_anomalies(social_data, threshold=0.09)
@@ -155,6 +472,10 @@ def generate_report_sections(
     plunge_cnt = len(anomalies) - surge_cnt
     anomaly_dates = ", ".join(a["date"] for a in anomalies) if anomalies else "None"
 
+    # Hourly shocks inside a day (caught the same day, not only as a daily median shift)
+    intraday_shocks = detect_intraday_anomalies(social_data, bucket_seconds=3600, threshold=0.15)
+    shock_times = ", ".join(f"{a['time']} ({a['sent_change']:+.2f})" for a in intraday_shocks[-5:]) or "None"
+
     stats_table = f"""
 ## Social Sentiment Snapshot — {ticker}
 
@@ -166,80 +487,187 @@ def generate_report_sections(
 | Strongly Positive (> +0.20)   | **{strongly_pos:,}** ({strongly_pos_ratio:.1f}%) | High conviction zone               |
 | Total Anomaly Days            | **{len(anomalies)}**                     | Surge: {surge_cnt} │ Plunge: {plunge_cnt} |
 | Key Anomaly Dates             | {anomaly_dates}                          | Major sentiment shifts             |
+| Intraday Shocks (1h)          | **{len(intraday_shocks)}**               | Latest: {shock_times} |
 """
 
     base_context = f"""
 Ticker: {ticker} | Period: {period} | Articles: {total:,}
 Avg sentiment: {avg_sent:+.4f} | Strong positive ratio: {strongly_pos_ratio:.1f}%
 Anomalies: {len(anomalies)} (Surge: {surge_cnt}, Plunge: {plunge_cnt})
+Intraday shocks (1h vs prior 24h): {shock_times}
 """
 
-    print(f"Building vector DB for {ticker}...")
-    vector_db, chroma_dir = build_vector_db(social_data, prefix=ticker)
+    yield {"type": "section", "name": "snapshot", "markdown": stats_table}
+
+    if vector_db is None:
+        print(f"Building vector DB for {ticker}...")
+        vector_db, chroma_dir = build_vector_db(social_data, prefix=ticker)
+    if isinstance(vector_db, PersistentTickerIndex):
+        # Queries are already scoped to the documents this report added; also pin the period
+        vector_db.date_range = (int(social_data.day.min()), int(social_data.day.max()))
+
+    analyst_prompt = "You are a senior social sentiment analyst at a tier-1 global hedge fund."
+    # Per-date document counts, taken once: small dates skip the query embedding + vector search
+    planner = RetrievalPlanner(vector_db)
 
     # ============ 1. 异动分析 ============
-    anomaly_section = ""
-    if anomalies:
-        anomaly_section = f"## 1. Sentiment Anomaly Drivers\n### Overview\n- Total: {len(anomalies)} (Surge: {surge_cnt} | Plunge: {plunge_cnt})\n- Dates: {anomaly_dates}\n\n### Root Cause Analysis\n"
-        for a in anomalies:
-            cause = get_rag_response_with_context(
-                query=f"Analyze the root cause of the TICKER {ticker} sentiment {'surge' if a['type']=='surge' else 'plunge'} on {a['date']}. "
-                      f"Identify key events and explain how specific article content triggered investor emotion. "
-                      f"Combine market and industry context where relevant.",
-                vector_db=vector_db,
-                system_prompt="You are a senior social sentiment analyst at a tier-1 global hedge fund.",
-                context_str=base_context,
-                date_filter=a["date"],
-                top_k=30
-            )
+    def anomaly_stage():
+        if not anomalies:
+            return "## 1. Sentiment Anomaly Drivers\nNo significant anomalies detected in the period.\n"
+        causes = run_concurrently(get_rag_response_with_context, [dict(
+            query=f"Analyze the root cause of the TICKER {ticker} sentiment {'surge' if a['type']=='surge' else 'plunge'} on {a['date']}. "
+                  f"Identify key events and explain how specific article content triggered investor emotion. "
+                  f"Combine market and industry context where relevant.",
+            vector_db=vector_db,
+            system_prompt=analyst_prompt,
+            context_str=base_context,
+            date_filter=a["date"],
+            top_k=30,
+            planner=planner,
+            use_cache=use_cache
+        ) for a in anomalies], fallback="[Analysis unavailable]")
+        section = f"## 1. Sentiment Anomaly Drivers\n### Overview\n- Total: {len(anomalies)} (Surge: {surge_cnt} | Plunge: {plunge_cnt})\n- Dates: {anomaly_dates}\n\n### Root Cause Analysis\n"
+        for a, cause in zip(anomalies, causes):
             label = "Surge" if a["type"] == "surge" else "Plunge"
-            anomaly_section += f"#### {a['date']} — {label} ({a['sent_change']:+.4f})\n{cause}\n\n"
-    else:
-        anomaly_section = "## 1. Sentiment Anomaly Drivers\nNo significant anomalies detected in the period.\n"
+            section += f"#### {a['date']} — {label} ({a['sent_change']:+.4f})\n{cause}\n\n"
+        return section
 
     # ============ Appendix: 每日事件 ============
-    all_dates = sorted({
-        it.get("date_str") or parse_timestamp_to_date(it.get("time_published"))
-        for it in social_data if it.get("date_str") != "unknown_date"
-    })
-
-    daily_events = []
-    for date_str in all_dates:
-        summary = get_rag_response_with_context(
+    def daily_stage():
+        all_dates = [str(d) for d in day_to_str(np.unique(social_data.day))]
+        if batch_daily:
+            summaries = summarize_dates_batched(ticker, all_dates, vector_db, analyst_prompt,
+                                                context_str=base_context, top_k=20, planner=planner,
+                                                use_cache=use_cache)
+            return list(zip(all_dates, summaries))
+        summaries = run_concurrently(get_rag_response_with_context, [dict(
             query=f"Summarize the 2–3 most trade-relevant discussion topics about TICKER {ticker} on {date_str}.",
             vector_db=vector_db,
-            system_prompt="You are a senior social sentiment analyst at a tier-1 global hedge fund.",
+            system_prompt=analyst_prompt,
             context_str=base_context,
             date_filter=date_str,
-            top_k=20
-        )
-        daily_events.append(f"### {date_str}\n{summary}\n")
-    
-    appendix_daily = "\n".join(daily_events) if daily_events else "No notable daily concentration."
+            top_k=20,
+            planner=planner,
+            use_cache=use_cache
+        ) for date_str in all_dates], fallback="[Analysis unavailable]")
+        return list(zip(all_dates, summaries))
+
+    # ============ 上下文压缩：每日 -> 每周 -> 全期摘要（固定 token 预算） ============
+    def summarize(text, budget):
+        return summarize_with_llm(text, budget, ticker=ticker, use_cache=use_cache)
+
+    def summarize_many(jobs):
+        results = run_concurrently(summarize, [dict(text=t, budget=b) for t, b in jobs], fallback=None)
+        # A failed summary keeps its (truncated) source text, so no week drops out of the digest
+        for i, (text, budget) in enumerate(jobs):
+            if results[i] is None:
+                print(f"⚠️ Summary {i + 1}/{len(jobs)} failed, keeping the truncated source text")
+                results[i] = truncate_tokens(text, budget)
+        return results
+
+    def digest_stage(daily):
+        return compact_daily_summaries(daily, summarize, map_fn=summarize_many)["period"]
+
+    def anomaly_digest_stage(anomalies):
+        return reduce_to_budget([anomalies], ANOMALY_DIGEST_TOKENS, summarize, map_fn=summarize_many)
 
     # ============ 2. 多空论战 ============
-    bull_bear = get_rag_response_with_context(
-        query=f"Identify and refine the top 3 bullish and top 3 bearish arguments for TICKER {ticker} most relevant to near-term price action. "
-              f"Then clearly state which narrative currently dominates for TICKER {ticker}.",
-        vector_db=vector_db,
-        system_prompt="You are a senior social sentiment analyst at a tier-1 global hedge fund.",
-        context_str=f"{base_context}\n## Anomalies\n{anomaly_section}\n## Daily Events\n{appendix_daily}",
-        top_k=40
-    )
+    def bull_bear_stage(anomaly_digest, digest):
+        return get_rag_response_with_context(
+            query=f"Identify and refine the top 3 bullish and top 3 bearish arguments for TICKER {ticker} most relevant to near-term price action. "
+                  f"Then clearly state which narrative currently dominates for TICKER {ticker}.",
+            vector_db=vector_db,
+            system_prompt=analyst_prompt,
+            context_str=f"{base_context}\n## Anomalies\n{anomaly_digest}\n## Period Digest\n{digest}",
+            top_k=40,
+            use_cache=use_cache,
+            on_token=token_sink("bull_bear"),
+            on_reset=reset_sink("bull_bear")
+        )
 
     # ============ 3. 短期价格推演 ============
-    price_outlook = get_rag_response_with_context(
-        query=f"Based on anomaly patterns, bull/bear balance, and recent topics of TICKER {ticker} (BUT DO NOT repeat),"
-              f"Provide the following outputs:"
-              f"• 1-week TICKER {ticker} stock price investment suggestions: clearly state the position (Buy/Hold/Sell) and a brief rationale\n"
-              f"• Confidence level: select one option from [High / Medium / Low] and explain the reason\n"
-              f"• Primary risk factor (e.g., short squeeze, exhaustion, mean reversion, catalyst fade) and explain the reason\n"
-              f"Note that you can make summary and don't need to quote resources for this part. ",
-        vector_db=vector_db,
-        system_prompt="You are a senior social sentiment analyst at a tier-1 global hedge fund.",
-        context_str=f"{base_context}\n## Bull vs Bear\n{bull_bear}\n## Anomalies\n{anomaly_section}",
-        top_k=30
-    )
+    def price_outlook_stage(bull_bear, anomaly_digest):
+        return get_rag_response_with_context(
+            query=f"Based on anomaly patterns, bull/bear balance, and recent topics of TICKER {ticker} (BUT DO NOT repeat),"
+                  f"Provide the following outputs:"
+                  f"• 1-week TICKER {ticker} stock price investment suggestions: clearly state the position (Buy/Hold/Sell) and a brief rationale\n"
+                  f"• Confidence level: select one option from [High / Medium / Low] and explain the reason\n"
+                  f"• Primary risk factor (e.g., short squeeze, exhaustion, mean reversion, catalyst fade) and explain the reason\n"
+                  f"Note that you can make summary and don't need to quote resources for this part. ",
+            vector_db=vector_db,
+            system_prompt=analyst_prompt,
+            context_str=f"{base_context}\n## Bull vs Bear\n{bull_bear}\n## Anomalies\n{anomaly_digest}",
+            top_k=30,
+            use_cache=use_cache,
+            on_token=token_sink("price_outlook"),
+            on_reset=reset_sink("price_outlook")
+        )
+
+    # Stages start as soon as their inputs exist; a new section only needs its own deps
+    events: "queue.Queue" = queue.Queue()
+
+    def token_sink(name):
+        if not stream_tokens:
+            return None
+        return lambda text: events.put({"type": "token", "name": name, "text": text})
+
+    def reset_sink(name):
+        if not stream_tokens:
+            return None
+        return lambda: events.put({"type": "reset", "name": name})
+
+    def emits(name, render):
+        # Wrap a stage so its finished section is published the moment it completes
+        def wrapper(stage):
+            def run(**deps):
+                result = stage(**deps)
+                events.put({"type": "section", "name": name, "markdown": render(result)})
+                return result
+            return run
+        return wrapper
+
+    def render_daily(daily):
+        daily_events = [f"### {date_str}\n{summary}\n" for date_str, summary in daily]
+        return "\n".join(daily_events) if daily_events else "No notable daily concentration."
+
+    scheduler = StageScheduler(max_workers=4, name=f"{ticker} report")
+    scheduler.add("anomalies", emits("anomalies", lambda r: r)(anomaly_stage))
+    scheduler.add("daily", emits("daily", lambda r: f"{SECTION_TITLES['daily']}\n{render_daily(r)}")(daily_stage))
+    scheduler.add("digest", digest_stage, deps=["daily"])
+    scheduler.add("anomaly_digest", anomaly_digest_stage, deps=["anomalies"])
+    # Synthesis prompts only see the bounded digests, not the raw per-date sections
+    scheduler.add("bull_bear", emits("bull_bear", lambda r: f"{SECTION_TITLES['bull_bear']}\n{r}")(bull_bear_stage),
+                  deps=["anomaly_digest", "digest"])
+    scheduler.add("price_outlook", emits("price_outlook", lambda r: f"{SECTION_TITLES['price_outlook']}\n{r}")(price_outlook_stage),
+                  deps=["bull_bear", "anomaly_digest"])
+
+    _DONE = object()
+    outcome = {}
+
+    def run_scheduler():
+        try:
+            outcome["sections"] = scheduler.run()
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            events.put(_DONE)
+
+    threading.Thread(target=run_scheduler, daemon=True).start()
+    while True:
+        event = events.get()
+        if event is _DONE:
+            break
+        yield event
+    if "error" in outcome:
+        raise outcome["error"]
+    sections = outcome["sections"]
+    print(scheduler.summary())
+    print(f"Retrieval: {planner.bypassed} date partitions passed through whole, {planner.searched} vector searches")
+
+    anomaly_section = sections["anomalies"]
+    appendix_daily = render_daily(sections["daily"])
+    bull_bear = sections["bull_bear"]
+    price_outlook = sections["price_outlook"]
 
     # ============ 最终报告 ============
     report = f"""# {ticker} · Social Sentiment Analysis Report
@@ -251,13 +679,13 @@ Anomalies: {len(anomalies)} (Surge: {surge_cnt}, Plunge: {plunge_cnt})
 
 {anomaly_section}
 
-## 2. Bull vs Bear Narrative Dominance
+{SECTION_TITLES['bull_bear']}
 {bull_bear}
 
-## 3. Short-Term Price Implication
+{SECTION_TITLES['price_outlook']}
 {price_outlook}
 
-## Appendix: Daily Event Timeline
+{SECTION_TITLES['daily']}
 {appendix_daily}
 
 ---
@@ -268,7 +696,8 @@ Generated by Institutional-Grade Multi-staged Sentiment Analysis Agent | Sources
     def cleanup():
         time.sleep(10)
         try:
-            shutil.rmtree(chroma_dir, ignore_errors=True)
+            if chroma_dir:
+                shutil.rmtree(chroma_dir, ignore_errors=True)
         except:
             pass
         if clean_temp_after:
@@ -279,4 +708,23 @@ Generated by Institutional-Grade Multi-staged Sentiment Analysis Agent | Sources
     threading.Thread(target=cleanup, daemon=True).start()
 
     print(f"Final report generated with traceable source links: {ticker}")
-    return report.strip() + "\n"
+    yield {"type": "report", "markdown": report.strip() + "\n"}
+
+
+def generate_report_sections(
+    ticker: str,
+    fundamentals: dict,
+    social_data: Union[PostBatch, list],
+    period: str = "Recent 30 days",
+    chart_path: str = None,
+    clean_temp_after: bool = True,
+    **kwargs
+) -> str:
+    """Full report markdown in one call (consumes iter_report_sections without token events)."""
+    kwargs.setdefault("stream_tokens", False)
+    report = ""
+    for event in iter_report_sections(ticker, fundamentals, social_data, period=period, chart_path=chart_path,
+                                      clean_temp_after=clean_temp_after, **kwargs):
+        if event["type"] == "report":
+            report = event["markdown"]
+    return report
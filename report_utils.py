@@ -3,6 +3,8 @@ import os
 import uuid
 import shutil 
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date
 from typing import List, Dict, Any, Optional
 from collections import defaultdict
@@ -10,6 +12,13 @@ from functools import wraps
 import pandas as pd
 import numpy as np
 
+from post_batch import PostBatch
+from rate_limit import AzureRateLimiter, get_azure_limiter
+from compaction import count_tokens
+from embedding_cache import CachedEmbeddings
+from price_store import EXCHANGE_TZ
+from app_config import get_secret
+
 # ============ Fix Azure OpenAI proxy bug ============
 import warnings
 warnings.filterwarnings("ignore")
@@ -31,7 +40,7 @@ class FixedAsyncClient(AsyncHttpxClientWrapper):
 openai._base_client.SyncHttpxClientWrapper  = FixedSyncClient
 openai._base_client.AsyncHttpxClientWrapper = FixedAsyncClient
 
-# ============ 核心优化：重试+节流装饰器 ============
+# ============ 核心优化：重试装饰器 ============
 def retry_on_azure_error(max_retries: int = 5, delay: float = 3.0, backoff: float = 1.5):
     """
     装饰器：Azure OpenAI调用失败时自动重试
@@ -62,27 +71,6 @@ def retry_on_azure_error(max_retries: int = 5, delay: float = 3.0, backoff: floa
         return wrapper
     return decorator
 
-def throttle(seconds: float = 1.0):
-    """
-    装饰器：限制函数调用频率（每次调用间隔至少seconds秒）
-    :param seconds: 最小调用间隔（秒）
-    """
-    def decorator(func):
-        last_called = 0.0
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            nonlocal last_called
-            elapsed = time.time() - last_called
-            if elapsed < seconds:
-                sleep_time = seconds - elapsed
-                print(f"⏳ Throttling {func.__name__}, sleeping {sleep_time:.1f}s...")
-                time.sleep(sleep_time)
-            result = func(*args, **kwargs)
-            last_called = time.time()
-            return result
-        return wrapper
-    return decorator
-
 # ============ 核心优化：统一Chroma临时目录管理 ============
 CHROMA_ROOT_DIR = "./chroma_temp_root"
 os.makedirs(CHROMA_ROOT_DIR, exist_ok=True)
@@ -133,6 +121,7 @@ from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.callbacks import BaseCallbackHandler
 import streamlit as st
 
 # ============ Azure OpenAI Config（通过 Secrets 安全读取） ============
@@ -150,9 +139,20 @@ def get_azure_config():
         st.error("❌ 未检测到 Azure OpenAI 配置！请在 Streamlit Secrets 中设置相关密钥。")
         raise e
 
+# First Azure API versions accepting the optional request fields used by the report
+STREAM_USAGE_API_VERSION = "2024-09-01"   # stream_options={"include_usage": true}
+JSON_MODE_API_VERSION = "2023-12-01"      # response_format={"type": "json_object"}
+
+def api_version_at_least(minimum: str, api_version: Optional[str] = None) -> bool:
+    """Compare the date part of an api_version ("2024-10-21", "2024-09-01-preview") with minimum."""
+    version = api_version or get_azure_config()["api_version"]
+    return str(version)[:10] >= minimum
+
 # ============ 初始化LLM和嵌入模型（懒加载 + Secrets） ============
+LLM_MAX_OUTPUT_TOKENS = 4000
+LLM_CONTEXT_TOKENS = 128000   # gpt-4o family context window (Secrets: AZURE_OPENAI_CONTEXT_TOKENS)
 _llm: Optional[AzureChatOpenAI] = None
-_embeddings: Optional[AzureOpenAIEmbeddings] = None
+_embeddings: Optional[CachedEmbeddings] = None
 
 def get_llm():
     global _llm
@@ -164,9 +164,14 @@ def get_llm():
             api_version=config["api_version"],
             api_key=config["api_key"],
             temperature=0.7,
-            max_tokens=4000,
+            max_tokens=LLM_MAX_OUTPUT_TOKENS,
             timeout=180,
-            max_retries=3,
+            # 429s must reach the shared limiter; retry_on_azure_error does the retrying
+            max_retries=0,
+            # Rate-limit headers + token usage feed the shared limiter (see llm_config);
+            # streamed usage needs stream_options, which older API versions reject with a 400
+            include_response_headers=True,
+            stream_usage=api_version_at_least(STREAM_USAGE_API_VERSION, config["api_version"]),
         )
     return _llm
 
@@ -174,16 +179,84 @@ def get_embeddings():
     global _embeddings
     if _embeddings is None:
         config = get_azure_config()
-        _embeddings = AzureOpenAIEmbeddings(
+        # Persistent content-hash cache in front of Azure: only unseen texts are embedded
+        _embeddings = CachedEmbeddings(AzureOpenAIEmbeddings(
             azure_endpoint=config["endpoint"],
             azure_deployment=config["embedding_deployment"],
             api_version=config["api_version"],
             api_key=config["api_key"],
             request_timeout=60,
-            max_retries=3,
-        )
+            max_retries=0,
+        ), deployment=config["embedding_deployment"], limiter=get_embedding_limiter())
     return _embeddings
 
+# ============ 并发 LLM 调用：共享限速 + 有界线程池 ============
+LLM_OUTPUT_RESERVE_TOKENS = 1000   # completion tokens charged up front, corrected from usage
+
+def get_llm_limiter() -> AzureRateLimiter:
+    """进程内所有 GPT 调用共享的 RPM/TPM 限速器（Secrets: AZURE_OPENAI_RPM / AZURE_OPENAI_TPM）"""
+    return get_azure_limiter(
+        get_azure_config()["chat_deployment"],
+        rpm=float(get_secret("AZURE_OPENAI_RPM", 60)),
+        tpm=float(get_secret("AZURE_OPENAI_TPM", 60000)),
+        max_concurrency=int(get_secret("AZURE_OPENAI_MAX_WORKERS", 6)),
+    )
+
+def get_embedding_limiter() -> AzureRateLimiter:
+    """Embedding 部署单独计额（Secrets: AZURE_EMBEDDING_RPM / AZURE_EMBEDDING_TPM）"""
+    return get_azure_limiter(
+        get_azure_config()["embedding_deployment"],
+        rpm=float(get_secret("AZURE_EMBEDDING_RPM", 120)),
+        tpm=float(get_secret("AZURE_EMBEDDING_TPM", 120000)),
+        max_concurrency=int(get_secret("AZURE_OPENAI_MAX_WORKERS", 6)),
+    )
+
+def llm_request(*texts: str):
+    """with llm_request(system, context, query): ... — waits for a slot + RPM + estimated TPM."""
+    estimate = sum(count_tokens(t) for t in texts if t) + LLM_OUTPUT_RESERVE_TOKENS
+    return get_llm_limiter().request(estimate)
+
+class RateLimitHeaderCallback(BaseCallbackHandler):
+    """Passes x-ratelimit-* headers and the reported token usage of a chat response to its lease."""
+    def __init__(self, lease):
+        self.lease = lease
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        headers, total_tokens = None, None
+        for generations in response.generations:
+            for gen in generations:
+                message = getattr(gen, "message", None)
+                if message is None:
+                    continue
+                headers = message.response_metadata.get("headers") or headers
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    total_tokens = usage.get("total_tokens", total_tokens)
+        self.lease.observe(headers, total_tokens)
+
+def llm_config(lease) -> Dict[str, Any]:
+    """with llm_request(...) as lease: chain.invoke(inputs, config=llm_config(lease))"""
+    return {"callbacks": [RateLimitHeaderCallback(lease)]}
+
+def run_concurrently(func, jobs: List[Dict[str, Any]], max_workers: Optional[int] = None,
+                     fallback: Any = None) -> List[Any]:
+    """
+    func(**job) for every job on a bounded thread pool; results come back in job order.
+    A job that raises yields `fallback`, so one failed call never sinks the whole report.
+    """
+    if not jobs:
+        return []
+    max_workers = max_workers or int(get_secret("AZURE_OPENAI_MAX_WORKERS", 6))
+    results = [fallback] * len(jobs)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        futures = {pool.submit(func, **job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                print(f"❌ Concurrent call {futures[future]} failed: {e}")
+    return results
+
 # ============ 日期处理+情感异动检测工具函数 ============
 def parse_timestamp_to_date(timestamp_input) -> str:
     """兼容datetime对象/字符串的时间解析"""
@@ -212,31 +285,19 @@ def group_comments_by_date(social_data: List[Dict[str, Any]]) -> Dict[str, List[
     sorted_dates = sorted(date_groups.keys())
     return {date: date_groups[date] for date in sorted_dates}
 
-def detect_sentiment_anomalies(social_data: List[Dict[str, Any]], threshold: float = 0.2) -> List[Dict[str, Any]]:
-    """检测情感分数异动（修复KeyError，适配data_collector输出）"""
-    # 转换为DataFrame并确保关键列存在
-    df = pd.DataFrame(social_data)
-    
-    # 核心修复：补充缺失的列，适配data_collector的键名
-    if "time_published" in df.columns:
-        df["timestamp"] = df["time_published"]  # 兼容旧逻辑，映射为timestamp
-    elif "date_str" in df.columns:
-        df["timestamp"] = df["date_str"]
-    else:
+def detect_sentiment_anomalies(social_data, threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """检测情感分数异动（接受 PostBatch 或 data_collector 的 list of dict）"""
+    batch = PostBatch.coerce(social_data)
+    if len(batch) == 0:
         return []  # 无时间数据，直接返回空
     
-    # 确保sentiment列存在
-    if "sentiment" not in df.columns:
-        return []
-    
-    # 解析日期
-    df["date_str"] = df["timestamp"].apply(parse_timestamp_to_date)
-    df = df[df["date_str"] != "unknown_date"]
-    
-    # 按日期聚合
-    daily_sent = df.groupby("date_str")["sentiment"].agg(["median", "count"]).reset_index()
-    daily_sent.columns = ["date", "avg_sentiment", "comment_count"]
-    daily_sent = daily_sent.sort_values("date")
+    # 按日期聚合（直接使用已解析的 day ordinal，无需逐行解析日期）
+    stats = batch.daily_stats()
+    daily_sent = pd.DataFrame({
+        "date": stats["date_str"].astype(str),
+        "avg_sentiment": stats["median"],
+        "comment_count": stats["count"],
+    })
     
     # 过滤评论数过少的日期
     daily_sent = daily_sent[daily_sent["comment_count"] >= 5]
@@ -260,3 +321,55 @@ def detect_sentiment_anomalies(social_data: List[Dict[str, Any]], threshold: flo
             anomaly["type_cn"] = "情感暴跌"
     
     return anomalies
+
+# Regular-session window on the exchange clock (seconds of day); post timestamps are UTC
+MARKET_OPEN_SECONDS = 9 * 3600 + 30 * 60
+MARKET_CLOSE_SECONDS = 16 * 3600
+
+def detect_intraday_anomalies(social_data, bucket_seconds: int = 3600, threshold: float = 0.2,
+                              baseline_buckets: int = 24, min_count: int = 3,
+                              market_hours_only: bool = False) -> List[Dict[str, Any]]:
+    """
+    检测日内情感异动：每个时间桶（默认 1 小时）的平均情感 vs 之前 baseline_buckets 个桶的加权均值。
+    全部基于 bincount + 累积和，窗口再大也是 O(posts + buckets)。
+    返回与 detect_sentiment_anomalies 相同的字段，另加 "time"（桶起点）与 "baseline"。
+    """
+    series = PostBatch.coerce(social_data).sentiment_series(bucket_seconds)
+    if len(series) < 2:
+        return []
+
+    counts = series["count"].to_numpy()
+    sums = series["sum"].to_numpy()
+    # 前 baseline_buckets 个桶（不含当前桶）的情感总和 / 条数
+    csum = np.concatenate([[0.0], np.cumsum(sums)])
+    ccount = np.concatenate([[0], np.cumsum(counts)])
+    idx = np.arange(len(series))
+    lo = np.maximum(idx - baseline_buckets, 0)
+    base_count = ccount[idx] - ccount[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline = (csum[idx] - csum[lo]) / base_count
+    change = series["mean"].to_numpy() - baseline
+
+    mask = (counts >= min_count) & (base_count >= min_count) & (np.abs(change) >= threshold)
+    starts = series["bucket_start"].to_numpy()
+    if market_hours_only:
+        local = pd.DatetimeIndex(starts).tz_localize("UTC").tz_convert(EXCHANGE_TZ)
+        seconds_of_day = local.hour.to_numpy() * 3600 + local.minute.to_numpy() * 60
+        weekday = local.weekday.to_numpy()   # 0 = Monday
+        mask &= (seconds_of_day >= MARKET_OPEN_SECONDS) & (seconds_of_day < MARKET_CLOSE_SECONDS) & (weekday < 5)
+
+    anomalies = []
+    for i in np.flatnonzero(mask):
+        surge = change[i] > 0
+        anomalies.append({
+            "time": np.datetime_as_string(starts[i], unit="m").replace("T", " "),
+            "date": np.datetime_as_string(starts[i], unit="D"),
+            "avg_sentiment": float(series["mean"].iat[i]),
+            "comment_count": int(counts[i]),
+            "baseline": float(baseline[i]),
+            "sent_change": float(change[i]),
+            "abs_change": float(abs(change[i])),
+            "type": "surge" if surge else "plunge",
+            "type_cn": "情感暴涨" if surge else "情感暴跌",
+        })
+    return anomalies
@@ -2,11 +2,13 @@
 # 2025 Ultimate Edition
 import pandas as pd
 import plotly.graph_objects as go
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
 from datetime import datetime
 
+from post_batch import PostBatch
+
 def plot_daily_sentiment_boxplot(
-    posts: List[Dict[str, Any]],
+    posts: Union[PostBatch, List[Dict[str, Any]]],
     ticker: str,
     start_date: str = None,
     end_date: str = None,
@@ -16,20 +18,16 @@ def plot_daily_sentiment_boxplot(
     绘制每日情绪得分的箱线图（Box Plot），展示分布、异常值、中位数、四分位等
     完美补充趋势线图，体现情绪波动强度与一致性（机构最看重的“分歧度”指标）
     """
-    if not posts:
+    batch = PostBatch.coerce(posts)
+    if len(batch) == 0:
         raise ValueError("No posts data provided for boxplot")
 
-    df = pd.DataFrame(posts)
-    df['date'] = pd.to_datetime(df['date_str'])
-    df = df.sort_values('date')
-
-    # 按天分组，过滤文章数量太少的日子（避免误导）
-    daily_groups = df.groupby('date_str')
+    # 按天分组（day ordinal 已在 PostBatch 中解析，按日期升序），过滤文章数量太少的日子（避免误导）
+    daily_groups = batch.daily_values("sentiment")
     valid_days = []
     box_data = []
 
-    for date_str, group in daily_groups:
-        sentiments = group['sentiment'].tolist()
+    for date_str, sentiments in daily_groups.items():
         if len(sentiments) < min_articles_per_day:
             continue  # 跳过样本太少的日期
 
@@ -38,8 +36,8 @@ def plot_daily_sentiment_boxplot(
 
     if len(box_data) == 0:
         # 如果没有足够数据，降级显示所有天（即使少于阈值）
-        valid_days = df['date_str'].unique().tolist()
-        box_data = [g['sentiment'].tolist() for _, g in daily_groups]
+        valid_days = list(daily_groups.keys())
+        box_data = list(daily_groups.values())
 
     # 美化日期显示：从 "2025-01-15" → "Jan 15"
     def format_date_label(date_str: str) -> str:
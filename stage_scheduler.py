@@ -0,0 +1,98 @@
+# stage_scheduler.py
+# Minimal DAG scheduler for the report pipeline: each stage declares the stages it depends on,
+# every stage whose dependencies are done is started right away on a shared thread pool, and
+# per-stage timings are recorded so the critical path is visible.
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class StageScheduler:
+    """
+    scheduler.add("b", lambda a: ..., deps=["a"]) — a stage is called with the results of its
+    dependencies as keyword arguments. run() returns {stage name: result}; a failing stage
+    raises after the stages already running have finished.
+    """
+    def __init__(self, max_workers: int = 4, name: str = "pipeline"):
+        self.max_workers = max_workers
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def add(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()) -> "StageScheduler":
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self.stages[name] = Stage(name, func, deps)
+        return self
+
+    def _check(self) -> None:
+        for stage in self.stages.values():
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage(s): {missing}")
+        # Kahn's algorithm: every stage must be reachable from the roots, otherwise there is a cycle
+        indegree = {n: len(s.deps) for n, s in self.stages.items()}
+        ready = [n for n, d in indegree.items() if d == 0]
+        seen = 0
+        while ready:
+            done = ready.pop()
+            seen += 1
+            for s in self.stages.values():
+                if done in s.deps:
+                    indegree[s.name] -= 1
+                    if indegree[s.name] == 0:
+                        ready.append(s.name)
+        if seen != len(self.stages):
+            raise ValueError(f"{self.name}: stage dependencies contain a cycle")
+
+    def _run_stage(self, stage: Stage, results: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return stage.func(**{d: results[d] for d in stage.deps})
+        finally:
+            end = time.perf_counter()
+            self.timings[stage.name] = {"start": start - self._t0, "end": end - self._t0, "seconds": end - start}
+
+    def run(self) -> Dict[str, Any]:
+        self._check()
+        self.timings = {}
+        self._t0 = time.perf_counter()
+        results: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                if error is None:
+                    for name in [n for n, s in pending.items() if all(d in results for d in s.deps)]:
+                        stage = pending.pop(name)
+                        running[pool.submit(self._run_stage, stage, dict(results))] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        print(f"❌ Stage {name} failed: {e}")
+                        error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def summary(self) -> str:
+        """One line per stage in start order, e.g. 'bull_bear  12.3s → 20.1s (7.8s)'."""
+        rows: List[str] = []
+        for name, t in sorted(self.timings.items(), key=lambda kv: kv[1]["start"]):
+            rows.append(f"{name:<16} {t['start']:6.1f}s → {t['end']:6.1f}s ({t['seconds']:.1f}s)")
+        total = max((t["end"] for t in self.timings.values()), default=0.0)
+        rows.append(f"{self.name} wall-clock: {total:.1f}s")
+        return "\n".join(rows)
@@ -3,47 +3,117 @@ import yfinance as yf
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
-import talib
 import warnings
 import requests
+import os
+import json
+import time
+import threading
 warnings.filterwarnings("ignore")
-# ======================== Real-time Nasdaq-100 list (Ticker list is only captured once at startup) ========================
+
+from post_batch import PostBatch
+import price_store
+from chart_utils import lttb_indices, bucket_ohlcv
+from info_cache import get_ticker_info, INFO_CACHE_MAX_ENTRIES
+
+# ======================== Nasdaq-100 list (disk cache + TTL, refreshed in the background) ========================
+# Import never touches the network: the list comes from the local cache file (or the built-in
+# fallback on a cold machine) and Wikipedia is only scraped by a daemon thread when the cache is stale.
+NASDAQ100_CACHE_PATH = "./data_cache/nasdaq100_tickers.json"
+NASDAQ100_CACHE_TTL = 7 * 24 * 3600  # constituents change a few times a year
+
+# Nasdaq-100 constituents (2025 reconstitution), used until the first successful refresh
+_FALLBACK_NASDAQ100 = [
+    "AAPL","ABNB","ADBE","ADI","ADP","ADSK","AEP","AMAT","AMD","AMGN","AMZN","APP","ARM","ASML",
+    "AVGO","AXON","AZN","BIIB","BKNG","BKR","CCEP","CDNS","CDW","CEG","CHTR","CMCSA","COST","CPRT",
+    "CRWD","CSCO","CSGP","CSX","CTAS","CTSH","DASH","DDOG","DXCM","EA","EXC","FANG","FAST","FTNT",
+    "GEHC","GFS","GILD","GOOG","GOOGL","HON","IDXX","INTC","INTU","ISRG","KDP","KHC","KLAC","LIN",
+    "LRCX","LULU","MAR","MCHP","MDLZ","MELI","META","MNST","MRVL","MSFT","MSTR","MU","NFLX","NVDA",
+    "NXPI","ODFL","ON","ORLY","PANW","PAYX","PCAR","PDD","PEP","PLTR","PYPL","QCOM","REGN","ROP",
+    "ROST","SBUX","SHOP","SNPS","TEAM","TMUS","TRI","TSLA","TTD","TTWO","TXN","VRSK","VRTX","WBD",
+    "WDAY","XEL","ZS"
+]
+
+# How the current list was obtained: {"source", "load_ms", "fetched_at", "count"}
+TICKER_LIST_STATUS = {}
+_refresh_lock = threading.Lock()
+_last_refresh_attempt = 0.0
+_REFRESH_RETRY_SECONDS = 600  # don't hammer Wikipedia on every rerun while it is unreachable
+
 def _fetch_nasdaq100_tickers():
+    "Scrape the current constituents from Wikipedia (network call, background thread only)"
+    tables = pd.read_html("https://en.wikipedia.org/wiki/Nasdaq-100")
+    # Pick the components table by shape instead of a hard-coded index
+    for df in tables:
+        if "Ticker" in df.columns and len(df) >= 90:
+            tickers = df["Ticker"].astype(str).str.replace(".", "-").tolist()
+            return sorted(tickers)
+    raise ValueError("Nasdaq-100 components table not found")
+
+def _refresh_ticker_cache():
+    if not _refresh_lock.acquire(blocking=False):
+        return  # a refresh is already running
+    try:
+        tickers = _fetch_nasdaq100_tickers()
+        os.makedirs(os.path.dirname(NASDAQ100_CACHE_PATH), exist_ok=True)
+        tmp_path = NASDAQ100_CACHE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "tickers": tickers}, f)
+        os.replace(tmp_path, NASDAQ100_CACHE_PATH)
+        print(f"Nasdaq-100 list refreshed: {len(tickers)} tickers")
+    except Exception as e:
+        print(f"Nasdaq-100 list refresh failed: {e}")
+    finally:
+        _refresh_lock.release()
+
+def get_nasdaq100_tickers(ttl: float = NASDAQ100_CACHE_TTL):
+    "Constituent list from the local cache; never blocks on the network"
+    start = time.perf_counter()
+    cached = None
     try:
-        tables = pd.read_html("https://en.wikipedia.org/wiki/Nasdaq-100")
-        df = tables[4]
-        tickers = df["Ticker"].str.replace(".", "-").tolist()
-        return sorted(tickers)
-    except:
-        return [
-            "AAPL","MSFT","NVDA","GOOGL","AMZN","META","AVGO","GOOG","TSLA","LLY",
-            "JPM","UNH","XOM","V","MA","PG","JNJ","HD","COST","MRK","ABBV","CRM",
-            "NFLX","BAC","AMD","CVX","KO","ADBE","PEP","TMO","LIN","WMT","ACN",
-            "CSCO","MCD","ABT","TXN","QCOM","INTU","AMGN","VZ","PFE","IBM","CMCSA",
-            "DIS","NOW","RTX","SPGI","UNP","ISRG","GE","CAT","BKNG","UBER","GS",
-            "NEE","PM","MS","LOW","BLK","HON","SYK","ELV","TJX","VRTX","BSX","LRCX",
-            "REGN","ETN","PLD","MDT","MU","PANW","ADP","KLAC","LMT","CB","ADI","DE",
-            "MMC","ANET","SCHW","FI","BX","MDLZ","TMUS","AMT","SO","BMY","MO","GILD",
-            "CL","ICE","CME","DUK","ZTS","SHW","TT","MCO","CVS","BN","EOG","ITW",
-            "FCX","TGT","BDX","CSX","HCA","EMR","FDX","NOC"
-        ]
-
-NASDAQ100_TICKERS = _fetch_nasdaq100_tickers()
+        with open(NASDAQ100_CACHE_PATH, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    if cached and cached.get("tickers"):
+        tickers = cached["tickers"]
+        fetched_at = cached.get("fetched_at", 0)
+        stale = time.time() - fetched_at > ttl
+        source = "cache (stale)" if stale else "cache"
+    else:
+        tickers, fetched_at, stale, source = list(_FALLBACK_NASDAQ100), None, True, "fallback"
+
+    global _last_refresh_attempt
+    if stale and time.time() - _last_refresh_attempt > _REFRESH_RETRY_SECONDS:
+        _last_refresh_attempt = time.time()
+        threading.Thread(target=_refresh_ticker_cache, daemon=True).start()
+
+    TICKER_LIST_STATUS.update({
+        "source": source,
+        "load_ms": round((time.perf_counter() - start) * 1000, 2),
+        "fetched_at": fetched_at,
+        "count": len(tickers),
+    })
+    return tickers
+
+NASDAQ100_TICKERS = get_nasdaq100_tickers()
 
 STOCK_TICKERS = NASDAQ100_TICKERS
 STOCK_FULL_NAMES = {}  
 
 def get_company_name(ticker: str) -> str:
-    "Retrieve the company's full name in real time"
+    "Retrieve the company's full name (through the shared yfinance info cache)"
     if ticker in STOCK_FULL_NAMES:
         return STOCK_FULL_NAMES[ticker]
-    try:
-        info = yf.Ticker(ticker).info
-        name = info.get("longName", ticker)
-        STOCK_FULL_NAMES[ticker] = name
-        return name
-    except:
+    name = get_ticker_info(ticker).get("longName")
+    if not name:
         return ticker
+    # Bounded like the info cache it mirrors
+    if len(STOCK_FULL_NAMES) >= INFO_CACHE_MAX_ENTRIES:
+        STOCK_FULL_NAMES.pop(next(iter(STOCK_FULL_NAMES)))
+    STOCK_FULL_NAMES[ticker] = name
+    return name
 
 TIME_PERIODS = {
     "1 Month":  "1mo",
@@ -54,16 +124,56 @@ TIME_PERIODS = {
 
 # ========================= indicators, chart functions, etc. ========================
 
+# Intraday chart intervals (all resampled from the stored 1m series) and their session windows
+TIME_INTERVALS = {
+    "Daily":  "1d",
+    "1 Hour": "1h",
+    "15 Min": "15m",
+    "5 Min":  "5m",
+    "1 Min":  "1m",
+}
+
+INTRADAY_PERIODS = {
+    "1 Day":  "1d",
+    "5 Days": "5d",
+}
+
 def get_stock_price_data(ticker, period="1y", interval="1d"):
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period=period, interval=interval)
+    # Daily bars for the standard periods are sliced from the local price store,
+    # intraday bars are resampled from its stored 1-minute series
+    if interval == "1d" and period in price_store.PERIOD_OFFSETS:
+        hist = price_store.get_daily_slice(ticker, period).copy()
+    elif interval in price_store.INTRADAY_SECONDS and period.endswith("d"):
+        hist = price_store.get_intraday_slice(ticker, interval, period).copy()
+    else:
+        stock = yf.Ticker(ticker)
+        hist = stock.history(period=period, interval=interval)
     hist.reset_index(inplace=True)
-    hist["Date"] = hist["Date"].dt.strftime("%Y-%m-%d")
+    if "Datetime" in hist.columns:
+        hist = hist.rename(columns={"Datetime": "Date"})
+    date_format = "%Y-%m-%d" if interval in ("1d", "5d", "1wk", "1mo", "3mo") else "%Y-%m-%d %H:%M"
+    hist["Date"] = hist["Date"].dt.strftime(date_format)
     hist = hist.dropna()
     return hist
 
+def align_sentiment_to_bars(price_data, social_data, interval="1d"):
+    """
+    Sentiment count / mean on the same bar grid as price_data (one row per bar, NaN mean where
+    a bar has no posts), so the overlay lines up with daily or intraday candles.
+    Post times (Alpha Vantage time_published) are UTC: intraday bar starts, stored in exchange
+    time, are converted to UTC first; daily bars are matched on the UTC calendar day like date_str.
+    """
+    if interval in price_store.INTRADAY_SECONDS:
+        seconds = price_store.INTRADAY_SECONDS[interval]
+        starts = price_store.exchange_to_utc_seconds(price_data["Date"])
+    else:
+        seconds = 24 * 3600
+        starts = pd.to_datetime(price_data["Date"]).to_numpy().astype("datetime64[s]").astype(np.int64)
+    stats = PostBatch.coerce(social_data).bar_stats(starts, seconds)
+    stats.insert(0, "Date", price_data["Date"].to_numpy())
+    return stats.drop(columns="bar_start")
+
 def get_stock_fundamental_data(ticker):
-    stock = yf.Ticker(ticker)
     price_data = get_stock_price_data(ticker, period="1y")
     
     tech_indicators = {}
@@ -71,23 +181,19 @@ def get_stock_fundamental_data(ticker):
         tech_indicators["5D Change (%)"] = round(((price_data["Close"].iloc[-1] / price_data["Close"].iloc[-5]) - 1) * 100, 2)
         tech_indicators["60D Change (%)"] = round(((price_data["Close"].iloc[-1] / price_data["Close"].iloc[-60]) - 1) * 100, 2)
         
-        close_prices = price_data["Close"].values
-        rsi = talib.RSI(close_prices, timeperiod=14)
-        tech_indicators["RSI (14)"] = round(rsi[-1], 2) if not np.isnan(rsi[-1]) else "N/A"
+        # RSI / ATR from the incremental indicator state kept alongside the price store
+        # (identical to talib.RSI / talib.ATR over the stored history, O(1) per new bar).
+        # That history is the full 2y store, not the 1y slice above: Wilder smoothing has long
+        # converged by then, so the values differ from a 1y talib run only in far decimals.
+        latest = price_store.get_indicator_values(ticker)
+        rsi = latest.get("RSI (14)", np.nan)
+        tech_indicators["RSI (14)"] = round(rsi, 2) if not np.isnan(rsi) else "N/A"
         
-        high = price_data["High"].values
-        low = price_data["Low"].values
-        atr = talib.ATR(high, low, close_prices, timeperiod=14)
-        tech_indicators["ATR (14)"] = round(atr[-1], 2) if not np.isnan(atr[-1]) else "N/A"
+        atr = latest.get("ATR (14)", np.nan)
+        tech_indicators["ATR (14)"] = round(atr, 2) if not np.isnan(atr) else "N/A"
     
-    # ===== Securely obtain info =====
-    info = {}
-    try:
-        info = stock.info or {}  # If info is None, simply empty the dictionary.
-        if not isinstance(info, dict):
-            info = {}
-    except Exception:
-        info = {}  # Any anomalies will be covered by a zero-sum game.
+    # ===== Securely obtain info (shared TTL cache; {} on any failure) =====
+    info = get_ticker_info(ticker)
     
     fund_indicators = {
         "Gross Margin (%)": round(info.get("grossMargins", 0) * 100, 2) if info.get("grossMargins") is not None else "N/A",
@@ -100,69 +206,77 @@ def get_stock_fundamental_data(ticker):
     all_indicators = {**tech_indicators, **fund_indicators}
     
     # Securely obtain company name and sector
-    all_indicators["Company Name"] = STOCK_FULL_NAMES.get(ticker, ticker)
+    all_indicators["Company Name"] = get_company_name(ticker)
     all_indicators["Sector"] = info.get("sector", "N/A") 
     
     return all_indicators
 
 # ======================== 图表绘制函数（无修改，保留原有） ========================
-def plot_ths_style_chart(ticker, df_price, period_label):
-    "Candlestick chart + volume combination chart"
+# Moving averages drawn on the candlestick chart
+MA_LINE_COLORS = {5: "#FFD700", 10: "#FFA500", 20: "#00BFFF", 60: "#9370DB"}
+
+def plot_ths_style_chart(ticker, df_price, period_label, max_points=None, sentiment=None):
+    """
+    Candlestick chart + volume combination chart. df_price is never modified.
+    max_points: point budget per trace. Above it, candles/volume are merged into max_points
+    OHLCV buckets and the MA lines are LTTB-downsampled and drawn as WebGL (Scattergl) traces.
+    sentiment: align_sentiment_to_bars output; bars with posts are drawn as markers on a
+    secondary axis (marker size ~ post count).
+    """
     if df_price.empty:
         return None, None
+
+    # Moving Average (computed on the full series, before any downsampling)
+    close = df_price["Close"]
+    ma_lines = {w: close.rolling(window=w).mean().to_numpy() for w in MA_LINE_COLORS}
+    dates = df_price["Date"].to_numpy()
+
+    downsample = max_points is not None and len(df_price) > max_points
+    candles = bucket_ohlcv(df_price, max_points) if downsample else df_price
+    line_trace = go.Scattergl if downsample else go.Scatter
     
     # K线图
     fig_kline = go.Figure(data=[go.Candlestick(
-        x=df_price["Date"],
-        open=df_price["Open"],
-        high=df_price["High"],
-        low=df_price["Low"],
-        close=df_price["Close"],
+        x=candles["Date"],
+        open=candles["Open"],
+        high=candles["High"],
+        low=candles["Low"],
+        close=candles["Close"],
         name="Price",
         increasing_line_color="#008000",  #FF4500
         decreasing_line_color="#FF4500",  #008000
         showlegend=False
     )])
     
-    # Moving Average
-    df_price["MA5"] = df_price["Close"].rolling(window=5).mean()
-    df_price["MA10"] = df_price["Close"].rolling(window=10).mean()
-    df_price["MA20"] = df_price["Close"].rolling(window=20).mean()
-    df_price["MA60"] = df_price["Close"].rolling(window=60).mean()
-    
-    fig_kline.add_trace(go.Scatter(
-        x=df_price["Date"],
-        y=df_price["MA5"],
-        mode="lines",
-        name="MA5",
-        line=dict(color="#FFD700", width=1.2),
-        showlegend=True
-    ))
-    fig_kline.add_trace(go.Scatter(
-        x=df_price["Date"],
-        y=df_price["MA10"],
-        mode="lines",
-        name="MA10",
-        line=dict(color="#FFA500", width=1.2),
-        showlegend=True
-    ))
-    fig_kline.add_trace(go.Scatter(
-        x=df_price["Date"],
-        y=df_price["MA20"],
-        mode="lines",
-        name="MA20",
-        line=dict(color="#00BFFF", width=1.2),
-        showlegend=True
-    ))
-    fig_kline.add_trace(go.Scatter(
-        x=df_price["Date"],
-        y=df_price["MA60"],
-        mode="lines",
-        name="MA60",
-        line=dict(color="#9370DB", width=1.2),
-        showlegend=True
-    ))
+    for window, color in MA_LINE_COLORS.items():
+        ma = ma_lines[window]
+        keep = lttb_indices(ma, max_points) if downsample else slice(None)
+        fig_kline.add_trace(line_trace(
+            x=dates[keep],
+            y=ma[keep],
+            mode="lines",
+            name=f"MA{window}",
+            line=dict(color=color, width=1.2),
+            showlegend=True
+        ))
     
+    if sentiment is not None and (sentiment["count"] > 0).any():
+        active = sentiment.loc[sentiment["count"] > 0]
+        fig_kline.add_trace(go.Scatter(
+            x=active["Date"],
+            y=active["mean"],
+            mode="markers",
+            name="Sentiment",
+            yaxis="y2",
+            marker=dict(size=np.clip(4 + 2 * np.sqrt(active["count"].to_numpy()), 4, 16),
+                        color=active["mean"], colorscale="RdYlGn", cmin=-0.5, cmax=0.5, opacity=0.8),
+            customdata=active["count"],
+            hovertemplate="Sentiment %{y:+.3f} (%{customdata} posts)<extra></extra>",
+            showlegend=True
+        ))
+        fig_kline.update_layout(yaxis2=dict(title="Sentiment", overlaying="y", side="right",
+                                            range=[-1, 1], showgrid=False, tickfont=dict(size=10)))
+
     # Candlestick Chart Style
     fig_kline.update_layout(
         title=f"{ticker} Price Chart ({period_label})",
@@ -200,10 +314,10 @@ def plot_ths_style_chart(ticker, df_price, period_label):
     
     # Trading Volume Chart
     fig_volume = go.Figure() #FF4500 #008000
-    colors = ["#008000" if row["Close"] >= row["Open"] else "#FF4500" for _, row in df_price.iterrows()]
+    colors = np.where(candles["Close"].to_numpy() >= candles["Open"].to_numpy(), "#008000", "#FF4500")
     fig_volume.add_trace(go.Bar(
-        x=df_price["Date"],
-        y=df_price["Volume"],
+        x=candles["Date"],
+        y=candles["Volume"],
         name="Volume",
         marker_color=colors,
         opacity=0.8,
@@ -233,6 +347,11 @@ def plot_ths_style_chart(ticker, df_price, period_label):
         tickfont=dict(size=10),
         tickformat=",.0s"
     )
+
+    # Intraday bars ("YYYY-MM-DD HH:MM"): hide nights and weekends instead of drawing empty gaps
+    if len(str(df_price["Date"].iloc[0])) > 10:
+        for fig in (fig_kline, fig_volume):
+            fig.update_xaxes(rangebreaks=[dict(bounds=["sat", "mon"]), dict(bounds=[16, 9.5], pattern="hour")])
     
     return fig_kline, fig_volume
 
@@ -241,27 +360,29 @@ def plot_sentiment_price_correlation(ticker, price_data, social_data, period_nam
     if len(social_data) < 10:
         return None
 
-    df_posts = pd.DataFrame(social_data)
-    df_posts["date"] = pd.to_datetime(df_posts["date_str"])
-    
+    # Daily aggregates straight from the PostBatch day ordinals (no per-row date parsing)
+    stats = PostBatch.coerce(social_data).daily_stats()
+
     # 1. Calculate the daily raw sentiment score mean (before smoothing)
-    daily_raw_sent = df_posts.groupby("date")["sentiment"].mean().reset_index()
-    daily_raw_sent.rename(columns={"sentiment": "raw_sentiment"}, inplace=True)
-    
-    # 2. Calculate the daily smoothed sentiment score mean (if the smooth_sentiment field exists).
-    if "smooth_sentiment" in df_posts.columns:
-        daily_smooth_sent = df_posts.groupby("date")["smooth_sentiment"].mean().reset_index()
-        daily_smooth_sent.rename(columns={"smooth_sentiment": "smooth_sentiment"}, inplace=True)
-        # Combine original + smoothed scores
-        daily_sent = daily_raw_sent.merge(daily_smooth_sent, on="date", how="inner")
+    daily_sent = pd.DataFrame({
+        "date": stats["day"].to_numpy().astype(np.int64).astype("datetime64[D]").astype("datetime64[ns]"),
+        "raw_sentiment": stats["mean"].to_numpy(),
+    })
+
+    # 2. Daily smoothed sentiment score mean (if the smooth_sentiment field exists),
+    #    otherwise only the original fraction is retained.
+    if "smooth_sentiment" in stats.columns:
+        daily_sent["smooth_sentiment"] = stats["smooth_sentiment"].to_numpy()
+        daily_sent = daily_sent.dropna(subset=["smooth_sentiment"])
     else:
-        # When there is no smoothed fraction, only the original fraction is retained.
-        daily_sent = daily_raw_sent
         daily_sent["smooth_sentiment"] = daily_sent["raw_sentiment"]
 
     # Merging price and sentiment data
-    price_data["Date"] = pd.to_datetime(price_data["Date"])
-    merged = price_data[["Date", "Close"]].merge(daily_sent, left_on="Date", right_on="date", how="left")
+    price_dates = pd.DataFrame({
+        "Date": pd.to_datetime(price_data["Date"]).astype("datetime64[ns]"),
+        "Close": price_data["Close"].to_numpy(),
+    })
+    merged = price_dates.merge(daily_sent, left_on="Date", right_on="date", how="left")
     merged = merged.dropna()  # Clearing Away Emotional Days
 
     if len(merged) < 10:
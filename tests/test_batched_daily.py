@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+report_core = pytest.importorskip("report_core")
+_parse_dated_json = report_core._parse_dated_json
+
+
+def test_plain_object():
+    assert _parse_dated_json('{"2024-01-01": "- a", "2024-01-02": "- b"}') == {"2024-01-01": "- a", "2024-01-02": "- b"}
+
+
+def test_code_fence_and_surrounding_prose():
+    raw = 'Here you go:\n```json\n{"2024-01-01": "- a (Source: http://x)"}\n```'
+    assert _parse_dated_json(raw) == {"2024-01-01": "- a (Source: http://x)"}
+
+
+def test_list_values_are_joined_and_other_types_dropped():
+    raw = '{"2024-01-01": ["- a", "- b"], "2024-01-02": 3, "2024-01-03": {"x": 1}}'
+    assert _parse_dated_json(raw) == {"2024-01-01": "- a\n- b"}
+
+
+def test_truncated_answer_keeps_completed_dates():
+    raw = '{"2024-01-01": "- a", "2024-01-02": "- b \\"quoted\\", more",\n "2024-01-03": "- cut o'
+    assert _parse_dated_json(raw) == {"2024-01-01": "- a", "2024-01-02": '- b "quoted", more'}
+
+
+@pytest.mark.parametrize("raw", ["", "no json here", "[1, 2]", '{"2024-01-01": '])
+def test_unusable_answers(raw):
+    assert _parse_dated_json(raw) == {}
+
+
+def test_batch_size_fits_output_budget():
+    assert report_core.DAILY_BATCH_MAX_DATES * report_core.DAILY_ANSWER_TOKENS <= report_core.LLM_MAX_OUTPUT_TOKENS
+
+
+def _day_docs(day, n=20):
+    # Alpha Vantage title + summary: roughly 500-700 characters per article
+    return [report_core.Document(
+        page_content=f"Title {day} #{i}. " + "Analysts weigh guidance, margins and demand trends. " * 11,
+        metadata={"sentiment_score": 0.1 * (i % 5), "link": f"https://news.example.com/{day}/{i}"},
+    ) for i in range(n)]
+
+
+def test_sixty_days_pack_into_few_requests():
+    dates = [f"2024-{m:02d}-{d:02d}" for m in (1, 2) for d in range(1, 31)]
+    sizes = {d: report_core.count_tokens(report_core.format_comments(_day_docs(d))) for d in dates}
+    budget = report_core.daily_batch_tokens(prompt_tokens=2000)
+    batches = report_core._pack_dates(dates, sizes, budget)
+    assert [d for b in batches for d in b] == dates
+    assert len(batches) <= math.ceil(len(dates) / report_core.DAILY_BATCH_MAX_DATES)
+
+
+def test_pack_dates_respects_budget_and_date_cap():
+    dates = [f"2024-01-{d:02d}" for d in range(1, 11)]
+    batches = report_core._pack_dates(dates, {d: 400 for d in dates}, budget=1000, max_dates=3)
+    assert [len(b) for b in batches] == [2, 2, 2, 2, 2]
+    batches = report_core._pack_dates(dates, {d: 10 for d in dates}, budget=1000, max_dates=3)
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    # An oversized date still gets a request of its own
+    assert report_core._pack_dates(dates[:2], {dates[0]: 5000, dates[1]: 10}, budget=1000) == [[dates[0]], [dates[1]]]
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from chart_utils import lttb_indices, bucket_ohlcv
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    y = np.sin(np.linspace(0, 20, 5000))
+    idx = lttb_indices(y, 300)
+    assert len(idx) == 300
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_keeps_spike():
+    y = np.zeros(2000)
+    y[1234] = 50.0
+    assert 1234 in lttb_indices(y, 100)
+
+
+def test_lttb_skips_nan_warmup():
+    y = np.arange(1000, dtype=float)
+    y[:59] = np.nan
+    idx = lttb_indices(y, 50)
+    assert idx[0] == 59 and not np.isnan(y[idx]).any()
+
+
+def test_lttb_under_budget_returns_all_valid():
+    y = np.array([np.nan, 1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(lttb_indices(y, 10), [1, 2, 3])
+
+
+def test_bucket_ohlcv_matches_groupby():
+    rng = np.random.default_rng(1)
+    n = 1003
+    close = 100 + np.cumsum(rng.normal(size=n))
+    df = pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=n, freq="min").strftime("%Y-%m-%d %H:%M"),
+        "Open": close + rng.normal(size=n), "High": close + 2, "Low": close - 2,
+        "Close": close, "Volume": rng.integers(1, 1000, n).astype(float),
+    })
+    out = bucket_ohlcv(df, 100)
+    assert len(out) == 100
+    assert out["Volume"].sum() == df["Volume"].sum()
+    assert out["High"].max() == df["High"].max() and out["Low"].min() == df["Low"].min()
+    assert out["Open"].iloc[0] == df["Open"].iloc[0] and out["Close"].iloc[-1] == df["Close"].iloc[-1]
+    assert len(bucket_ohlcv(df.head(50), 100)) == 50
@@ -0,0 +1,86 @@
+from compaction import (count_tokens, truncate_tokens, week_key, pack, reduce_to_budget,
+                        compact_daily_summaries)
+
+
+def fake_summarize(calls):
+    def summarize(text, budget):
+        calls.append((count_tokens(text), budget))
+        return "digest " * max(1, budget // 4)
+    return summarize
+
+
+def test_week_key_is_monday():
+    assert week_key("2024-01-03") == "2024-01-01"   # Wednesday
+    assert week_key("2024-01-07") == "2024-01-01"   # Sunday
+    assert week_key("2024-01-08") == "2024-01-08"   # Monday
+
+
+def test_pack_keeps_order_and_budget():
+    texts = [f"item {i} " + "word " * 40 for i in range(20)]
+    budget = count_tokens(texts[0]) * 3
+    chunks = pack(texts, budget)
+    assert "\n\n".join(chunks) == "\n\n".join(texts)
+    assert all(count_tokens(c) <= budget + 2 for c in chunks)   # +2: joining newlines
+    assert len(chunks) > 1
+
+
+def test_pack_oversized_text_gets_its_own_chunk():
+    big = "word " * 500
+    assert pack(["a", big, "b"], 50) == ["a", big, "b"]
+
+
+def test_truncate_tokens_cuts_on_lines():
+    text = "\n".join(f"line {i} " + "x " * 20 for i in range(50))
+    out = truncate_tokens(text, 100)
+    assert count_tokens(out) <= 100
+    assert text.startswith(out) and text[len(out)] == "\n"
+    assert truncate_tokens("short", 100) == "short"
+
+
+def test_truncate_tokens_keeps_the_longest_fitting_prefix():
+    text = "\n".join(f"line {i} " + "x " * (i % 7) for i in range(400))
+    out = truncate_tokens(text, 300)
+    lines = text.splitlines()
+    kept = out.count("\n") + 1
+    assert out == "\n".join(lines[:kept])
+    assert count_tokens("\n".join(lines[:kept + 1])) > 300
+
+
+def test_truncate_tokens_cuts_a_single_long_line():
+    out = truncate_tokens("word " * 1000, 50)
+    assert 0 < count_tokens(out) <= 50
+
+
+def test_reduce_to_budget_passes_through_when_it_fits():
+    calls = []
+    assert reduce_to_budget(["a", "", "b"], 100, fake_summarize(calls)) == "a\n\nb"
+    assert calls == []
+
+
+def test_reduce_to_budget_summarizes_until_it_fits():
+    calls = []
+    texts = ["word " * 200 for _ in range(30)]
+    out = reduce_to_budget(texts, 300, fake_summarize(calls))
+    assert count_tokens(out) <= 300
+    assert calls and all(b <= 300 for _, b in calls)
+
+
+def test_reduce_to_budget_uses_map_fn():
+    batches = []
+    def map_fn(jobs):
+        batches.append(len(jobs))
+        return ["short"] * len(jobs)
+    reduce_to_budget(["word " * 200 for _ in range(30)], 300, fake_summarize([]), map_fn=map_fn)
+    assert batches and batches[0] > 1
+
+
+def test_compact_daily_summaries_bounds_and_skips_small_weeks():
+    calls = []
+    daily = [(f"2024-01-{d:02d}", "note " * (5 if d < 8 else 300)) for d in range(1, 29)]
+    out = compact_daily_summaries(daily, fake_summarize(calls), week_budget=200, period_budget=400)
+    weeks = dict(out["weeks"])
+    assert list(weeks) == ["2024-01-01", "2024-01-08", "2024-01-15", "2024-01-22"]
+    assert "### 2024-01-01" in weeks["2024-01-01"]           # fits: passed through verbatim
+    assert all(count_tokens(w) <= 200 for w in weeks.values())
+    assert count_tokens(out["period"]) <= 400
+    assert len([c for c in calls if c[1] == 200]) == 3        # only the three long weeks
@@ -0,0 +1,39 @@
+import llm_cache
+from disk_cache import SqliteCache
+
+
+def test_lru_eviction_keeps_recently_read_entries(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite"), max_bytes=300)
+    cache.put_many({"a": b"x" * 100, "b": b"x" * 100, "c": b"x" * 100})
+    cache._conn.execute("UPDATE cache SET accessed = created - 10 WHERE key IN ('a', 'b')")
+    assert cache.get("a") is not None          # a read refreshes a; b is now least recently used
+    cache.put("d", b"x" * 100)
+    assert set(cache.get_many(["a", "b", "c", "d"])) == {"a", "c", "d"}
+    assert cache.total_bytes() <= 300
+
+
+def test_oversized_batch_evicts_down_to_the_cap(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite"), max_bytes=250)
+    cache.put_many({str(i): b"x" * 100 for i in range(6)})
+    assert len(cache) == 2 and cache.total_bytes() == 200
+
+
+def test_no_cap_keeps_everything(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite"))
+    cache.put_many({str(i): b"x" * 100 for i in range(20)})
+    assert len(cache) == 20
+
+
+def test_failed_answers_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", SqliteCache(str(tmp_path / "llm.sqlite")))
+    for answer in ("", "  \n", "[Analysis unavailable]"):
+        llm_cache.put_cached_response("k", answer)
+        assert llm_cache.get_cached_response("k") is None
+    llm_cache.put_cached_response("k", "- a (Source: http://x)")
+    assert llm_cache.get_cached_response("k") == "- a (Source: http://x)"
+
+
+def test_cache_key_covers_the_rendered_articles():
+    key = llm_cache.response_cache_key("sys", "q", "ctx", "gpt-4o", "[+0.1000] a\nSource: http://x")
+    assert key == llm_cache.response_cache_key("sys", "q", "ctx", "gpt-4o", "[+0.1000] a\nSource: http://x")
+    assert key != llm_cache.response_cache_key("sys", "q", "ctx", "gpt-4o", "[+0.5000] a\nSource: http://x")
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import RSIState, ATRState, SMAState, IndicatorState
+
+
+def _prices(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    return high, low, close
+
+
+# ---------------- plain NumPy references (TA-Lib conventions) ----------------
+def wilder(values, period):
+    """NaN-led series: seed with the mean of the first `period` values, then (avg*(p-1)+x)/p."""
+    out = np.full(len(values), np.nan)
+    first = np.flatnonzero(~np.isnan(values))[0]
+    seed_end = first + period
+    if seed_end > len(values):
+        return out
+    avg = values[first:seed_end].mean()
+    out[seed_end - 1] = avg
+    for i in range(seed_end, len(values)):
+        avg = (avg * (period - 1) + values[i]) / period
+        out[i] = avg
+    return out
+
+
+def reference_rsi(close, period=14):
+    diff = np.concatenate([[np.nan], np.diff(close)])
+    gain = wilder(np.where(np.isnan(diff), np.nan, np.maximum(diff, 0)), period)
+    loss = wilder(np.where(np.isnan(diff), np.nan, np.maximum(-diff, 0)), period)
+    return 100 * gain / (gain + loss)
+
+
+def reference_atr(high, low, close, period=14):
+    prev = np.concatenate([[np.nan], close[:-1]])
+    tr = np.maximum(high, prev) - np.minimum(low, prev)   # NaN on the first bar, as in talib
+    return wilder(tr, period)
+
+
+def _run(state_update, *series):
+    return np.array([state_update(*row)[0] for row in zip(*series)])
+
+
+# ---------------- always-on checks ----------------
+def test_rsi_matches_wilder_reference():
+    _, _, close = _prices()
+    np.testing.assert_allclose(_run(RSIState(14).update, close), reference_rsi(close), rtol=1e-9, equal_nan=True)
+
+
+def test_atr_matches_wilder_reference():
+    high, low, close = _prices()
+    np.testing.assert_allclose(_run(ATRState(14).update, high, low, close),
+                               reference_atr(high, low, close), rtol=1e-9, equal_nan=True)
+
+
+def test_sma_matches_pandas_rolling_mean():
+    _, _, close = _prices()
+    for window in (5, 20, 60):
+        expected = pd.Series(close).rolling(window).mean().to_numpy()
+        np.testing.assert_allclose(_run(SMAState(window).update, close), expected, rtol=1e-9, equal_nan=True)
+
+
+def test_vector_width_matches_per_column():
+    cols = [_prices(seed=s) for s in range(3)]
+    close = np.column_stack([c[2] for c in cols])
+    state = RSIState(14, width=3)
+    ours = np.vstack([state.update(row) for row in close])
+    for j in range(3):
+        np.testing.assert_allclose(ours[:, j], reference_rsi(close[:, j]), rtol=1e-9, equal_nan=True)
+
+
+def test_round_trip_resumes_identically():
+    high, low, close = _prices()
+    expected = IndicatorState().update_many(high, low, close)
+
+    head = IndicatorState()
+    head.update_many(high[:200], low[:200], close[:200])
+    resumed = IndicatorState.from_dict(json.loads(json.dumps(head.to_dict())))
+    got = resumed.update_many(high[200:], low[200:], close[200:])
+    for key in expected:
+        np.testing.assert_allclose(got[key], expected[key], rtol=1e-12)
+
+
+def test_peek_does_not_commit():
+    high, low, close = _prices(50)
+    state = IndicatorState()
+    state.update_many(high[:-1], low[:-1], close[:-1])
+    before = json.dumps(state.to_dict())
+    peeked = state.peek(high[-1], low[-1], close[-1])
+    assert json.dumps(state.to_dict()) == before
+    committed = state.update(high[-1], low[-1], close[-1])
+    for key in peeked:
+        np.testing.assert_allclose(peeked[key], committed[key])
+
+
+# ---------------- optional: TA-Lib itself, when installed ----------------
+def test_rsi_atr_match_talib():
+    talib = pytest.importorskip("talib")
+    high, low, close = _prices()
+    np.testing.assert_allclose(_run(RSIState(14).update, close), talib.RSI(close, 14), rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(_run(ATRState(14).update, high, low, close),
+                               talib.ATR(high, low, close, 14), rtol=1e-9, equal_nan=True)
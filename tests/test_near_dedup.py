@@ -0,0 +1,44 @@
+import numpy as np
+
+from near_dedup import NearDuplicateIndex, collapse_near_duplicates, shingles
+
+STORY = ("Nvidia shares rose on Tuesday after the chipmaker reported record data center revenue "
+         "and guided third quarter sales above analyst expectations")
+
+
+def test_shingles_are_normalized_and_unique():
+    assert np.array_equal(np.sort(shingles("Foo bar, FOO bar!")), np.sort(shingles("foo bar foo bar")))
+    assert shingles("").size == 0
+
+
+def test_syndicated_copy_is_found():
+    index = NearDuplicateIndex(threshold=0.6)
+    index.insert("a", index.signature(STORY + " - Reuters"))
+    assert index.query(index.signature(STORY + " | Benzinga")) == "a"
+
+
+def test_unrelated_text_is_not_a_duplicate():
+    index = NearDuplicateIndex(threshold=0.6)
+    index.insert("a", index.signature(STORY))
+    other = "Apple unveiled a new iPhone lineup with a faster processor and longer battery life at its fall event"
+    assert index.query(index.signature(other)) is None
+
+
+def test_empty_text_has_no_signature():
+    index = NearDuplicateIndex()
+    assert index.signature("!!!") is None
+    index.insert("x", None)
+    assert len(index) == 0 and index.query(None) is None
+
+
+def test_collapse_keeps_first_and_counts_copies():
+    texts = [STORY, "Tesla deliveries fell short of estimates in the second quarter as demand cooled",
+             STORY + " - Reuters", STORY.replace("Tuesday", "Tuesday morning")]
+    reps, counts = collapse_near_duplicates(texts)
+    assert reps == [0, 1]
+    assert counts == [2, 0]
+
+
+def test_signatures_are_deterministic():
+    a, b = NearDuplicateIndex(seed=7), NearDuplicateIndex(seed=7)
+    np.testing.assert_array_equal(a.signature(STORY), b.signature(STORY))
@@ -0,0 +1,96 @@
+from datetime import date
+
+import pytest
+
+import news_store
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(news_store, "NEWS_CACHE_DIR", str(tmp_path))
+
+
+def _item(day, i, tickers=("AAPL",)):
+    return {"title": f"t{i}", "summary": "s", "time_published": f"{day:%Y%m%d}T100000", "url": f"http://x/{day}/{i}",
+            "ticker_sentiment": [{"ticker": t} for t in tickers]}
+
+
+def _counting(calls):
+    def count(items):
+        calls.append(len(items))
+        return len(items)
+    return count
+
+
+def test_counts_are_stored_at_write_time():
+    day, calls = date(2024, 1, 2), []
+    count = _counting(calls)
+    news_store.save_items("AAPL", [_item(day, i) for i in range(5)], counters={"k": count})
+    assert calls == [5]
+    for _ in range(3):
+        assert news_store.missing_days("AAPL", day, day, satisfied_count=5, count_fn=count, count_key="k") == []
+    assert calls == [5]   # refreshes read the stored count
+
+
+def test_fan_out_drops_stale_counts_and_backfills_once():
+    day, calls = date(2024, 1, 2), []
+    count = _counting(calls)
+    news_store.save_items("MSFT", [_item(day, i) for i in range(3)], counters={"k": count})
+    assert news_store.missing_days("MSFT", day, day, satisfied_count=5, count_fn=count, count_key="k") == [day]
+    # A peer's fetch adds MSFT items: the stored count is stale and gets recounted exactly once
+    news_store.save_items("AAPL", [_item(day, i, ("AAPL", "MSFT")) for i in range(10, 14)], counters={"k": count})
+    calls.clear()
+    assert news_store.missing_days("MSFT", day, day, satisfied_count=5, count_fn=count, count_key="k") == []
+    assert news_store.missing_days("MSFT", day, day, satisfied_count=5, count_fn=count, count_key="k") == []
+    assert calls == [7]
+
+
+@pytest.fixture
+def today(monkeypatch):
+    monkeypatch.setattr(news_store, "open_day", lambda: date(2024, 1, 10))
+    return date(2024, 1, 10)
+
+
+def test_closed_days_for_a_short_page_cover_the_window(today):
+    items = [_item(date(2024, 1, 5), 0)]
+    assert news_store.closed_days_for_fetch(date(2024, 1, 3), date(2024, 1, 6), items, limit=3) == [
+        date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 5), date(2024, 1, 6)]
+
+
+def test_closed_days_never_include_today(today):
+    days = news_store.closed_days_for_fetch(date(2024, 1, 8), date(2024, 1, 12), [], limit=3)
+    assert days == [date(2024, 1, 8), date(2024, 1, 9)]
+
+
+def test_truncated_full_page_trusts_only_days_after_the_oldest_item(today):
+    items = [_item(date(2024, 1, d), d) for d in (7, 6, 5)]   # newest first, cut at Jan 5
+    assert news_store.closed_days_for_fetch(date(2024, 1, 1), date(2024, 1, 8), items, limit=3) == [
+        date(2024, 1, 6), date(2024, 1, 7), date(2024, 1, 8)]
+    undated = [{"title": "t", "time_published": ""}] * 3
+    assert news_store.closed_days_for_fetch(date(2024, 1, 1), date(2024, 1, 8), undated, limit=3) == []
+
+
+def test_missing_days_skip_complete_days_but_not_today(today):
+    news_store.save_items("AAPL", [], complete_days=[date(2024, 1, 8), date(2024, 1, 9)])
+    assert news_store.missing_days("AAPL", date(2024, 1, 7), date(2024, 1, 10)) == [date(2024, 1, 7), date(2024, 1, 10)]
+
+
+def test_missing_days_satisfied_count(today):
+    news_store.save_items("AAPL", [_item(date(2024, 1, 8), i) for i in range(4)]
+                          + [_item(date(2024, 1, 10), i) for i in range(4)], fan_out=False)
+    span = (date(2024, 1, 8), date(2024, 1, 10))
+    assert news_store.missing_days("AAPL", *span) == list(news_store.iter_days(*span))
+    # Jan 8 holds 4 items; Jan 9 holds none; today (Jan 10) is still open whatever it holds
+    assert news_store.missing_days("AAPL", *span, satisfied_count=4) == [date(2024, 1, 9), date(2024, 1, 10)]
+    assert news_store.missing_days("AAPL", *span, satisfied_count=5) == list(news_store.iter_days(*span))
+    # count_fn filters first: only two of Jan 8's items are usable
+    assert news_store.missing_days("AAPL", *span, satisfied_count=4, count_fn=lambda items: len(items) // 2) == \
+        list(news_store.iter_days(*span))
+
+
+def test_fan_out_indexes_peers_without_completing_them(today):
+    news_store.save_items("AAPL", [_item(date(2024, 1, 8), 0, ("AAPL", "MSFT", "CRYPTO:BTC"))],
+                          complete_days=[date(2024, 1, 8)])
+    assert len(news_store.load_items("MSFT", date(2024, 1, 8), date(2024, 1, 8))) == 1
+    assert news_store.load_complete_days("MSFT") == set()
+    assert news_store.load_complete_days("AAPL") == {"2024-01-08"}
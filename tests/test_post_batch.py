@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import numpy as np
+
+from post_batch import PostBatch
+
+
+def test_extra_columns_from_any_post_with_defaults():
+    batch = PostBatch.from_posts([
+        {"post": "a", "sentiment": 0.5, "time_published": datetime(2024, 1, 1), "dup_count": 2},
+        {"post": "b", "sentiment": 0.1, "time_published": "20240102T100000", "relevance": 0.3},
+    ])
+    rows = list(batch)
+    assert [r["dup_count"] for r in rows] == [2, 0]
+    assert np.isnan(rows[0]["relevance"]) and rows[1]["relevance"] == 0.3
+
+
+def test_invalid_timestamps_are_dropped():
+    batch = PostBatch.from_posts([
+        {"post": "a", "sentiment": 0.5, "date_str": "2024-01-01"},
+        {"post": "b", "sentiment": 0.2, "time_published": None},
+    ])
+    assert len(batch) == 1 and batch[0]["date_str"] == "2024-01-01"
+
+
+def test_daily_stats():
+    posts = [{"post": str(i), "sentiment": s, "date_str": d}
+             for i, (s, d) in enumerate([(0.1, "2024-01-01"), (0.3, "2024-01-01"), (-0.2, "2024-01-02")])]
+    stats = PostBatch.from_posts(posts).daily_stats()
+    assert stats["date_str"].tolist() == ["2024-01-01", "2024-01-02"]
+    np.testing.assert_allclose(stats["mean"], [0.2, -0.2])
+    assert stats["count"].tolist() == [2, 1]
+
+
+def test_empty():
+    assert len(PostBatch.from_posts([])) == 0
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_store
+from price_store import resample_bars
+
+
+def _minutes(seed=0):
+    """Two sessions of 1m bars (exchange wall clock, tz-naive) with a few missing minutes."""
+    rng = np.random.default_rng(seed)
+    index = pd.DatetimeIndex([])
+    for day in ("2024-03-04", "2024-03-05"):
+        index = index.append(pd.date_range(f"{day} 09:30", f"{day} 15:59", freq="1min"))
+    index = index.delete(rng.choice(len(index), 40, replace=False))
+    close = 100 + np.cumsum(rng.normal(0, 0.1, len(index)))
+    open_ = close + rng.normal(0, 0.05, len(index))
+    df = pd.DataFrame({
+        "Open": open_, "Close": close,
+        "High": np.maximum(open_, close) + 0.05, "Low": np.minimum(open_, close) - 0.05,
+        "Volume": rng.integers(100, 1000, len(index)).astype(float),
+        "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+    df.index.name = "Date"
+    return df
+
+
+def _reference(minutes, rule):
+    # Hourly bars start at the 09:30 open, not on the clock hour
+    grouped = minutes.resample(rule, offset="30min" if rule == "1h" else None)
+    ref = grouped.agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
+    return ref.dropna(subset=["Open"])
+
+
+@pytest.mark.parametrize("interval, rule", [("5m", "5min"), ("15m", "15min"), ("1h", "1h")])
+def test_resample_matches_pandas(interval, rule):
+    minutes = _minutes()
+    bars = resample_bars(minutes, price_store.INTRADAY_SECONDS[interval])
+    ref = _reference(minutes, rule)
+    assert list(bars.index) == list(ref.index)
+    for col in ("Open", "High", "Low", "Close", "Volume"):
+        np.testing.assert_allclose(bars[col].to_numpy(), ref[col].to_numpy(), err_msg=col)
+
+
+def test_hourly_bars_start_at_the_open():
+    bars = resample_bars(_minutes(), 3600)
+    assert {t.strftime("%H:%M") for t in bars.index} == {"09:30", "10:30", "11:30", "12:30", "13:30", "14:30", "15:30"}
+
+
+def test_one_minute_and_empty_pass_through():
+    minutes = _minutes()
+    assert resample_bars(minutes, 60) is minutes
+    empty = minutes.iloc[:0]
+    assert resample_bars(empty, 300) is empty
+
+
+def test_intraday_slice_keeps_the_last_sessions(monkeypatch):
+    minutes = _minutes()
+    monkeypatch.setattr(price_store, "load_minute_history", lambda ticker: minutes)
+    bars = price_store.get_intraday_slice("NVDA", "15m", period="1d")
+    assert bars.index.normalize().unique().tolist() == [pd.Timestamp("2024-03-05")]
+    assert len(price_store.get_intraday_slice("NVDA", "15m", period="5d")) == len(resample_bars(minutes, 900))
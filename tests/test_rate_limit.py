@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from rate_limit import AzureRateLimiter, TokenBucket, retry_after_seconds
+
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, headers=None):
+        super().__init__("429")
+        self.response = _Response(headers or {})
+
+
+def _fast_limiter(**kwargs):
+    return AzureRateLimiter(rpm=60000, tpm=1e9, **kwargs)
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds({"retry-after-ms": "250"}) == pytest.approx(0.25)
+    assert retry_after_seconds({"Retry-After": "3"}) == 3.0
+    assert retry_after_seconds({}) is None
+    assert retry_after_seconds(None) is None
+
+
+def test_additive_increase_up_to_max():
+    limiter = _fast_limiter(max_concurrency=4, initial_concurrency=1)
+    for _ in range(50):
+        with limiter.request(10):
+            pass
+    assert limiter.concurrency == 4
+
+
+def test_multiplicative_decrease_and_retry_after_pause():
+    limiter = _fast_limiter(max_concurrency=8, initial_concurrency=8)
+    with pytest.raises(FakeRateLimitError):
+        with limiter.request(10):
+            raise FakeRateLimitError({"retry-after-ms": "200"})
+    assert limiter.concurrency == 4
+    assert limiter.stats["throttled"] == 1
+    start = time.monotonic()
+    with limiter.request(10):
+        pass
+    assert time.monotonic() - start >= 0.15
+
+
+def test_other_errors_do_not_throttle():
+    limiter = _fast_limiter(initial_concurrency=4)
+    with pytest.raises(ValueError):
+        with limiter.request(10):
+            raise ValueError("boom")
+    assert limiter.concurrency == 4 and limiter.stats["throttled"] == 0
+
+
+def test_concurrency_limit_is_enforced():
+    limiter = _fast_limiter(max_concurrency=3, initial_concurrency=3)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        with limiter.request(1):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= 3
+
+
+def test_remaining_headers_clamp_buckets():
+    limiter = AzureRateLimiter(rpm=600, tpm=100000)
+    limiter.observe({"x-ratelimit-remaining-requests": "0", "x-ratelimit-remaining-tokens": "50"})
+    assert limiter.tokens._tokens == pytest.approx(50, abs=5)
+    start = time.monotonic()
+    with limiter.request(1):
+        pass
+    assert time.monotonic() - start >= 0.05   # waited for one request to refill (10/s)
+
+
+def test_reported_usage_refunds_the_estimate():
+    limiter = AzureRateLimiter(rpm=600, tpm=10000)
+    with limiter.request(4000) as lease:
+        lease.observe(None, total_tokens=1000)
+    assert limiter.tokens._tokens == pytest.approx(9000, abs=50)
+
+
+def test_usage_goes_to_the_lease_it_was_reported_for():
+    limiter = AzureRateLimiter(rpm=600, tpm=10000, initial_concurrency=2)
+    first = limiter.request(3000)
+    second = limiter.request(3000)
+    # Reported from another thread (e.g. a callback), after the second request was admitted
+    worker = threading.Thread(target=first.observe, args=(None, 500))
+    worker.start()
+    worker.join()
+    with first:
+        pass
+    assert first.actual_tokens == 500 and second.actual_tokens is None
+    with second:
+        pass
+    assert limiter.tokens._tokens == pytest.approx(10000 - 500 - 3000, abs=50)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=1, refill_per_second=20)
+    bucket.acquire()
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.03
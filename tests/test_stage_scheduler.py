@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from stage_scheduler import StageScheduler
+
+
+def test_dependencies_are_passed_as_kwargs():
+    s = StageScheduler(max_workers=2)
+    s.add("a", lambda: 1).add("b", lambda: 2).add("c", lambda a, b: a + b, deps=["a", "b"])
+    assert s.run() == {"a": 1, "b": 2, "c": 3}
+    assert set(s.timings) == {"a", "b", "c"}
+    assert "wall-clock" in s.summary()
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    s = StageScheduler(max_workers=2)
+    s.add("a", lambda: barrier.wait()).add("b", lambda: barrier.wait())
+    s.run()   # would time out (BrokenBarrierError) if run one after the other
+
+
+def test_stage_starts_after_its_dependency_finishes():
+    s = StageScheduler(max_workers=4)
+    s.add("slow", lambda: time.sleep(0.05) or "x").add("next", lambda slow: slow * 2, deps=["slow"])
+    result = s.run()
+    assert result["next"] == "xx"
+    assert s.timings["next"]["start"] >= s.timings["slow"]["end"]
+
+
+def test_cycle_is_rejected():
+    s = StageScheduler()
+    s.add("a", lambda b: b, deps=["b"]).add("b", lambda a: a, deps=["a"])
+    with pytest.raises(ValueError, match="cycle"):
+        s.run()
+
+
+def test_unknown_dependency_is_rejected():
+    s = StageScheduler()
+    s.add("a", lambda missing: missing, deps=["missing"])
+    with pytest.raises(ValueError, match="unknown"):
+        s.run()
+
+
+def test_duplicate_stage_is_rejected():
+    s = StageScheduler().add("a", lambda: 1)
+    with pytest.raises(ValueError):
+        s.add("a", lambda: 2)
+
+
+def test_failure_propagates_and_skips_dependents():
+    ran = []
+    s = StageScheduler()
+    s.add("bad", lambda: 1 / 0).add("after", lambda bad: ran.append(bad), deps=["bad"])
+    with pytest.raises(ZeroDivisionError):
+        s.run()
+    assert ran == []
@@ -0,0 +1,126 @@
+import hashlib
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from vector_index import DatePartitionedIndex, RetrievalPlanner
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 16-d vectors seeded by the text; counts query embeddings."""
+    def __init__(self):
+        self.queries = 0
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        return np.random.default_rng(seed).normal(size=16).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self._vector(text)
+
+
+def _docs(n, days=3, start=0):
+    return [Document(page_content=f"article {i}",
+                     metadata={"date_str": f"2024-01-0{1 + i % days}", "doc_id": f"d{i}",
+                               "sentiment_score": round(0.1 * (i % 7), 1)})
+            for i in range(start, start + n)]
+
+
+def _brute_force(embedding, docs, query, k):
+    matrix = np.array(embedding.embed_documents([d.page_content for d in docs]))
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    q = np.array(embedding._vector(query))
+    scores = matrix @ (q / np.linalg.norm(q))
+    return [docs[i].metadata["doc_id"] for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+@pytest.fixture
+def index():
+    embedding = HashEmbeddings()
+    idx = DatePartitionedIndex(embedding)
+    docs = _docs(30)
+    # Several appends per partition: the chunks are merged on the first query
+    for i in range(0, 30, 7):
+        idx.add_documents(docs[i:i + 7])
+    return idx, docs
+
+
+def test_search_matches_brute_force(index):
+    idx, docs = index
+    assert len(idx) == 30
+    got = [d.metadata["doc_id"] for d in idx.similarity_search("rates", k=5)]
+    assert got == _brute_force(idx.embedding, docs, "rates", 5)
+
+
+def test_filter_searches_one_partition(index):
+    idx, docs = index
+    day = [d for d in docs if d.metadata["date_str"] == "2024-01-02"]
+    got = idx.similarity_search("rates", k=4, filter={"date_str": "2024-01-02"})
+    assert [d.metadata["doc_id"] for d in got] == _brute_force(idx.embedding, day, "rates", 4)
+    assert idx.similarity_search("rates", k=4, filter={"date_str": "2023-12-31"}) == []
+    with pytest.raises(ValueError):
+        idx.similarity_search("rates", filter={"ticker": "NVDA"})
+
+
+def test_k_larger_than_partition(index):
+    idx, _ = index
+    assert len(idx.similarity_search("rates", k=50, filter={"date_str": "2024-01-01"})) == 10
+
+
+def test_partitions_and_metadata_updates(index):
+    idx, _ = index
+    assert idx.partition_counts() == {"2024-01-01": 10, "2024-01-02": 10, "2024-01-03": 10}
+    idx.update_metadata([Document(page_content="article 3",
+                                  metadata={"date_str": "2024-01-01", "doc_id": "d3", "dup_count": 4})])
+    stored = {d.metadata["doc_id"]: d for d in idx.partition_documents("2024-01-01")}
+    assert stored["d3"].metadata["dup_count"] == 4
+    assert stored["d3"].metadata["sentiment_score"] == 0.3
+
+
+class _CountingIndex(DatePartitionedIndex):
+    def __init__(self, embedding):
+        super().__init__(embedding)
+        self.count_calls = 0
+        self.searches = []
+
+    def partition_counts(self):
+        self.count_calls += 1
+        return super().partition_counts()
+
+    def similarity_search(self, query, k=4, filter=None):
+        self.searches.append((k, filter))
+        return super().similarity_search(query, k=k, filter=filter)
+
+
+def test_planner_bypasses_small_partitions():
+    embedding = HashEmbeddings()
+    idx = _CountingIndex(embedding)
+    idx.add_documents(_docs(30))
+    planner = RetrievalPlanner(idx)
+    docs = planner.retrieve("rates", k=10, date_filter="2024-01-01")   # exactly k documents
+    assert len(docs) == 10 and planner.bypassed == 1
+    assert embedding.queries == 0 and idx.searches == []
+    # Fixed order: sentiment desc, then doc_id
+    keys = [(-d.metadata["sentiment_score"], d.metadata["doc_id"]) for d in docs]
+    assert keys == sorted(keys)
+    # A date with no partition is not counted: it goes to the vector search (which finds nothing)
+    assert planner.retrieve("rates", k=20, date_filter="2024-01-09") == []
+    assert planner.searched == 1
+
+
+def test_planner_searches_large_partitions_and_undated_queries():
+    embedding = HashEmbeddings()
+    idx = _CountingIndex(embedding)
+    idx.add_documents(_docs(30))
+    planner = RetrievalPlanner(idx)
+    assert len(planner.retrieve("rates", k=4, date_filter="2024-01-02")) == 4
+    assert len(planner.retrieve("rates", k=4)) == 4
+    assert planner.searched == 2 and planner.bypassed == 0
+    assert idx.searches == [(4, {"date_str": "2024-01-02"}), (4, None)]
+    assert idx.count_calls == 1   # counted once per report
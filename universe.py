@@ -0,0 +1,96 @@
+# universe.py
+# Universe mode: one batched yf.download for every constituent into aligned (date x ticker)
+# NumPy arrays, then the indicators of get_stock_fundamental_data (5D/60D change, RSI(14),
+# ATR(14)) plus MA5/10/20/60 computed for all columns at once.
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from indicators import RSIState, ATRState
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+MA_WINDOWS = (5, 10, 20, 60)
+
+
+def download_universe(tickers: List[str], period: str = "1y") -> Dict:
+    """Single batched download -> {"dates", "tickers", "Open", "High", ...} with (T, N) float arrays."""
+    data = yf.download(
+        tickers, period=period, interval="1d", group_by="column",
+        auto_adjust=True, threads=True, progress=False
+    )
+    if data is None or data.empty:
+        raise ValueError("Universe download returned no data")
+    universe = {"dates": pd.DatetimeIndex(data.index), "tickers": list(tickers)}
+    for field in FIELDS:
+        universe[field] = data[field].reindex(columns=tickers).to_numpy(dtype=np.float64)
+    return universe
+
+
+# ======================== Vectorized indicator kernels (columns = tickers) ========================
+def ffill(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs down each column."""
+    mask = np.isnan(values)
+    idx = np.where(~mask, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = values[idx, np.arange(values.shape[1])]
+    return filled
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """pandas rolling(window).mean() per column via cumulative sums (NaN until `window` valid bars)."""
+    valid = ~np.isnan(values)
+    csum = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    ccount = np.cumsum(valid, axis=0)
+    csum = np.vstack([np.zeros((1, values.shape[1])), csum])
+    ccount = np.vstack([np.zeros((1, values.shape[1]), dtype=ccount.dtype), ccount])
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] >= window:
+        window_sum = csum[window:] - csum[:-window]
+        window_count = ccount[window:] - ccount[:-window]
+        out[window - 1:] = np.where(window_count == window, window_sum / window, np.nan)
+    return out
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Matches talib.RSI column by column (same incremental state as the price store uses)."""
+    state = RSIState(period, width=close.shape[1])
+    return np.vstack([state.update(row) for row in close])
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Matches talib.ATR column by column (true range starts at the second bar)."""
+    state = ATRState(period, width=close.shape[1])
+    return np.vstack([state.update(h, l, c) for h, l, c in zip(high, low, close)])
+
+
+def pct_change_from(close: np.ndarray, bars_back: int) -> np.ndarray:
+    """Last close vs close.iloc[-bars_back] (same convention as get_stock_fundamental_data)."""
+    if close.shape[0] < bars_back:
+        return np.full(close.shape[1], np.nan)
+    return (close[-1] / close[-bars_back] - 1) * 100
+
+
+# ======================== Screener ========================
+def compute_universe_indicators(universe: Dict) -> pd.DataFrame:
+    """One row per ticker with the latest value of every indicator."""
+    close = ffill(universe["Close"])
+    high, low = universe["High"], universe["Low"]
+
+    table = {
+        "Close": close[-1],
+        "5D Change (%)": pct_change_from(close, 5),
+        "60D Change (%)": pct_change_from(close, 60),
+        "RSI (14)": rsi(universe["Close"])[-1],
+        "ATR (14)": atr(high, low, universe["Close"])[-1],
+    }
+    for window in MA_WINDOWS:
+        table[f"MA{window}"] = rolling_mean(universe["Close"], window)[-1]
+
+    screener = pd.DataFrame(table, index=pd.Index(universe["tickers"], name="Ticker")).round(2)
+    return screener.dropna(how="all")
+
+
+def get_universe_screener(tickers: List[str], period: str = "1y") -> pd.DataFrame:
+    return compute_universe_indicators(download_universe(tickers, period=period))
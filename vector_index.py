@@ -0,0 +1,409 @@
+# vector_index.py
+# In-process vector index partitioned by date_str. Each date keeps one contiguous float32 matrix
+# of unit-normalized embeddings, so a per-date top-k is a single matrix-vector product — no
+# SQLite, no temp directory, nothing to clean up. Mirrors the Chroma calls report_core uses
+# (add_documents / similarity_search(query, k, filter)).
+# PersistentTickerIndex is the long-lived alternative: one Chroma collection per ticker that
+# survives across reports and only embeds articles it has not stored yet.
+import re
+import hashlib
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import Chroma
+
+from embedding_cache import content_hash
+from post_batch import str_to_day
+
+VECTOR_STORE_DIR = "./vector_store"
+
+
+class _Partition:
+    def __init__(self, dim: int):
+        self.chunks: List[np.ndarray] = []
+        self.docs: List[Document] = []
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+
+    def append(self, vectors: np.ndarray, docs: List[Document]) -> None:
+        self.chunks.append(vectors)
+        self.docs.extend(docs)
+
+    def compact(self) -> np.ndarray:
+        # Appends are batched per streamed interval; merge them into one matrix on first query
+        if self.chunks:
+            self.matrix = np.ascontiguousarray(np.vstack([self.matrix, *self.chunks]))
+            self.chunks = []
+        return self.matrix
+
+
+class DatePartitionedIndex:
+    def __init__(self, embedding: Embeddings, partition_key: str = "date_str"):
+        self.embedding = embedding
+        self.partition_key = partition_key
+        self.partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def __len__(self) -> int:
+        return sum(len(p.docs) for p in self.partitions.values())
+
+    def add_documents(self, docs: List[Document]) -> None:
+        if not docs:
+            return
+        vectors = self._normalize(self.embedding.embed_documents([d.page_content for d in docs]))
+        keys = np.array([str(d.metadata.get(self.partition_key, "")) for d in docs], dtype=object)
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                rows = np.flatnonzero(keys == key)
+                part = self.partitions.get(key)
+                if part is None:
+                    part = self.partitions[key] = _Partition(vectors.shape[1])
+                part.append(vectors[rows], [docs[i] for i in rows])
+
+    def update_metadata(self, docs: List[Document]) -> None:
+        """Replace the metadata of already indexed documents (matched by doc_id); no re-embedding."""
+        with self._lock:
+            for doc in docs:
+                part = self.partitions.get(str(doc.metadata.get(self.partition_key, "")))
+                for stored in (part.docs if part is not None else ()):
+                    if stored.metadata.get("doc_id") == doc.metadata.get("doc_id"):
+                        stored.metadata.update(doc.metadata)
+
+    def partition_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {key: len(p.docs) for key, p in self.partitions.items()}
+
+    def partition_documents(self, key: str) -> List[Document]:
+        with self._lock:
+            part = self.partitions.get(str(key))
+            return list(part.docs) if part is not None else []
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Document]:
+        """Top-k by cosine similarity; filter may only name the partition key (e.g. {"date_str": d})."""
+        if filter and set(filter) != {self.partition_key}:
+            raise ValueError(f"DatePartitionedIndex only filters on {self.partition_key}: {filter}")
+        q = self._normalize(self.embedding.embed_query(query))
+        with self._lock:
+            if filter:
+                part = self.partitions.get(str(filter[self.partition_key]))
+                parts = [part] if part is not None else []
+            else:
+                parts = list(self.partitions.values())
+            matrices = [p.compact() for p in parts]
+            docs = [d for p in parts for d in p.docs]
+        if not docs:
+            return []
+        scores = matrices[0] @ q if len(matrices) == 1 else np.concatenate([m @ q for m in matrices])
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [docs[i] for i in top]
+
+
+# ======================== Persistent per-ticker collections ========================
+def stable_doc_id(doc: Document) -> str:
+    """Article URL when there is one (same article, same id across reports), else the text hash."""
+    link = (doc.metadata.get("link") or "").strip()
+    if link:
+        return hashlib.sha256(link.encode("utf-8")).hexdigest()
+    return content_hash(doc.page_content)
+
+
+_collections: Dict[str, Chroma] = {}
+_collections_lock = threading.Lock()
+
+
+def get_ticker_collection(ticker: str, embedding: Embeddings) -> Chroma:
+    """Process-wide Chroma handle for ticker's collection under VECTOR_STORE_DIR."""
+    name = re.sub(r"[^A-Za-z0-9_-]", "_", f"news_{ticker.upper()}")
+    with _collections_lock:
+        db = _collections.get(name)
+        if db is None:
+            db = _collections[name] = Chroma(collection_name=name, embedding_function=embedding,
+                                             persist_directory=VECTOR_STORE_DIR)
+        return db
+
+
+class PersistentTickerIndex:
+    """
+    A report's view of a ticker collection: add_documents embeds only ids not stored yet (and
+    refreshes the metadata of the others), and every search / partition is limited to the
+    documents this report added via a per-report `report_tag` metadata key (plus the date_ord
+    range), so articles stored by earlier runs (other windows, daily_limit or dedup settings)
+    never leak into this report's context. The filter stays constant-size however many
+    documents the report holds. A shared article carries the tag of the latest report that
+    added it, so two concurrent reports on the same ticker and days can take each other's docs.
+    """
+    def __init__(self, ticker: str, embedding: Embeddings, date_range: Optional[Tuple[str, str]] = None):
+        self.ticker = ticker.upper()
+        self.db = get_ticker_collection(self.ticker, embedding)
+        self.date_range = None
+        if date_range:
+            self.date_range = (str_to_day(date_range[0]), str_to_day(date_range[1]))
+        self.report_tag = uuid.uuid4().hex
+        self.doc_ids: set = set()
+        self._lock = threading.Lock()
+        self.added = 0
+        self.skipped = 0
+
+    def add_documents(self, docs: List[Document]) -> None:
+        for d in docs:
+            if d.metadata.get("date_ord") is None and d.metadata.get("date_str"):
+                try:
+                    d.metadata["date_ord"] = str_to_day(d.metadata["date_str"])
+                except ValueError:
+                    pass
+            d.metadata["stable_id"] = stable_doc_id(d)
+            d.metadata["report_tag"] = self.report_tag
+        by_id = {d.metadata["stable_id"]: d for d in docs}
+        ids = list(by_id)
+        with self._lock:
+            existing = set(self.db.get(ids=ids, include=[])["ids"]) if ids else set()
+            new_ids = [i for i in ids if i not in existing]
+            if new_ids:
+                self.db.add_documents([by_id[i] for i in new_ids], ids=new_ids)
+            if existing:
+                # Already embedded: only refresh sentiment_score / dup_count / report_tag
+                old_ids = [i for i in ids if i in existing]
+                self.db._collection.update(ids=old_ids, metadatas=[by_id[i].metadata for i in old_ids])
+            self.doc_ids.update(ids)
+            self.added += len(new_ids)
+            self.skipped += len(ids) - len(new_ids)
+
+    def update_metadata(self, docs: List[Document]) -> None:
+        """Replace the metadata of documents this report already added; no re-embedding."""
+        for d in docs:
+            d.metadata["stable_id"] = stable_doc_id(d)
+            d.metadata["report_tag"] = self.report_tag
+        with self._lock:
+            docs = [d for d in docs if d.metadata["stable_id"] in self.doc_ids]
+            if docs:
+                self.db._collection.update(ids=[d.metadata["stable_id"] for d in docs],
+                                           metadatas=[d.metadata for d in docs])
+
+    def _scope(self, where: Optional[Dict] = None) -> Optional[Dict]:
+        """where ∧ "tagged by this report" (∧ the report's date range when one was given)."""
+        with self._lock:
+            if not self.doc_ids:
+                return None
+        clauses = [{"report_tag": self.report_tag}]
+        if self.date_range is not None:
+            clauses += [{"date_ord": {"$gte": self.date_range[0]}}, {"date_ord": {"$lte": self.date_range[1]}}]
+        if where:
+            clauses.append(where)
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def partition_counts(self) -> Dict[str, int]:
+        scope = self._scope()
+        return chroma_partition_counts(self.db, scope) if scope else {}
+
+    def partition_documents(self, date_str: str) -> List[Document]:
+        scope = self._scope({"date_str": date_str})
+        return chroma_partition_documents(self.db, where=scope) if scope else []
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Document]:
+        """Top-k by cosine similarity; filter may only name the partition key (e.g. {"date_str": d})."""
+        if filter and set(filter) != {self.partition_key}:
+            raise ValueError(f"DatePartitionedIndex only filters on {self.partition_key}: {filter}")
+        q = self._normalize(self.embedding.embed_query(query))
+        with self._lock:
+            if filter:
+                part = self.partitions.get(str(filter[self.partition_key]))
+                parts = [part] if part is not None else []
+            else:
+                parts = list(self.partitions.values())
+            matrices = [p.compact() for p in parts]
+            docs = [d for p in parts for d in p.docs]
+        if not docs:
+            return []
+        scores = matrices[0] @ q if len(matrices) == 1 else np.concatenate([m @ q for m in matrices])
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [docs[i] for i in top]
+
+
+# ======================== Persistent per-ticker collections ========================
+def stable_doc_id(doc: Document) -> str:
+    """Article URL when there is one (same article, same id across reports), else the text hash."""
+    link = (doc.metadata.get("link") or "").strip()
+    if link:
+        return hashlib.sha256(link.encode("utf-8")).hexdigest()
+    return content_hash(doc.page_content)
+
+
+_collections: Dict[str, Chroma] = {}
+_collections_lock = threading.Lock()
+
+
+def get_ticker_collection(ticker: str, embedding: Embeddings) -> Chroma:
+    """Process-wide Chroma handle for ticker's collection under VECTOR_STORE_DIR."""
+    name = re.sub(r"[^A-Za-z0-9_-]", "_", f"news_{ticker.upper()}")
+    with _collections_lock:
+        db = _collections.get(name)
+        if db is None:
+            db = _collections[name] = Chroma(collection_name=name, embedding_function=embedding,
+                                             persist_directory=VECTOR_STORE_DIR)
+        return db
+
+
+class PersistentTickerIndex:
+    """
+    A report's view of a ticker collection: add_documents embeds only ids not stored yet (and
+    refreshes the metadata of the others), and every search / partition is limited to the
+    documents this report added via a per-report `report_tag` metadata key (plus the date_ord
+    range), so articles stored by earlier runs (other windows, daily_limit or dedup settings)
+    never leak into this report's context. The filter stays constant-size however many
+    documents the report holds. A shared article carries the tag of the latest report that
+    added it, so two concurrent reports on the same ticker and days can take each other's docs.
+    """
+    def __init__(self, ticker: str, embedding: Embeddings, date_range: Optional[Tuple[str, str]] = None):
+        self.ticker = ticker.upper()
+        self.db = get_ticker_collection(self.ticker, embedding)
+        self.date_range = None
+        if date_range:
+            self.date_range = (str_to_day(date_range[0]), str_to_day(date_range[1]))
+        self.report_tag = uuid.uuid4().hex
+        self.doc_ids: set = set()
+        self._lock = threading.Lock()
+        self.added = 0
+        self.skipped = 0
+
+    def add_documents(self, docs: List[Document]) -> None:
+        for d in docs:
+            if d.metadata.get("date_ord") is None and d.metadata.get("date_str"):
+                try:
+                    d.metadata["date_ord"] = str_to_day(d.metadata["date_str"])
+                except ValueError:
+                    pass
+            d.metadata["stable_id"] = stable_doc_id(d)
+            d.metadata["report_tag"] = self.report_tag
+        by_id = {d.metadata["stable_id"]: d for d in docs}
+        ids = list(by_id)
+        with self._lock:
+            existing = set(self.db.get(ids=ids, include=[])["ids"]) if ids else set()
+            new_ids = [i for i in ids if i not in existing]
+            if new_ids:
+                self.db.add_documents([by_id[i] for i in new_ids], ids=new_ids)
+            if existing:
+                # Already embedded: only refresh sentiment_score / dup_count / report_tag
+                old_ids = [i for i in ids if i in existing]
+                self.db._collection.update(ids=old_ids, metadatas=[by_id[i].metadata for i in old_ids])
+            self.doc_ids.update(ids)
+            self.added += len(new_ids)
+            self.skipped += len(ids) - len(new_ids)
+
+    def update_metadata(self, docs: List[Document]) -> None:
+        """Replace the metadata of documents this report already added; no re-embedding."""
+        for d in docs:
+            d.metadata["stable_id"] = stable_doc_id(d)
+            d.metadata["report_tag"] = self.report_tag
+        with self._lock:
+            docs = [d for d in docs if d.metadata["stable_id"] in self.doc_ids]
+            if docs:
+                self.db._collection.update(ids=[d.metadata["stable_id"] for d in docs],
+                                           metadatas=[d.metadata for d in docs])
+
+    def _scope(self, where: Optional[Dict] = None) -> Optional[Dict]:
+        """where ∧ "tagged by this report" (∧ the report's date range when one was given)."""
+        with self._lock:
+            if not self.doc_ids:
+                return None
+        clauses = [{"report_tag": self.report_tag}]
+        if self.date_range is not None:
+            clauses += [{"date_ord": {"$gte": self.date_range[0]}}, {"date_ord": {"$lte": self.date_range[1]}}]
+        if where:
+            clauses.append(where)
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def partition_counts(self) -> Dict[str, int]:
+        scope = self._scope()
+        return chroma_partition_counts(self.db, scope) if scope else {}
+
+    def partition_documents(self, date_str: str) -> List[Document]:
+        scope = self._scope({"date_str": date_str})
+        return chroma_partition_documents(self.db, where=scope) if scope else []
+
+    def search_range(self, query: str, start: str, end: str, k: int = 4) -> List[Document]:
+        """Top-k over this report's documents between two YYYY-MM-DD dates (inclusive)."""
+        return self.similarity_search(query, k=k, filter={
+            "$and": [{"date_ord": {"$gte": str_to_day(start)}}, {"date_ord": {"$lte": str_to_day(end)}}]})
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Document]:
+        scope = self._scope(filter)
+        return self.db.similarity_search(query, k=k, filter=scope) if scope else []
+
+
+# ======================== Retrieval planner ========================
+def chroma_partition_counts(db: Chroma, where: Optional[Dict] = None) -> Dict[str, int]:
+    """Documents per date_str in a Chroma collection (metadata only, no vectors)."""
+    metadatas = db.get(where=where, include=["metadatas"])["metadatas"] or []
+    counts: Dict[str, int] = {}
+    for m in metadatas:
+        key = str((m or {}).get("date_str", ""))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def chroma_update_metadata(db: Chroma, docs: List[Document]) -> None:
+    """Replace the metadata of stored documents, matched by their doc_id metadata."""
+    by_doc_id = {d.metadata.get("doc_id"): d.metadata for d in docs}
+    got = db.get(where={"doc_id": {"$in": list(by_doc_id)}}, include=["metadatas"])
+    if got["ids"]:
+        db._collection.update(ids=got["ids"], metadatas=[by_doc_id[(m or {}).get("doc_id")] for m in got["metadatas"]])
+
+
+def chroma_partition_documents(db: Chroma, date_str: Optional[str] = None, where: Optional[Dict] = None) -> List[Document]:
+    """Every document of one date partition (or matching an explicit where)."""
+    got = db.get(where=where or {"date_str": date_str}, include=["documents", "metadatas"])
+    return [Document(page_content=text, metadata=meta or {})
+            for text, meta in zip(got["documents"] or [], got["metadatas"] or [])]
+
+
+class RetrievalPlanner:
+    """
+    Counts documents per date partition once per report. A date-filtered retrieval whose partition
+    holds <= k documents skips the query embedding and vector search and returns the whole
+    partition in a fixed order (sentiment desc, then doc_id); anything else goes to similarity_search.
+    """
+    def __init__(self, vector_db):
+        self.vector_db = vector_db
+        self._counts: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+        self.bypassed = 0
+        self.searched = 0
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            if self._counts is None:
+                if hasattr(self.vector_db, "partition_counts"):
+                    self._counts = self.vector_db.partition_counts()
+                elif isinstance(self.vector_db, Chroma):
+                    self._counts = chroma_partition_counts(self.vector_db)
+                else:
+                    self._counts = {}
+            return self._counts
+
+    def _partition(self, date_str: str) -> List[Document]:
+        if hasattr(self.vector_db, "partition_documents"):
+            return self.vector_db.partition_documents(date_str)
+        return chroma_partition_documents(self.vector_db, date_str)
+
+    def retrieve(self, query: str, k: int, date_filter: Optional[str] = None) -> List[Document]:
+        count = self.counts().get(str(date_filter)) if date_filter else None
+        if count is not None and count <= k:
+            docs = self._partition(date_filter)
+            self.bypassed += 1
+            return sorted(docs, key=lambda d: (-float(d.metadata.get("sentiment_score", 0)),
+                                               str(d.metadata.get("doc_id", ""))))
+        self.searched += 1
+        return self.vector_db.similarity_search(query, k=k, filter={"date_str": date_filter} if date_filter else None)